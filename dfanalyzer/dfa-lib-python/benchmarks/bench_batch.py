@@ -0,0 +1,73 @@
+"""Compare per-task posting with batched posting against a local stand-in
+DfAnalyzer server.
+
+Usage:
+  python benchmarks/bench_batch.py [--tasks 2000] [--batch-size 100] [--latency 0.002]
+"""
+import argparse
+from time import perf_counter
+
+from dfa_lib_python.batch import Batcher
+from dfa_lib_python.mock_server import MockDfAnalyzer
+from dfa_lib_python.task import Task
+from dfa_lib_python.transport import get_transport
+from dfa_lib_python.dataset import DataSet
+from dfa_lib_python.element import Element
+
+
+def task_messages(n_tasks):
+    messages = []
+    for i in range(n_tasks):
+        task = Task(i, "nvidiaflare-df", "ClientTraining")
+        task.add_dataset(DataSet("iClientTraining",
+                                 [Element(["trial", 1, i, 3, 1000])]))
+        messages.append(task.get_specification())
+    return messages
+
+
+def run_per_task(server, messages):
+    url = server.url + "/pde/task/json"
+    transport = get_transport()
+    start = perf_counter()
+    for message in messages:
+        transport.post(url, json=message)
+    return perf_counter() - start
+
+
+def run_batched(server, messages, batch_size, mode):
+    url = server.url + "/pde/task/json"
+    batcher = Batcher(max_size=batch_size, max_delay=60, mode=mode)
+    start = perf_counter()
+    for message in messages:
+        batcher.add(url, message)
+    batcher.flush()
+    return perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.002,
+                        help="Server latency per request, in seconds.")
+    parser.add_argument("--mode", choices=["array", "ndjson"], default="array")
+    args = parser.parse_args()
+
+    messages = task_messages(args.tasks)
+    with MockDfAnalyzer(latency=args.latency) as server:
+        per_task = run_per_task(server, messages)
+        per_task_requests = server.requests
+        server.reset()
+        batched = run_batched(server, messages, args.batch_size, args.mode)
+        batched_requests = server.requests
+
+    print("{0:<10} {1:>10} {2:>10} {3:>12}".format(
+        "mode", "requests", "seconds", "tasks/s"))
+    for name, seconds, requests in (("per-task", per_task, per_task_requests),
+                                    ("batched", batched, batched_requests)):
+        print("{0:<10} {1:>10} {2:>10.3f} {3:>12.0f}".format(
+            name, requests, seconds, args.tasks / seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Compare request body compression codecs on the provenance payloads of the
+k-means and DBSCAN assemblers against a local stand-in DfAnalyzer server.
+
+Payloads hold the global centers and counts of KMeansAssembler, and the
+merged core points of DBSCANAssembler, either sent inline as JSON lists or
+replaced by artifact references (see DFA_ARTIFACT_THRESHOLD).
+
+Usage:
+  python benchmarks/bench_compression.py [--messages 200] [--features 9]
+      [--clusters 3 10 50] [--core-points 500 2000] [--level 1]
+      [--latency 0.0]
+"""
+import argparse
+import json
+import tempfile
+import time
+from time import perf_counter
+
+import numpy as np
+
+from dfa_lib_python.artifact import ArtifactStore, set_artifact_store
+from dfa_lib_python.dataset import DataSet
+from dfa_lib_python.element import Element
+from dfa_lib_python.mock_server import MockDfAnalyzer
+from dfa_lib_python.task import Task
+from dfa_lib_python.transport import Transport, zstandard
+
+
+def kmeans_payload(round, n_clusters, n_features, rng):
+    task = Task(7 + 4 * round, "nvidiaflare-df", "Assemble")
+    task.add_dataset(DataSet("iAssemble", [Element(
+        ["trial", round, n_features, n_clusters, "2025-01-01 00:00:00"])]))
+    task.add_dataset(DataSet("oAssemble", [Element(
+        ["trial", round + 1, rng.normal(size=(n_clusters, n_features)),
+         rng.integers(1, 10000, n_clusters).astype(float), 0.01, 0.001,
+         "2025-01-01 00:00:01"])]))
+    return task.get_specification()
+
+
+def dbscan_payload(round, n_core_points, n_features, rng):
+    task = Task(7 + 4 * round, "nvidiaflare-df", "Assemble")
+    task.add_dataset(DataSet("iAssemble", [Element(
+        ["trial", round, "2025-01-01 00:00:00"])]))
+    task.add_dataset(DataSet("oAssemble", [Element(
+        ["trial", round + 1,
+         rng.normal(size=(n_core_points, n_features)).astype(np.float32),
+         rng.integers(0, 5, n_core_points), 0.5, 0.02,
+         "2025-01-01 00:00:01"])]))
+    return task.get_specification()
+
+
+def cpu_cost(transport, bodies, encoding):
+    start = time.process_time()
+    size = sum(len(transport.compress(x, encoding)) for x in bodies)
+    return (time.process_time() - start) / len(bodies), size / len(bodies)
+
+
+def run(server, transport, messages):
+    url = server.url + "/pde/task/json"
+    server.reset()
+    start = perf_counter()
+    for message in messages:
+        transport.post(url, json=message)
+    return perf_counter() - start, server.bytes_received / len(messages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--features", type=int, default=9)
+    parser.add_argument("--clusters", type=int, nargs="+", default=[3, 10, 50])
+    parser.add_argument("--core-points", type=int, nargs="+",
+                        default=[500, 2000])
+    parser.add_argument("--level", type=int, default=None,
+                        help="Compression level, defaults to the codec's.")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Server latency per request, in seconds.")
+    args = parser.parse_args()
+
+    codecs = ["off", "gzip"] + (["zstd"] if zstandard is not None else [])
+    rng = np.random.default_rng(0)
+    cases = []
+    with tempfile.TemporaryDirectory() as directory:
+        for storage, threshold in (("artifact", 1024), ("inline", 1 << 40)):
+            set_artifact_store(ArtifactStore(directory, threshold=threshold))
+            for k in args.clusters:
+                cases.append(("kmeans k={0}".format(k), storage, [
+                    kmeans_payload(i, k, args.features, rng)
+                    for i in range(args.messages)]))
+            for n in args.core_points:
+                cases.append(("dbscan n={0}".format(n), storage, [
+                    dbscan_payload(i, n, args.features, rng)
+                    for i in range(args.messages)]))
+        set_artifact_store(None)
+
+    print("{0:<14} {1:<9} {2:<5} {3:>10} {4:>10} {5:>7} {6:>11} {7:>10}"
+          .format("payload", "arrays", "codec", "raw B", "wire B", "ratio",
+                  "cpu us/msg", "msgs/s"))
+    with MockDfAnalyzer(latency=args.latency) as server:
+        for name, storage, messages in cases:
+            bodies = [json.dumps(x).encode("utf-8") for x in messages]
+            raw = sum(len(x) for x in bodies) / len(bodies)
+            for codec in codecs:
+                transport = Transport(compression=codec, min_size=0,
+                                      level=args.level)
+                cpu = 0.0
+                if codec != "off":
+                    cpu, _ = cpu_cost(transport, bodies, codec)
+                seconds, wire = run(server, transport, messages)
+                transport.close()
+                print("{0:<14} {1:<9} {2:<5} {3:>10.0f} {4:>10.0f} {5:>7.2f} "
+                      "{6:>11.1f} {7:>10.0f}".format(
+                          name, storage, codec, raw, wire, raw / wire,
+                          cpu * 1e6, len(messages) / seconds))
+
+
+if __name__ == "__main__":
+    main()
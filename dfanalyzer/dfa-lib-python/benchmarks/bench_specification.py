@@ -0,0 +1,85 @@
+"""Measure the cost of building provenance specifications and the memory
+held by each Task.
+
+Usage:
+  python benchmarks/bench_specification.py [--tasks 20000] [--repeat 5]
+"""
+import argparse
+import tracemalloc
+from time import perf_counter
+
+from dfa_lib_python.attribute import Attribute
+from dfa_lib_python.attribute_type import AttributeType
+from dfa_lib_python.dataflow import Dataflow
+from dfa_lib_python.dataset import DataSet
+from dfa_lib_python.element import Element
+from dfa_lib_python.performance import Performance
+from dfa_lib_python.set import Set
+from dfa_lib_python.set_type import SetType
+from dfa_lib_python.task import Task
+from dfa_lib_python.transformation import Transformation
+
+
+def make_task(i):
+    task = Task(i, "nvidiaflare-df", "ClientTraining",
+                dependency=Task(i - 1, "nvidiaflare-df", "InitializeClient"))
+    task.add_dataset(DataSet("iClientTraining",
+                             [Element(["trial", 1, i, 3, 1000])]))
+    task._performances.append(
+        Performance("2025-01-01 00:00:00", "2025-01-01 00:00:01",
+                    duration_ns=1000, cpu_time_ns=900, peak_rss=1 << 20,
+                    threads=4).get_specification())
+    return task
+
+
+def make_dataflow():
+    attributes = [Attribute("att{0}".format(i), AttributeType.NUMERIC)
+                  for i in range(10)]
+    transformations = []
+    for i in range(8):
+        sets = [Set("i{0}".format(i), SetType.INPUT, attributes),
+                Set("o{0}".format(i), SetType.OUTPUT, attributes)]
+        transformations.append(Transformation("tf{0}".format(i), sets=sets))
+    return Dataflow("nvidiaflare-df", transformations)
+
+
+def best(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        function()
+        times.append(perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tasks = [make_task(i) for i in range(args.tasks)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    memory = sum(x.size_diff for x in after.compare_to(before, "filename"))
+
+    spec = best(lambda: [x.get_specification() for x in tasks], args.repeat)
+    build = best(lambda: [make_task(i) for i in range(args.tasks)],
+                 args.repeat)
+    dataflow = best(lambda: [make_dataflow().get_specification()
+                             for _ in range(100)], args.repeat)
+
+    print("{0:<28} {1:>12}".format("measure", "value"))
+    print("{0:<28} {1:>9.2f} us".format("Task.get_specification",
+                                        1e6 * spec / args.tasks))
+    print("{0:<28} {1:>9.2f} us".format("Task build", 1e6 * build / args.tasks))
+    print("{0:<28} {1:>9.2f} us".format("Dataflow build + spec",
+                                        1e6 * dataflow / 100))
+    print("{0:<28} {1:>9.0f} B".format("memory per Task",
+                                       memory / args.tasks))
+
+
+if __name__ == "__main__":
+    main()
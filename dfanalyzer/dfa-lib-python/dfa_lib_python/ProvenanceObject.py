@@ -3,9 +3,20 @@ class ProvenanceObject(object):
     This class defines a basic provenance object with
     a tag and a json representation.
 
+    Subclasses declare their state in ``__slots__``. The slots starting
+    with the prefix are the fields of the json representation; they are
+    listed once per class, so building the representation only visits
+    those fields.
+
     Attributes:
         - tag (str): ProvenanceObject tag.
     """
+    __slots__ = ("_tag",)
+    _fields = (("_tag", "tag"),)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._fields = _slot_fields(cls, "_")
 
     def __init__(self, tag):
         self._tag = tag.lower()
@@ -16,15 +27,20 @@ class ProvenanceObject(object):
         Args:
             prefix (str): A prefix used to define which variables should be used.
         """
+        fields = self._fields if prefix == "_" \
+            else _slot_fields(type(self), prefix)
         json = {}
-        for key in self.__dict__.keys():
-            if key[0] != prefix:
-                continue
-            name = key.split(prefix)[1]
-            value = self.__dict__[key]
-            if(value is not None):
-                if(len(value) > 0):
-                    json[name] = value
-                    if isinstance(value, str):
-                        json[name] = value
+        for slot, name in fields:
+            value = getattr(self, slot, None)
+            if value is not None and len(value) > 0:
+                json[name] = value
         return json
+
+
+def _slot_fields(cls, prefix):
+    fields = []
+    for klass in reversed(cls.__mro__):
+        for slot in klass.__dict__.get("__slots__", ()):
+            if slot[0] == prefix:
+                fields.append((slot, slot.split(prefix)[1]))
+    return tuple(fields)
@@ -0,0 +1,277 @@
+import asyncio
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from .backend import TASK_PATH, HttpBackend, get_backend
+from .batch import JSON_HEADERS, NDJSON_HEADERS, UNSUPPORTED_STATUS
+from .spool import get_spool
+from .transport import get_transport
+
+
+class AsyncSender(object):
+    """
+    This class defines an asyncio batching sender. Messages are
+    serialized when they are added and grouped by endpoint; a batch is
+    posted to the batch endpoint (the endpoint url followed by ``/batch``)
+    once it reaches ``max_size`` messages or its oldest message is older
+    than ``max_delay`` seconds. Posts run on a thread pool over the shared
+    :obj:`Transport`, at most ``concurrency`` at a time: :meth:`add` waits
+    for a free slot when they are all busy. Messages of the same Task are
+    never in flight in two batches at once, so its states arrive in order.
+
+    Attributes:
+        - max_size (:obj:`int`, optional): Messages per batch.
+        - max_delay (:obj:`float`, optional): Maximum time a message waits
+          in the batch, in seconds.
+        - concurrency (:obj:`int`, optional): Maximum posts in flight.
+        - mode (:obj:`str`, optional): ``array`` to post a JSON array, or
+          ``ndjson`` to post one JSON document per line.
+    """
+    def __init__(self, max_size=100, max_delay=1.0, concurrency=4,
+                 mode="array"):
+        assert isinstance(max_size, int) and max_size > 0, \
+            "The max_size must be a positive integer."
+        assert isinstance(concurrency, int) and concurrency > 0, \
+            "The concurrency must be a positive integer."
+        assert mode in ("array", "ndjson"), \
+            "The mode must be array or ndjson."
+        self._max_size = max_size
+        self._max_delay = float(max_delay)
+        self._concurrency = concurrency
+        self._mode = mode
+        self._batches = {}
+        self._unsupported = set()
+        self._inflight = {}
+        self._running = set()
+        self._timer = None
+        self._expiring = None
+        self._semaphore = None
+        self._loop = None
+        self._executor = ThreadPoolExecutor(concurrency,
+                                            thread_name_prefix="dfa-aio")
+        self.requests = 0
+        self.sent = 0
+        self.failed = 0
+
+    @property
+    def max_size(self):
+        """Get the number of messages per batch."""
+        return self._max_size
+
+    @property
+    def max_delay(self):
+        """Get the maximum time a message waits in the batch."""
+        return self._max_delay
+
+    @property
+    def concurrency(self):
+        """Get the maximum number of posts in flight."""
+        return self._concurrency
+
+    @property
+    def pending(self):
+        """Get the number of messages not yet sent."""
+        return sum(len(x) for x in self._batches.values()) + \
+            sum(n for _, n in self._running)
+
+    async def add(self, url, message):
+        """ Add a message to the batch of its endpoint, posting the batch
+            when it is full.
+
+        Args:
+            - url (:obj:`str`): Endpoint that receives the message.
+            - message (:obj:`dict`): A provenance specification.
+        """
+        key = (url, message.get("dataflow"), message.get("transformation"),
+               message.get("id"))
+        batch = self._batches.setdefault(url, [])
+        batch.append((key, json.dumps(message)))
+        if len(batch) >= self._max_size:
+            await self._dispatch(url, self._batches.pop(url))
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                self._max_delay, self._expire)
+
+    async def flush(self):
+        """Post every buffered message and wait for the posts to end."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._expiring is not None:
+            await self._expiring
+        batches, self._batches = self._batches, {}
+        await self._dispatch_all(batches)
+        while self._running:
+            await asyncio.gather(*[x for x, _ in self._running])
+
+    async def close(self):
+        """Flush the pending messages and stop the thread pool."""
+        await self.flush()
+        self._executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+        return False
+
+    def _expire(self):
+        self._timer = None
+        batches, self._batches = self._batches, {}
+        self._expiring = asyncio.ensure_future(self._dispatch_all(batches))
+
+    async def _dispatch_all(self, batches):
+        for url, batch in batches.items():
+            await self._dispatch(url, batch)
+
+    async def _dispatch(self, url, batch):
+        # a semaphore belongs to one event loop, a sender reused by a new
+        # loop (e.g. another asyncio.run) gets a new one
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self._concurrency)
+            self._loop = loop
+        # release the semaphore that was acquired, even if replaced since
+        semaphore = self._semaphore
+        await semaphore.acquire()
+        keys = {key for key, _ in batch}
+        after = {self._inflight[key] for key in keys
+                 if key in self._inflight}
+        task = asyncio.ensure_future(
+            self._send(url, [body for _, body in batch], after))
+        entry = (task, len(batch))
+        self._running.add(entry)
+        for key in keys:
+            self._inflight[key] = task
+        task.add_done_callback(
+            lambda _: self._done(entry, keys, semaphore))
+
+    def _done(self, entry, keys, semaphore):
+        self._running.discard(entry)
+        semaphore.release()
+        for key in keys:
+            if self._inflight.get(key) is entry[0]:
+                del self._inflight[key]
+
+    async def _send(self, url, bodies, after):
+        if after:
+            await asyncio.wait(after)
+        loop = asyncio.get_running_loop()
+        if len(bodies) > 1 and url not in self._unsupported:
+            if self._mode == "ndjson":
+                data, headers = "\n".join(bodies), NDJSON_HEADERS
+            else:
+                data, headers = "[" + ",".join(bodies) + "]", JSON_HEADERS
+            self.requests += 1
+            r = await loop.run_in_executor(
+                self._executor, self._post, url + "/batch", data, headers)
+            if r is None:
+                self.failed += len(bodies)
+                return
+            if r.status_code not in UNSUPPORTED_STATUS:
+                self._count(r, len(bodies))
+                return
+            self._unsupported.add(url)
+        for body in bodies:
+            self.requests += 1
+            r = await loop.run_in_executor(
+                self._executor, self._post, url, body, JSON_HEADERS)
+            if r is None:
+                self.failed += 1
+            else:
+                self._count(r, 1)
+
+    def _post(self, url, data, headers):
+        try:
+            return get_transport().post(url, data=data, headers=headers)
+        except requests.RequestException:
+            return None
+
+    def _count(self, r, n):
+        if r.ok:
+            self.sent += n
+        else:
+            self.failed += n
+
+
+async def save_task(message):
+    """ Store a task specification without blocking the event loop. With
+        the Dataflow Analyzer backend and an :obj:`AsyncSender` installed,
+        the message is batched by the sender; otherwise the backend stores
+        it from a worker thread.
+
+    Args:
+        - message (:obj:`dict`): A :obj:`Task` specification.
+    """
+    backend = get_backend()
+    sender = get_async_sender()
+    if sender is not None and isinstance(backend, HttpBackend) \
+            and get_spool() is None:
+        await sender.add(backend.dfa_url + TASK_PATH, message)
+        return
+    await asyncio.get_running_loop().run_in_executor(
+        None, backend.save_task, message)
+
+
+async def save_dataflow(message):
+    """ Store a dataflow specification from a worker thread. Dataflows are
+        never batched, so they are stored before their tasks.
+
+    Args:
+        - message (:obj:`dict`): A :obj:`Dataflow` specification.
+    """
+    await asyncio.get_running_loop().run_in_executor(
+        None, get_backend().save_dataflow, message)
+
+
+_sender = None
+_sender_created = False
+_lock = threading.Lock()
+
+
+def get_async_sender():
+    """ Get the sender used by :meth:`Task.asave`.
+
+    Unless one is installed with :func:`set_async_sender`, the shared
+    sender is created on first use when DFA_AIO_BATCH_SIZE is above 1,
+    with DFA_AIO_BATCH_DELAY (default ``1`` second), DFA_AIO_CONCURRENCY
+    (default ``4``) and DFA_BATCH_MODE.
+
+    Returns:
+        The shared :obj:`AsyncSender`, or None when async tasks are stored
+        one by one.
+    """
+    global _sender, _sender_created
+    if not _sender_created:
+        with _lock:
+            if not _sender_created:
+                env = os.environ
+                size = int(env.get('DFA_AIO_BATCH_SIZE', 1))
+                if size > 1:
+                    _sender = AsyncSender(
+                        max_size=size,
+                        max_delay=float(env.get('DFA_AIO_BATCH_DELAY', 1.0)),
+                        concurrency=int(env.get('DFA_AIO_CONCURRENCY', 4)),
+                        mode=env.get('DFA_BATCH_MODE', 'array'))
+                _sender_created = True
+    return _sender
+
+
+def set_async_sender(sender):
+    """ Install the sender used by :meth:`Task.asave`. The caller flushes
+        the previous sender, from its event loop.
+
+    Args:
+        - sender (:obj:`AsyncSender`): The new sender, or None to
+          rebuild it from the environment on next use.
+    """
+    global _sender, _sender_created
+    assert sender is None or isinstance(sender, AsyncSender), \
+        "The sender must be valid."
+    with _lock:
+        _sender, _sender_created = sender, sender is not None
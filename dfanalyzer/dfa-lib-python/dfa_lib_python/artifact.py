@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import threading
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class ArtifactStore(object):
+    """
+    This class defines a content-addressed store for numpy arrays. Each
+    array is written once as a ``.npy`` file named after the SHA-256 of its
+    dtype, shape and bytes, and provenance messages only carry a reference
+    with the hash, shape and dtype.
+
+    Attributes:
+        - directory (:obj:`str`): Directory holding the artifacts.
+        - threshold (:obj:`int`, optional): Arrays larger than this many
+          bytes are always offloaded; smaller ones are sent inline in full.
+          Use 0 to offload every array.
+    """
+    def __init__(self, directory, threshold=1024):
+        assert np is not None, \
+            "The artifact store requires numpy."
+        assert isinstance(directory, str), \
+            "The directory must be a string."
+        assert isinstance(threshold, int) and threshold >= 0, \
+            "The threshold must be a non-negative integer."
+        self._directory = directory
+        self._threshold = threshold
+
+    @property
+    def directory(self):
+        """Get the artifact directory."""
+        return self._directory
+
+    @property
+    def threshold(self):
+        """Get the size, in bytes, above which arrays are offloaded."""
+        return self._threshold
+
+    def path(self, digest):
+        """ Get the file of an artifact.
+
+        Args:
+            - digest (:obj:`str`): Artifact hash.
+        """
+        return os.path.join(self._directory, digest[:2], digest + ".npy")
+
+    def put(self, array):
+        """ Store an array, unless an identical one is already stored.
+
+        Args:
+            - array (:obj:`numpy.ndarray`): A non-object array.
+
+        Returns:
+            A :obj:`dict` with the artifact hash, shape and dtype.
+        """
+        array = np.ascontiguousarray(array)
+        digest = hashlib.sha256()
+        digest.update(array.dtype.str.encode("ascii"))
+        digest.update(repr(array.shape).encode("ascii"))
+        digest.update(array.data)
+        digest = digest.hexdigest()
+        path = self.path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = "{0}.{1}.{2}.tmp".format(path, os.getpid(),
+                                          threading.get_ident())
+            with open(tmp, "wb") as f:
+                np.save(f, array, allow_pickle=False)
+            os.replace(tmp, path)
+        return {"artifact": digest,
+                "shape": list(array.shape),
+                "dtype": str(array.dtype)}
+
+    def get(self, digest):
+        """ Load a stored array.
+
+        Args:
+            - digest (:obj:`str`): Artifact hash.
+        """
+        return np.load(self.path(digest), allow_pickle=False)
+
+    def encode(self, array):
+        """ Get the element value of an array: the full array as a JSON
+            list when it is small, or a JSON reference to its artifact.
+
+        Args:
+            - array (:obj:`numpy.ndarray`): The array to encode.
+        """
+        if array.dtype.hasobject:
+            return str(array)
+        if array.nbytes > self._threshold:
+            return json.dumps(self.put(array))
+        return json.dumps(array.tolist())
+
+
+_store = None
+_lock = threading.Lock()
+
+
+def get_artifact_store():
+    """ Get the artifact store used by :obj:`Element`.
+
+    The shared store is created on first use in DFA_ARTIFACT_DIR (default
+    ``dfa_artifacts`` in the working directory), offloading arrays larger
+    than DFA_ARTIFACT_THRESHOLD bytes (default 1024).
+
+    Returns:
+        The shared :obj:`ArtifactStore`.
+    """
+    global _store
+    if _store is None:
+        with _lock:
+            if _store is None:
+                env = os.environ
+                _store = ArtifactStore(
+                    env.get('DFA_ARTIFACT_DIR', 'dfa_artifacts'),
+                    threshold=int(env.get('DFA_ARTIFACT_THRESHOLD', 1024)))
+    return _store
+
+
+def set_artifact_store(store):
+    """ Install the artifact store used by :obj:`Element`.
+
+    Args:
+        - store (:obj:`ArtifactStore`): The new store, or None to rebuild
+          it from the environment on next use.
+    """
+    global _store
+    assert store is None or isinstance(store, ArtifactStore), \
+        "The artifact store must be valid."
+    _store = store
@@ -0,0 +1,480 @@
+import argparse
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+import warnings
+from urllib.parse import quote
+
+import requests
+
+from .batch import Batcher
+from .emitter import get_emitter
+from .spool import get_spool
+from .transport import get_transport
+
+TASK_PATH = '/pde/task/json'
+DATAFLOW_PATH = '/pde/dataflow/json'
+
+
+class Backend(object):
+    """
+    This class defines the interface of a provenance backend, the
+    destination of the specifications saved by :obj:`Dataflow` and
+    :obj:`Task`.
+    """
+
+    @property
+    def location(self):
+        """Get where the backend stores the specifications."""
+        return type(self).__name__
+
+    def save_dataflow(self, message):
+        """ Store a dataflow specification.
+
+        Args:
+            - message (:obj:`dict`): A :obj:`Dataflow` specification.
+
+        Returns:
+            Whether the dataflow was stored.
+        """
+        raise NotImplementedError
+
+    def has_dataflow(self, tag):
+        """ Check whether a dataflow is stored.
+
+        Args:
+            - tag (:obj:`str`): Dataflow tag.
+
+        Returns:
+            True or False, or None when the backend cannot tell.
+        """
+        return None
+
+    def save_task(self, message):
+        """ Store a task specification.
+
+        Args:
+            - message (:obj:`dict`): A :obj:`Task` specification.
+        """
+        raise NotImplementedError
+
+    def flush(self):
+        """Make every stored specification durable."""
+
+    def close(self):
+        """Flush and release the backend resources."""
+        self.flush()
+
+
+class HttpBackend(Backend):
+    """
+    This class defines the Dataflow Analyzer backend. Specifications are
+    posted to the Dataflow Analyzer API, or appended to the :obj:`Spool`
+    or handed to the background :obj:`Emitter` when they are enabled.
+
+    Attributes:
+        - dfa_url (:obj:`str`, optional): Dataflow Analyzer url. Defaults
+          to the DFA_URL environment variable.
+    """
+    def __init__(self, dfa_url=None):
+        if dfa_url is None:
+            dfa_url = os.environ.get('DFA_URL', "http://localhost:22000/")
+        self._dfa_url = dfa_url
+
+    @property
+    def dfa_url(self):
+        """Get the Dataflow Analyzer url."""
+        return self._dfa_url
+
+    @property
+    def location(self):
+        return self._dfa_url
+
+    def save_dataflow(self, message):
+        r = get_transport().post(self._dfa_url + DATAFLOW_PATH, json=message)
+        print(r.status_code)
+        return r.ok
+
+    def has_dataflow(self, tag):
+        try:
+            r = get_transport().get(
+                self._dfa_url + DATAFLOW_PATH + "/" + quote(tag, safe=""))
+        except requests.RequestException:
+            return None
+        if r.status_code == 200:
+            return True
+        if r.status_code == 404:
+            return False
+        return None
+
+    def save_task(self, message):
+        url = self._dfa_url + TASK_PATH
+        spool = get_spool()
+        if spool is not None:
+            spool.append(url, message)
+            return
+        emitter = get_emitter()
+        if emitter is not None:
+            emitter.emit(url, message)
+            return
+        r = get_transport().post(url, json=message)
+        print(r.status_code)
+
+
+class SQLiteBackend(Backend):
+    """
+    This class defines an embedded SQLite backend. Every specification is
+    a local insert: dataflows go to the ``dataflow`` table, tasks to the
+    ``task`` table and the values of their datasets to the ``element``
+    table, so they can be queried directly or shipped to the Dataflow
+    Analyzer later with :func:`ship`.
+
+    Attributes:
+        - path (:obj:`str`): Database file.
+    """
+    def __init__(self, path):
+        assert isinstance(path, str), \
+            "The path must be a string."
+        self._path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS dataflow (
+                tag TEXT PRIMARY KEY,
+                specification TEXT NOT NULL,
+                saved_at REAL NOT NULL);
+            CREATE TABLE IF NOT EXISTS task (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                dataflow TEXT,
+                transformation TEXT,
+                id TEXT,
+                sub_id TEXT,
+                status TEXT,
+                specification TEXT NOT NULL,
+                saved_at REAL NOT NULL);
+            CREATE TABLE IF NOT EXISTS element (
+                task_seq INTEGER NOT NULL REFERENCES task(seq),
+                dataset TEXT,
+                position INTEGER,
+                vals TEXT);
+            CREATE INDEX IF NOT EXISTS task_key
+                ON task (dataflow, transformation, id);
+        """)
+
+    @property
+    def path(self):
+        """Get the database file."""
+        return self._path
+
+    @property
+    def connection(self):
+        """Get the SQLite connection, to query the provenance directly."""
+        return self._connection
+
+    @property
+    def location(self):
+        return os.path.abspath(self._path)
+
+    def save_dataflow(self, message):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO dataflow VALUES (?, ?, ?)",
+                (message.get("tag"), json.dumps(message), time.time()))
+        return True
+
+    def has_dataflow(self, tag):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT 1 FROM dataflow WHERE tag = ?", (tag,)).fetchone()
+        return row is not None
+
+    def save_task(self, message):
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                "INSERT INTO task (dataflow, transformation, id, sub_id,"
+                " status, specification, saved_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (message.get("dataflow"), message.get("transformation"),
+                 message.get("id"), message.get("sub"),
+                 message.get("status"), json.dumps(message), time.time()))
+            rows = [(cursor.lastrowid, dataset.get("tag"), i, json.dumps(x))
+                    for dataset in message.get("sets", [])
+                    for i, x in enumerate(dataset.get("elements", []))]
+            self._connection.executemany(
+                "INSERT INTO element VALUES (?, ?, ?, ?)", rows)
+
+    def records(self):
+        """ Get the stored specifications, dataflows first.
+
+        Returns:
+            A generator of (path, message) tuples.
+        """
+        with self._lock:
+            dataflows = self._connection.execute(
+                "SELECT specification FROM dataflow").fetchall()
+            tasks = self._connection.execute(
+                "SELECT specification FROM task ORDER BY seq").fetchall()
+        for (x,) in dataflows:
+            yield DATAFLOW_PATH, x
+        for (x,) in tasks:
+            yield TASK_PATH, x
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class ParquetBackend(Backend):
+    """
+    This class defines an append-only Parquet backend. Specifications are
+    buffered and written as new Parquet files under ``dataflow/`` and
+    ``task/`` every ``row_group_size`` rows and on :meth:`flush`, so files
+    are never rewritten. Requires pyarrow.
+
+    Attributes:
+        - directory (:obj:`str`): Root directory of the Parquet files.
+        - row_group_size (:obj:`int`, optional): Rows buffered per file.
+    """
+    COLUMNS = ("dataflow", "transformation", "id", "sub_id", "status",
+               "specification", "saved_at")
+
+    def __init__(self, directory, row_group_size=10000):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("The Parquet backend requires pyarrow.")
+        assert isinstance(directory, str), \
+            "The directory must be a string."
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self._directory = directory
+        self._row_group_size = row_group_size
+        self._lock = threading.Lock()
+        self._rows = {"dataflow": [], "task": []}
+        self._parts = 0
+        for kind in self._rows:
+            os.makedirs(os.path.join(directory, kind), exist_ok=True)
+
+    @property
+    def directory(self):
+        """Get the root directory of the Parquet files."""
+        return self._directory
+
+    @property
+    def location(self):
+        return os.path.abspath(self._directory)
+
+    def save_dataflow(self, message):
+        self._append("dataflow", message)
+        return True
+
+    def save_task(self, message):
+        self._append("task", message)
+
+    def flush(self):
+        with self._lock:
+            for kind in self._rows:
+                self._write(kind)
+
+    def records(self):
+        """ Get the stored specifications, dataflows first.
+
+        Returns:
+            A generator of (path, message) tuples.
+        """
+        self.flush()
+        for kind, path in (("dataflow", DATAFLOW_PATH), ("task", TASK_PATH)):
+            for name in self._files(kind):
+                table = self._pq.read_table(name, columns=["specification"])
+                for x in table.column("specification").to_pylist():
+                    yield path, x
+
+    def _files(self, kind):
+        directory = os.path.join(self._directory, kind)
+        return [os.path.join(directory, x)
+                for x in sorted(os.listdir(directory))
+                if x.endswith(".parquet")]
+
+    def _append(self, kind, message):
+        row = (message.get("dataflow", message.get("tag")),
+               message.get("transformation"), message.get("id"),
+               message.get("sub"), message.get("status"),
+               json.dumps(message), time.time())
+        with self._lock:
+            self._rows[kind].append(row)
+            if len(self._rows[kind]) >= self._row_group_size:
+                self._write(kind)
+
+    def _write(self, kind):
+        rows = self._rows[kind]
+        if not rows:
+            return
+        self._rows[kind] = []
+        columns = {name: [x[i] for x in rows]
+                   for i, name in enumerate(self.COLUMNS)}
+        table = self._pa.table(columns)
+        self._parts += 1
+        name = "part-{0:020d}-{1}-{2:06d}.parquet".format(
+            time.time_ns(), os.getpid(), self._parts)
+        self._pq.write_table(table, os.path.join(self._directory, kind, name))
+
+
+def ship(backend, dfa_url, batcher=None):
+    """ Bulk-load the specifications of a local backend into the Dataflow
+        Analyzer.
+
+    Args:
+        - backend (:obj:`SQLiteBackend` or :obj:`ParquetBackend`): The
+          local backend.
+        - dfa_url (:obj:`str`): Dataflow Analyzer url.
+        - batcher (:obj:`Batcher`, optional): Batcher used to post the
+          specifications.
+
+    Returns:
+        The number of specifications shipped.
+    """
+    batcher = batcher if batcher is not None else Batcher(max_size=500)
+    base = dfa_url.rstrip("/")
+    shipped = 0
+    path, messages = None, []
+    for record_path, message in backend.records():
+        if record_path != path and messages:
+            batcher.send_batch(base + path, messages)
+            messages = []
+        path = record_path
+        messages.append(message)
+        shipped += 1
+    if messages:
+        batcher.send_batch(base + path, messages)
+    return shipped
+
+
+def create_backend(name, path=None):
+    """ Create a backend by name.
+
+    Args:
+        - name (:obj:`str`): ``http``, ``sqlite`` or ``parquet``.
+        - path (:obj:`str`, optional): Database file or directory of the
+          local backends.
+    """
+    if name == "http":
+        return HttpBackend()
+    if name == "sqlite":
+        return SQLiteBackend(path or "provenance.sqlite")
+    if name == "parquet":
+        return ParquetBackend(path or "provenance_parquet")
+    raise ValueError("Unknown provenance backend: {0}".format(name))
+
+
+_backend = None
+_lock = threading.Lock()
+_url_backends = {}
+
+
+def get_backend():
+    """ Get the backend used by :obj:`Dataflow` and :obj:`Task`.
+
+    The shared backend is created on first use from the DFA_BACKEND
+    (``http``, ``sqlite`` or ``parquet``, default ``http``) and
+    DFA_BACKEND_PATH environment variables, or installed with
+    :func:`set_backend`.
+
+    Returns:
+        The shared :obj:`Backend`.
+    """
+    global _backend
+    if _backend is None:
+        with _lock:
+            if _backend is None:
+                _backend = create_backend(
+                    os.environ.get('DFA_BACKEND', 'http'),
+                    os.environ.get('DFA_BACKEND_PATH'))
+    return _backend
+
+
+def get_url_backend(dfa_url=None):
+    """ Get the backend for a url set through the deprecated ``dfa_url``
+        globals of :mod:`task` and :mod:`dataflow` or ``Task.dfa_url``.
+
+    Args:
+        - dfa_url (:obj:`str`, optional): The url set by the caller, or
+          None when it was left to its default.
+
+    Returns:
+        The shared :obj:`Backend`, or an :obj:`HttpBackend` of that url
+        when the shared backend posts to the Dataflow Analyzer elsewhere.
+    """
+    backend = get_backend()
+    if dfa_url is None or not isinstance(backend, HttpBackend) or \
+            dfa_url == backend.dfa_url:
+        return backend
+    with _lock:
+        backend = _url_backends.get(dfa_url)
+        if backend is None:
+            warnings.warn(
+                "dfa_url is deprecated, set DFA_URL or install "
+                "HttpBackend(dfa_url) with set_backend.",
+                DeprecationWarning, stacklevel=3)
+            backend = _url_backends[dfa_url] = HttpBackend(dfa_url)
+    return backend
+
+
+def set_backend(backend):
+    """ Install the backend used by :obj:`Dataflow` and :obj:`Task`,
+        closing the previous one.
+
+    Args:
+        - backend (:obj:`Backend`): The new backend, or None to rebuild it
+          from the environment on next use.
+    """
+    global _backend
+    assert backend is None or isinstance(backend, Backend), \
+        "The backend must be valid."
+    with _lock:
+        previous, _backend = _backend, backend
+    if previous is not None and previous is not backend:
+        previous.close()
+
+
+def close():
+    """Flush and close the shared backend."""
+    if _backend is not None:
+        _backend.close()
+
+
+atexit.register(close)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m dfa_lib_python.backend",
+        description="Bulk-load a local provenance backend into DfAnalyzer.")
+    parser.add_argument("backend", choices=["sqlite", "parquet"],
+                        help="Local backend type")
+    parser.add_argument("path", type=str,
+                        help="Database file or Parquet directory")
+    parser.add_argument("--dfa_url", type=str,
+                        default=os.environ.get('DFA_URL',
+                                               "http://localhost:22000/"),
+                        help="DfAnalyzer url")
+    parser.add_argument("--batch_size", type=int, default=500,
+                        help="Specifications per batch request")
+    args = parser.parse_args()
+
+    backend = create_backend(args.backend, args.path)
+    batcher = Batcher(max_size=args.batch_size)
+    shipped = ship(backend, args.dfa_url, batcher)
+    print("{0} specifications shipped, {1} failed".format(shipped,
+                                                         batcher.failed))
+    if batcher.failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
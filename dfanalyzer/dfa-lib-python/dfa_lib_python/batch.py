@@ -0,0 +1,182 @@
+import json
+import threading
+import time
+
+import requests
+
+from .transport import get_transport
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+NDJSON_HEADERS = {"Content-Type": "application/x-ndjson"}
+UNSUPPORTED_STATUS = (404, 405, 415, 501)
+
+
+class Batcher(object):
+    """
+    This class defines a batching layer for provenance messages. Messages
+    are grouped by endpoint and posted together to the batch endpoint
+    (the endpoint url followed by ``/batch``) once the batch reaches
+    ``max_size`` messages or its oldest message is older than ``max_delay``
+    seconds. When the server does not support batches, every message of
+    that endpoint is posted by itself.
+
+    Attributes:
+        - max_size (:obj:`int`, optional): Messages per batch.
+        - max_delay (:obj:`float`, optional): Maximum time a message waits
+          in the batch, in seconds.
+        - mode (:obj:`str`, optional): ``array`` to post a JSON array, or
+          ``ndjson`` to post one JSON document per line.
+    """
+    def __init__(self, max_size=100, max_delay=1.0, mode="array"):
+        assert isinstance(max_size, int) and max_size > 0, \
+            "The max_size must be a positive integer."
+        assert mode in ("array", "ndjson"), \
+            "The mode must be array or ndjson."
+        self._max_size = max_size
+        self._max_delay = float(max_delay)
+        self._mode = mode
+        self._batches = {}
+        self._oldest = None
+        self._unsupported = set()
+        self._lock = threading.RLock()
+        self.requests = 0
+        self.sent = 0
+        self.failed = 0
+
+    @property
+    def max_size(self):
+        """Get the number of messages per batch."""
+        return self._max_size
+
+    @property
+    def max_delay(self):
+        """Get the maximum time a message waits in the batch."""
+        return self._max_delay
+
+    @property
+    def mode(self):
+        """Get the batch body format."""
+        return self._mode
+
+    @property
+    def pending(self):
+        """Get the number of buffered messages."""
+        with self._lock:
+            return sum(len(x) for x in self._batches.values())
+
+    def supports_batch(self, url):
+        """ Check whether batches are still attempted for an endpoint.
+
+        Args:
+            - url (:obj:`str`): Endpoint url.
+        """
+        return url not in self._unsupported
+
+    def add(self, url, message):
+        """ Add a message to the batch of its endpoint, flushing it when
+            it is full or too old.
+
+        Args:
+            - url (:obj:`str`): Endpoint that receives the message.
+            - message (:obj:`dict` or :obj:`str`): A provenance
+              specification, or its JSON serialization.
+        """
+        if not isinstance(message, str):
+            message = json.dumps(message)
+        with self._lock:
+            batch = self._batches.setdefault(url, [])
+            batch.append(message)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            if len(batch) >= self._max_size:
+                self._send(url, self._batches.pop(url))
+                if not self._batches:
+                    self._oldest = None
+            self.poll()
+
+    def time_left(self):
+        """ Get the time until the oldest buffered message is due.
+
+        Returns:
+            Seconds until the next time-based flush, or None when the
+            batcher is empty.
+        """
+        with self._lock:
+            if self._oldest is None:
+                return None
+            return max(0.0, self._oldest + self._max_delay - time.monotonic())
+
+    def poll(self):
+        """Flush the batches when the oldest message is due."""
+        left = self.time_left()
+        if left is not None and left <= 0:
+            self.flush()
+
+    def flush(self):
+        """Post every buffered message."""
+        with self._lock:
+            batches, self._batches = self._batches, {}
+            self._oldest = None
+            for url, batch in batches.items():
+                self._send(url, batch)
+
+    def send_batch(self, url, messages):
+        """ Post many messages to an endpoint right away.
+
+        Args:
+            - url (:obj:`str`): Endpoint that receives the messages.
+            - messages (:obj:`list`): Provenance specifications, or their
+              JSON serializations.
+
+        Returns:
+            A :obj:`list` telling, for each message, whether the server
+            accepted it.
+        """
+        assert isinstance(messages, list), \
+            "The messages must be in a list."
+        bodies = [x if isinstance(x, str) else json.dumps(x)
+                  for x in messages]
+        accepted = []
+        with self._lock:
+            for i in range(0, len(bodies), self._max_size):
+                accepted.extend(self._send(url, bodies[i:i + self._max_size]))
+        return accepted
+
+    def _send(self, url, bodies):
+        if not bodies:
+            return []
+        if len(bodies) > 1 and url not in self._unsupported:
+            if self._mode == "ndjson":
+                data, headers = "\n".join(bodies), NDJSON_HEADERS
+            else:
+                data, headers = "[" + ",".join(bodies) + "]", JSON_HEADERS
+            r = self._post(url + "/batch", data, headers)
+            if r is None:
+                self.failed += len(bodies)
+                return [False] * len(bodies)
+            if r.status_code not in UNSUPPORTED_STATUS:
+                self._count(r, len(bodies))
+                return [r.ok] * len(bodies)
+            self._unsupported.add(url)
+        accepted = []
+        for body in bodies:
+            r = self._post(url, body, JSON_HEADERS)
+            if r is None:
+                self.failed += 1
+            else:
+                self._count(r, 1)
+            accepted.append(r is not None and r.ok)
+        return accepted
+
+    def _post(self, url, data, headers):
+        self.requests += 1
+        try:
+            return get_transport().post(url, data=data, headers=headers)
+        except requests.RequestException:
+            return None
+
+    def _count(self, r, n):
+        if r.ok:
+            self.sent += n
+        else:
+            self.failed += n
@@ -1,9 +1,13 @@
-import requests
 import os
 from .ProvenanceObject import ProvenanceObject
 from .transformation import Transformation
+from .backend import get_url_backend
+from . import aio
+from .registry import register_dataflow
 
+# deprecated, set DFA_URL or install an HttpBackend with set_backend
 dfa_url = os.environ.get('DFA_URL', "http://localhost:22000/")
+_default_dfa_url = dfa_url
 
 
 class Dataflow(ProvenanceObject):
@@ -14,6 +18,8 @@ class Dataflow(ProvenanceObject):
         - tag (str): Dataflow tag.
         - transformations (list, optional): Dataflow transformations.
     """
+    __slots__ = ("_transformations",)
+
     def __init__(self, tag, transformations=[]):
         ProvenanceObject.__init__(self, tag)
         self.transformations = transformations
@@ -45,9 +51,34 @@ class Dataflow(ProvenanceObject):
         self._transformations.append(transformation.get_specification())
 
     def save(self):
-        """ Send a post request to the Dataflow Analyzer API to store
-            the dataflow.
+        """ Store the dataflow in the provenance :obj:`Backend`: by default a
+            post request to the Dataflow Analyzer API, see
+            :func:`get_backend`. A url set through the deprecated
+            ``dfa_url`` module global is still honored.
+        """
+        self._backend().save_dataflow(self.get_specification())
+
+    def register(self, force=False):
+        """ Store the dataflow unless the same specification is already
+            stored, see :func:`registry.register_dataflow`, in the same
+            backend as :meth:`save`.
+
+        Args:
+            - force (:obj:`bool`, optional): Store it even when cached.
+
+        Returns:
+            True when the dataflow was stored, False when it was skipped
+            or the backend refused it.
+        """
+        return register_dataflow(self, force=force, backend=self._backend())
+
+    @staticmethod
+    def _backend():
+        url = dfa_url if dfa_url != _default_dfa_url else None
+        return get_url_backend(url)
+
+    async def asave(self):
+        """ Store the dataflow like :meth:`save`, without blocking the event
+            loop.
         """
-        url = dfa_url + '/pde/dataflow/json'
-        r = requests.post(url, json=self.get_specification())      
-        print(r.status_code)
+        await aio.save_dataflow(self.get_specification())
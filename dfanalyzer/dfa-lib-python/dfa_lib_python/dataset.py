@@ -10,6 +10,7 @@ class DataSet(ProvenanceObject):
         - tag (str): Dataset tag.
         - elements (:obj:`Element`): Dataset Elements
     """
+    __slots__ = ("_elements",)
 
     def __init__(self, tag, elements):
         ProvenanceObject.__init__(self, tag)
@@ -9,6 +9,7 @@ class Dependency(ProvenanceObject):
         - tags (list): Tags of the dependent tasks.
         - ids (list): Ids of the dependent tasks.
     """
+    __slots__ = ("_tags", "_ids")
 
     def __init__(self, tags, ids):
         ProvenanceObject.__init__(self, "")
@@ -1,6 +1,14 @@
+from .artifact import np, get_artifact_store
+
+ndarray = np.ndarray if np is not None else ()
+
+
 class Element(object):
     """
-    This class defines a dataset element.
+    This class defines a dataset element. Numpy arrays are not
+    stringified: small ones are sent in full as JSON lists and large ones
+    are offloaded to the :obj:`ArtifactStore`, leaving only their hash,
+    shape and dtype in the element.
 
     Attributes:
         - values (list): Element values.
@@ -18,4 +26,6 @@ class Element(object):
     def values(self, values):
         assert isinstance(values, list), \
             "The values must be in a list."
-        self._values = [str(x) for x in values]
+        self._values = [get_artifact_store().encode(x)
+                        if isinstance(x, ndarray) else str(x)
+                        for x in values]
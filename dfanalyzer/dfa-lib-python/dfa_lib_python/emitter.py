@@ -0,0 +1,421 @@
+import atexit
+import json
+import os
+import queue
+import threading
+import warnings
+from collections import Counter, deque
+
+import requests
+
+from .batch import Batcher
+from .spool import Spool
+from .transport import get_transport
+
+_STOP = object()
+_FLUSH = object()
+
+POLICIES = ("block", "drop_oldest", "drop_priority", "spill")
+
+# per-round detail goes first, setup and aggregation records last
+DEFAULT_PRIORITIES = {
+    "getmodelparams": 0,
+    "clienttraining": 1,
+    "clientvalidation": 2,
+    "assemble": 3,
+    "loaddata": 3,
+    "initializeclient": 3,
+    "finalizeclient": 3,
+}
+
+
+class _BoundedQueue(queue.Queue):
+    """
+    A :obj:`queue.Queue` whose messages carry a rank, so that a full queue
+    can evict the oldest message of the lowest rank in constant time.
+    Items put without a rank, e.g. the worker commands, are never evicted.
+    Taken and evicted entries are only marked dead; they are dropped from
+    the front of their rank as messages are taken, and the queue is
+    compacted when dead entries outnumber the live ones, so memory stays
+    proportional to ``maxsize``.
+    """
+
+    def _init(self, maxsize):
+        self.queue = deque()
+        self._ranks = {}
+        self._live = 0
+
+    def _qsize(self):
+        return self._live
+
+    def _put(self, item, rank=None):
+        entry = [item, True, rank]
+        self.queue.append(entry)
+        if rank is not None:
+            self._ranks.setdefault(rank, deque()).append(entry)
+        self._live += 1
+
+    def _get(self):
+        while True:
+            entry = self.queue.popleft()
+            if entry[1]:
+                entry[1] = False
+                self._live -= 1
+                if entry[2] is not None:
+                    # the oldest live entry of its rank, drop it and the
+                    # dead entries before it
+                    entries = self._ranks[entry[2]]
+                    while entries and not entries[0][1]:
+                        entries.popleft()
+                    if not entries:
+                        del self._ranks[entry[2]]
+                return entry[0]
+
+    def offer(self, item, rank):
+        """ Put a message, evicting a queued one of a lower or equal rank
+            when the queue is full.
+
+        Returns:
+            The evicted item, ``item`` itself when every queued message
+            ranks higher, or None when nothing was evicted.
+        """
+        with self.not_full:
+            evicted = None
+            if 0 < self.maxsize <= self._qsize():
+                evicted = self._evict(rank)
+                if evicted is None:
+                    return item
+            self._put(item, rank)
+            if evicted is None:
+                self.unfinished_tasks += 1
+            self.not_empty.notify()
+            return evicted
+
+    def _evict(self, rank):
+        for key in sorted(self._ranks):
+            if key > rank:
+                break
+            entries = self._ranks[key]
+            while entries:
+                entry = entries.popleft()
+                if entry[1]:
+                    entry[1] = False
+                    self._live -= 1
+                    item, entry[0] = entry[0], None
+                    if not entries:
+                        del self._ranks[key]
+                    if len(self.queue) > 2 * self._live + 64:
+                        self.queue = deque(x for x in self.queue if x[1])
+                    return item
+        return None
+
+
+class Emitter(object):
+    """
+    This class defines a background emitter. Messages are serialized
+    when they are enqueued and posted to the Dataflow Analyzer API by a
+    worker thread, so the caller only pays the cost of an enqueue.
+
+    The queue holds at most ``maxsize`` messages. When it is full, the
+    ``policy`` decides: ``block`` waits until there is room, ``drop_oldest``
+    discards the oldest queued message, ``drop_priority`` discards the
+    oldest message of the lowest priority (the new one when every queued
+    message ranks higher; RUNNING states rank below the final state of the
+    same transformation) and ``spill`` appends the message to a
+    :obj:`Spool` to be replayed later. Lost messages are counted in
+    :attr:`dropped` and spilled ones in :attr:`spilled`.
+
+    Attributes:
+        - maxsize (:obj:`int`, optional): Maximum number of pending messages.
+        - batcher (:obj:`Batcher`, optional): When given, the worker groups
+          messages with the batcher instead of posting them one by one.
+        - policy (:obj:`str`, optional): ``block``, ``drop_oldest``,
+          ``drop_priority`` or ``spill``.
+        - priorities (:obj:`dict`, optional): Priority of each
+          transformation tag for ``drop_priority``, higher is kept longer.
+          Defaults to :data:`DEFAULT_PRIORITIES`; other tags rank 1.
+        - spool (:obj:`Spool`, optional): Spool of the ``spill`` policy.
+    """
+    def __init__(self, maxsize=10000, batcher=None, policy="block",
+                 priorities=None, spool=None):
+        assert isinstance(maxsize, int) and maxsize > 0, \
+            "The maxsize must be a positive integer."
+        assert batcher is None or isinstance(batcher, Batcher), \
+            "The batcher must be valid."
+        assert policy in POLICIES, \
+            "The policy must be block, drop_oldest, drop_priority or spill."
+        assert policy != "spill" or isinstance(spool, Spool), \
+            "The spill policy requires a spool."
+        self._queue = _BoundedQueue(maxsize)
+        self._batcher = batcher
+        self._policy = policy
+        self._priorities = dict(DEFAULT_PRIORITIES if priorities is None
+                                else priorities)
+        self._spool = spool
+        self._closed = False
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.dropped_by_transformation = Counter()
+        self._worker = threading.Thread(target=self._run,
+                                        name="dfa-emitter",
+                                        daemon=True)
+        self._worker.start()
+
+    @property
+    def batcher(self):
+        """Get the batcher used by the worker."""
+        return self._batcher
+
+    @property
+    def pending(self):
+        """Get the number of messages not yet sent."""
+        pending = self._queue.unfinished_tasks
+        if self._batcher is not None:
+            pending += self._batcher.pending
+        return pending
+
+    @property
+    def closed(self):
+        """Get whether the emitter was closed."""
+        return self._closed
+
+    @property
+    def policy(self):
+        """Get the policy applied when the queue is full."""
+        return self._policy
+
+    @property
+    def spool(self):
+        """Get the spool of the spill policy."""
+        return self._spool
+
+    def stats(self):
+        """ Get the emission counters, to monitor the provenance loss.
+
+        Returns:
+            A :obj:`dict` with the ``sent``, ``failed``, ``dropped``,
+            ``spilled`` and ``pending`` counts, and ``dropped_by`` the
+            dropped counts per transformation. Messages posted by the
+            batcher are included in ``sent`` and ``failed``.
+        """
+        sent, failed = self.sent, self.failed
+        if self._batcher is not None:
+            sent += self._batcher.sent
+            failed += self._batcher.failed
+        with self._lock:
+            return {"sent": sent, "failed": failed,
+                    "dropped": self.dropped, "spilled": self.spilled,
+                    "pending": self.pending,
+                    "dropped_by": dict(self.dropped_by_transformation)}
+
+    def emit(self, url, message):
+        """ Enqueue a message to be posted to the Dataflow Analyzer API.
+
+        Args:
+            - url (:obj:`str`): Endpoint that receives the message.
+            - message (:obj:`dict`): A provenance specification.
+        """
+        assert not self._closed, "The emitter is closed."
+        item = (url, json.dumps(message))
+        if self._policy == "block":
+            self._queue.put(item)
+        elif self._policy == "spill":
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                self._spool.append(*item)
+                with self._lock:
+                    self.spilled += 1
+        else:
+            evicted = self._queue.offer(item, self._rank(message))
+            if evicted is not None:
+                self._drop(evicted)
+
+    def _rank(self, message):
+        if self._policy == "drop_oldest":
+            return 0
+        transformation = message.get("transformation", "")
+        final = message.get("status") != "RUNNING"
+        return 2 * self._priorities.get(transformation, 1) + final
+
+    def _drop(self, item):
+        transformation = json.loads(item[1]).get("transformation", "")
+        with self._lock:
+            self.dropped += 1
+            self.dropped_by_transformation[transformation] += 1
+            first = self.dropped == 1
+        if first:
+            warnings.warn("The provenance queue is full, records are dropped"
+                          " ({0} policy).".format(self._policy))
+
+    def flush(self, timeout=None):
+        """ Wait until every enqueued message was sent.
+
+        Args:
+            - timeout (:obj:`float`, optional): Maximum time to wait, in seconds.
+
+        Returns:
+            True if the queue was drained, False on timeout.
+        """
+        if self._batcher is not None and not self._closed:
+            self._queue.put(_FLUSH)
+        done = self._queue.all_tasks_done
+        with done:
+            return done.wait_for(lambda: self._queue.unfinished_tasks == 0,
+                                 timeout)
+
+    def close(self, timeout=None):
+        """ Drain the pending messages and stop the worker thread.
+
+        Args:
+            - timeout (:obj:`float`, optional): Maximum time to wait, in seconds.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._worker.join(timeout)
+        if self._spool is not None:
+            self._spool.close()
+
+    def _run(self):
+        batcher = self._batcher
+        while True:
+            try:
+                timeout = batcher.time_left() if batcher is not None else None
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                batcher.poll()
+                continue
+            try:
+                if item is _STOP or item is _FLUSH:
+                    if batcher is not None:
+                        batcher.flush()
+                    if item is _STOP:
+                        return
+                elif batcher is not None:
+                    batcher.add(*item)
+                else:
+                    self._send(*item)
+            finally:
+                self._queue.task_done()
+
+    def _send(self, url, body):
+        try:
+            r = get_transport().post(url, data=body,
+                                     headers={"Content-Type": "application/json"})
+        except requests.RequestException:
+            self.failed += 1
+            return
+        if r.ok:
+            self.sent += 1
+        else:
+            self.failed += 1
+
+
+def parse_priorities(spec):
+    """ Parse transformation priorities written as ``tag=priority`` pairs
+        separated by commas, e.g. ``assemble=3,getmodelparams=0``.
+
+    Args:
+        - spec (:obj:`str`): Priorities specification.
+
+    Returns:
+        A :obj:`dict` of priorities by lowercase transformation tag.
+    """
+    priorities = {}
+    for pair in spec.split(","):
+        if pair.strip():
+            tag, _, priority = pair.partition("=")
+            priorities[tag.strip().lower()] = int(priority)
+    return priorities
+
+
+_emitter = None
+_lock = threading.Lock()
+
+
+def get_emitter():
+    """ Get the shared emitter used by :obj:`Task`.
+
+    Asynchronous emission is opt-in: the shared emitter is created on first
+    use when the DFA_ASYNC environment variable is set, or installed with
+    :func:`set_emitter`. Setting DFA_BATCH_SIZE above 1 makes the shared
+    emitter group messages with a :obj:`Batcher`, flushed every
+    DFA_BATCH_DELAY seconds at most. DFA_ASYNC_POLICY selects the policy
+    of a full queue, DFA_ASYNC_PRIORITIES overrides priorities as
+    ``tag=priority`` pairs separated by commas, and DFA_ASYNC_SPILL_DIR is
+    the spool directory of the ``spill`` policy (default ``dfa_spill``).
+
+    Returns:
+        The shared :obj:`Emitter`, or None when messages are sent synchronously.
+    """
+    global _emitter
+    if _emitter is None and \
+            os.environ.get('DFA_ASYNC', '').lower() in ('1', 'true', 'yes'):
+        with _lock:
+            if _emitter is None:
+                env = os.environ
+                maxsize = int(env.get('DFA_ASYNC_MAXSIZE', 10000))
+                batch_size = int(env.get('DFA_BATCH_SIZE', 1))
+                batcher = None
+                if batch_size > 1:
+                    batcher = Batcher(
+                        max_size=batch_size,
+                        max_delay=float(env.get('DFA_BATCH_DELAY', 1.0)),
+                        mode=env.get('DFA_BATCH_MODE', 'array'))
+                policy = env.get('DFA_ASYNC_POLICY', 'block').lower()
+                priorities = None
+                if env.get('DFA_ASYNC_PRIORITIES'):
+                    priorities = dict(DEFAULT_PRIORITIES)
+                    priorities.update(
+                        parse_priorities(env['DFA_ASYNC_PRIORITIES']))
+                spool = None
+                if policy == "spill":
+                    spool = Spool(env.get('DFA_ASYNC_SPILL_DIR', 'dfa_spill'))
+                _emitter = Emitter(maxsize, batcher, policy, priorities,
+                                   spool)
+    return _emitter
+
+
+def set_emitter(emitter):
+    """ Install the shared emitter, closing the previous one.
+
+    Args:
+        - emitter (:obj:`Emitter`): The new emitter, or None to send
+          messages synchronously.
+    """
+    global _emitter
+    assert emitter is None or isinstance(emitter, Emitter), \
+        "The emitter must be valid."
+    with _lock:
+        previous, _emitter = _emitter, emitter
+    if previous is not None and previous is not emitter:
+        previous.close()
+
+
+def flush(timeout=None):
+    """ Wait until the shared emitter has sent every pending message.
+
+    Args:
+        - timeout (:obj:`float`, optional): Maximum time to wait, in seconds.
+    """
+    if _emitter is None:
+        return True
+    return _emitter.flush(timeout)
+
+
+def close(timeout=None):
+    """ Drain and stop the shared emitter.
+
+    Args:
+        - timeout (:obj:`float`, optional): Maximum time to wait, in seconds.
+    """
+    if _emitter is not None:
+        _emitter.close(timeout)
+
+
+atexit.register(close)
@@ -0,0 +1,261 @@
+import hashlib
+import json
+import os
+import signal
+import subprocess
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from time import perf_counter
+
+CHUNK_SIZE = 1 << 20
+
+
+def file_digest(path):
+    """ Get the hash of a file content.
+
+    Args:
+        - path (:obj:`str`): The file.
+
+    Returns:
+        The sha256 hex digest of its content.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ExtractionResult(object):
+    """
+    This class defines the outcome of one RDE/RDI invocation.
+
+    Attributes:
+        - command (:obj:`str`): The command line executed.
+        - source (:obj:`str`): The file read by the command, or None.
+        - key (:obj:`str`): Index key of the source content, or None.
+        - returncode (:obj:`int`): Exit code, None when the command timed
+          out or was skipped.
+        - duration (:obj:`float`): Wall time of the command, in seconds.
+        - output (:obj:`str`): Combined stdout and stderr of the command.
+        - skipped (:obj:`bool`): Whether the source content was already
+          indexed, or processed by an earlier runner of the same batch, so
+          the command was not executed.
+    """
+    def __init__(self, command, source=None, key=None, returncode=None,
+                 duration=0.0, output="", skipped=False):
+        self.command = command
+        self.source = source
+        self.key = key
+        self.returncode = returncode
+        self.duration = duration
+        self.output = output
+        self.skipped = skipped
+
+    @property
+    def ok(self):
+        """Whether the command succeeded or was skipped."""
+        return self.skipped or self.returncode == 0
+
+    def __repr__(self):
+        return "ExtractionResult({0!r}, returncode={1}, duration={2:.3f}, " \
+            "skipped={3})".format(self.source or self.command,
+                                  self.returncode, self.duration,
+                                  self.skipped)
+
+
+class ExtractionIndex(object):
+    """
+    This class defines the index of sources already processed: a JSON
+    lines file with one record per successful invocation, keyed by the
+    cartridge, method and tag of the extractor and the content hash of
+    its source file. Records are only appended, so concurrent workers and
+    interrupted runs never corrupt the entries already written.
+
+    Attributes:
+        - path (:obj:`str`): Index file.
+    """
+    def __init__(self, path):
+        assert isinstance(path, str), \
+            "The path must be a string."
+        self._path = path
+        self._lock = threading.Lock()
+        self._records = None
+
+    @property
+    def path(self):
+        """Get the index file."""
+        return self._path
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._load()
+
+    def get(self, key):
+        """ Get the record of an indexed source.
+
+        Args:
+            - key (:obj:`str`): Index key.
+
+        Returns:
+            The record, or None when the source is not indexed.
+        """
+        with self._lock:
+            return self._load().get(key)
+
+    def put(self, key, record):
+        """ Record a processed source.
+
+        Args:
+            - key (:obj:`str`): Index key.
+            - record (:obj:`dict`): JSON serializable details of the run.
+        """
+        record = dict(record, key=key)
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            self._load()[key] = record
+            directory = os.path.dirname(os.path.abspath(self._path))
+            os.makedirs(directory, exist_ok=True)
+            with open(self._path, "a") as f:
+                f.write(line)
+
+    def _load(self):
+        if self._records is None:
+            self._records = {}
+            try:
+                with open(self._path) as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            # a torn last line only costs one extraction
+                            continue
+                        self._records[record["key"]] = record
+            except OSError:
+                pass
+        return self._records
+
+
+class ExtractionPool(object):
+    """
+    This class defines a pool running many :obj:`RawDataExtractor` and
+    :obj:`RawDataIndexer` invocations concurrently. Each invocation is a
+    separate RDE process, so worker threads only wait on the processes
+    and hash the sources. Sources whose content was already processed by
+    the same extractor are skipped when an :obj:`ExtractionIndex` is given;
+    a runner whose content is processed by an earlier runner of the same
+    batch waits for it and reports its failure, if any.
+
+    Attributes:
+        - max_workers (:obj:`int`, optional): Concurrent processes,
+          defaults to the number of CPUs.
+        - index (:obj:`ExtractionIndex`, optional): Index of processed
+          sources.
+        - timeout (:obj:`float`, optional): Time limit of each process,
+          in seconds.
+    """
+    def __init__(self, max_workers=None, index=None, timeout=None):
+        max_workers = max_workers or os.cpu_count() or 1
+        assert isinstance(max_workers, int) and max_workers > 0, \
+            "The max_workers must be a positive integer."
+        assert index is None or isinstance(index, ExtractionIndex), \
+            "The index must be valid."
+        self._max_workers = max_workers
+        self._index = index
+        self._timeout = timeout
+        self._lock = threading.Lock()
+
+    @property
+    def index(self):
+        """Get the index of processed sources."""
+        return self._index
+
+    def run(self, runners):
+        """ Execute the runners and wait for all of them.
+
+        Args:
+            - runners (:obj:`list`): :obj:`RawDataExtractor` or
+              :obj:`RawDataIndexer` objects.
+
+        Returns:
+            A :obj:`list` of :obj:`ExtractionResult`, in the order of the
+            runners.
+        """
+        # the first runner of each content, per call
+        claimed = {}
+        with ThreadPoolExecutor(max_workers=self._max_workers,
+                                thread_name_prefix="dfa-rde") as executor:
+            return list(executor.map(lambda x: self._execute(x, claimed),
+                                     runners))
+
+    def _execute(self, runner, claimed):
+        command = runner.get_command_line()
+        source = runner.source
+        if self._index is None or source is None \
+                or not os.path.isfile(source):
+            return self._invoke(command, source)
+        key = "{0}:{1}:{2}:{3}".format(runner.cartridge, runner.method,
+                                       runner.tag, file_digest(source))
+        with self._lock:
+            # the same content twice in one batch is processed once
+            first = claimed.get(key)
+            if first is None:
+                future = claimed[key] = Future()
+        if first is not None:
+            result = first.result()
+            if result.ok:
+                return ExtractionResult(command, source, key, skipped=True)
+            return ExtractionResult(command, source, key, result.returncode,
+                                    output=result.output)
+        try:
+            if key in self._index:
+                result = ExtractionResult(command, source, key, skipped=True)
+            else:
+                result = self._invoke(command, source, key)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        future.set_result(result)
+        return result
+
+    def _invoke(self, command, source, key=None):
+        start = perf_counter()
+        process = subprocess.Popen(command, shell=True,
+                                   stdout=subprocess.PIPE,
+                                   stderr=subprocess.STDOUT,
+                                   start_new_session=True)
+        try:
+            output, _ = process.communicate(timeout=self._timeout)
+            returncode = process.returncode
+        except subprocess.TimeoutExpired:
+            # kill the shell and the RDE process it started
+            os.killpg(process.pid, signal.SIGKILL)
+            output, _ = process.communicate()
+            returncode = None
+        result = ExtractionResult(command, source, key, returncode,
+                                  perf_counter() - start,
+                                  output.decode("utf-8", "replace"))
+        if key is not None and returncode == 0:
+            self._index.put(key, {"source": source,
+                                  "duration": result.duration})
+        return result
+
+
+def run_extractors(runners, max_workers=None, index=None, timeout=None):
+    """ Execute RDE/RDI runners in an :obj:`ExtractionPool`.
+
+    Args:
+        - runners (:obj:`list`): :obj:`RawDataExtractor` or
+          :obj:`RawDataIndexer` objects.
+        - max_workers (:obj:`int`, optional): Concurrent processes.
+        - index (:obj:`ExtractionIndex` or :obj:`str`, optional): Index of
+          processed sources, or the path of its file.
+        - timeout (:obj:`float`, optional): Time limit of each process.
+
+    Returns:
+        A :obj:`list` of :obj:`ExtractionResult`, in the order of the
+        runners.
+    """
+    if isinstance(index, str):
+        index = ExtractionIndex(index)
+    return ExtractionPool(max_workers, index, timeout).run(runners)
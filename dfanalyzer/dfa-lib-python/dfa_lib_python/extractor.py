@@ -12,6 +12,8 @@ class Extractor(ProvenanceObject):
         - cartridge (:obj:`ExtractorCartridge`): Extractor Cartridge.
         - extension (:obj:`ExtractorExtension`): Extractor Extension.
     """
+    __slots__ = ("_cartridge", "_extension", "_setTag", "_transformationTag",
+                 "_dataflowTag")
 
     def __init__(self, tag, cartridge, extension):
         ProvenanceObject.__init__(self, tag)
@@ -9,6 +9,7 @@ class File(ProvenanceObject):
         - path (str): File path.
         - name (str): File name.
     """
+    __slots__ = ("_path", "_name")
 
     def __init__(self, path, name):
         ProvenanceObject.__init__(self, name)
@@ -0,0 +1,147 @@
+import gzip
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        mock = self.server.mock
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        wire_bytes = len(body)
+        encoding = self.headers.get("Content-Encoding", "identity").lower()
+        if encoding not in ("identity",) + mock.encodings:
+            self._reply(415)
+            return
+        if encoding == "gzip":
+            body = gzip.decompress(body)
+        elif encoding == "zstd":
+            body = zstandard.ZstdDecompressor().decompress(body)
+        if mock.latency > 0:
+            time.sleep(mock.latency)
+        path = self.path.rstrip("/")
+        batch = path.endswith("/batch")
+        if batch:
+            path = path[:-len("/batch")]
+        if batch and not mock.batch:
+            self._reply(404)
+            return
+        try:
+            text = body.decode("utf-8")
+            if not batch:
+                messages = [json.loads(text)]
+            elif self.headers.get("Content-Type") == "application/x-ndjson":
+                messages = [json.loads(x) for x in text.splitlines() if x]
+            else:
+                messages = json.loads(text)
+        except ValueError:
+            self._reply(400)
+            return
+        with mock.lock:
+            mock.requests += 1
+            mock.bytes_received += wire_bytes
+            mock.bytes_decoded += len(body)
+            mock.messages.extend((path, x) for x in messages)
+        self._reply(200)
+
+    def do_GET(self):
+        mock = self.server.mock
+        path = self.path.rstrip("/")
+        prefix = "/pde/dataflow/json/"
+        if not path.startswith(prefix):
+            self._reply(404)
+            return
+        tag = unquote(path[len(prefix):])
+        with mock.lock:
+            found = any(p == prefix[:-1] and x.get("tag") == tag
+                        for p, x in mock.messages)
+        self._reply(200 if found else 404)
+
+    def _reply(self, status):
+        self.send_response(status)
+        if self.server.mock.encodings:
+            self.send_header("Accept-Encoding",
+                             ", ".join(self.server.mock.encodings))
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockDfAnalyzer(object):
+    """
+    This class defines a local stand-in for the Dataflow Analyzer API. It
+    accepts the dataflow and task endpoints, and their ``/batch``
+    variants, and keeps every received message in memory, so the library
+    can be tested and benchmarked offline. ``GET /pde/dataflow/json/<tag>``
+    answers 200 for a received dataflow and 404 otherwise.
+
+    Attributes:
+        - port (:obj:`int`, optional): Port to listen on, 0 picks a free port.
+        - latency (:obj:`float`, optional): Delay added to every request,
+          in seconds.
+        - batch (:obj:`bool`, optional): Whether the batch endpoints are
+          supported. When False they answer 404.
+        - encodings (:obj:`tuple`, optional): Request body codings accepted
+          and listed in the ``Accept-Encoding`` response header, by
+          default ``gzip`` and, when installed, ``zstd``. Other codings
+          answer 415.
+    """
+    def __init__(self, port=0, latency=0.0, batch=True, encodings=None):
+        if encodings is None:
+            encodings = ("gzip", "zstd") if zstandard is not None \
+                else ("gzip",)
+        self.latency = float(latency)
+        self.batch = batch
+        self.encodings = tuple(encodings)
+        self.lock = threading.Lock()
+        self.messages = []
+        self.requests = 0
+        self.bytes_received = 0
+        self.bytes_decoded = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self._server.daemon_threads = True
+        self._server.mock = self
+        self._thread = None
+
+    @property
+    def url(self):
+        """Get the base url, to be used as DFA_URL."""
+        return "http://127.0.0.1:{0}".format(self._server.server_port)
+
+    def start(self):
+        """Serve requests from a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name="dfa-mock-server",
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving requests."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset(self):
+        """Forget the received messages and counters."""
+        with self.lock:
+            self.messages = []
+            self.requests = 0
+            self.bytes_received = 0
+            self.bytes_decoded = 0
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
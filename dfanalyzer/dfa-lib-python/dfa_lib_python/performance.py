@@ -1,6 +1,12 @@
+import sys
 from .ProvenanceObject import ProvenanceObject
 from .method_type import MethodType
 
+try:
+    import resource
+except ImportError:
+    resource = None
+
 
 class Performance(ProvenanceObject):
     """
@@ -11,13 +17,26 @@ class Performance(ProvenanceObject):
         - end_time (:obj:`str`): time when the task has ended
         - method (:obj:`MethodType`, optional): method use to measure
         - description (:obj:`str`, optional): description of the performance measure
+        - duration_ns (:obj:`int`, optional): monotonic wall-clock duration, in nanoseconds
+        - cpu_time_ns (:obj:`int`, optional): process CPU time, in nanoseconds
+        - peak_rss (:obj:`int`, optional): peak resident set size of the process, in bytes
+        - threads (:obj:`int`, optional): number of live threads
     """
-    def __init__(self, start_time, end_time, method="", description=""):
+    __slots__ = ("_startTime", "_endTime", "_method", "_description",
+                 "_durationNs", "_cpuTimeNs", "_peakRss", "_threads")
+
+    def __init__(self, start_time, end_time, method="", description="",
+                 duration_ns=None, cpu_time_ns=None, peak_rss=None,
+                 threads=None):
         ProvenanceObject.__init__(self, "")
         self._startTime = start_time
         self._endTime = end_time
         self._method = method
         self._description = description
+        self._durationNs = "" if duration_ns is None else str(duration_ns)
+        self._cpuTimeNs = "" if cpu_time_ns is None else str(cpu_time_ns)
+        self._peakRss = "" if peak_rss is None else str(peak_rss)
+        self._threads = "" if threads is None else str(threads)
 
     @property
     def startTime(self):
@@ -62,3 +81,36 @@ class Performance(ProvenanceObject):
         assert isinstance(description, str), \
             "The performance description must be a string."
         self._description = description
+
+    @property
+    def durationNs(self):
+        """Get the wall-clock duration, in nanoseconds."""
+        return int(self._durationNs) if self._durationNs else None
+
+    @property
+    def cpuTimeNs(self):
+        """Get the process CPU time, in nanoseconds."""
+        return int(self._cpuTimeNs) if self._cpuTimeNs else None
+
+    @property
+    def peakRss(self):
+        """Get the peak resident set size, in bytes."""
+        return int(self._peakRss) if self._peakRss else None
+
+    @property
+    def threads(self):
+        """Get the number of live threads."""
+        return int(self._threads) if self._threads else None
+
+
+def peak_rss():
+    """ Get the peak resident set size of the process.
+
+    Returns:
+        The peak RSS in bytes, or None where it is not available.
+    """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss if sys.platform == "darwin" else rss * 1024
@@ -9,6 +9,7 @@ class Program(ProvenanceObject):
         - name (str): Program name.
         - path (str): Program path.
     """
+    __slots__ = ("_path", "_name", "_transformationTag", "_dataflowTag")
 
     def __init__(self, name, path):
         ProvenanceObject.__init__(self, "")
@@ -11,8 +11,10 @@ class RawDataExtractor(object):
         - cartridge (:obj:`ExtractorCartridge`): An :obj:`ExtractorCartridge`.
         - command_line (:obj:`str`): A command line to be executed.
         - attributes (:obj:`list`): A :obj:`list` containing :obj:`Attribute`.
+        - source (:obj:`str`, optional): The file read by the command, used
+          by :obj:`ExtractionPool` to skip contents already extracted.
     """
-    def __init__(self, cartridge, command_line, attributes):
+    def __init__(self, cartridge, command_line, attributes, source=None):
         self._command_line = command_line
         assert isinstance(cartridge, ExtractorCartridge), \
             "The attributes type must be a list."
@@ -24,6 +26,27 @@ class RawDataExtractor(object):
         assert isinstance(attributes, list), \
             "The attributes type must be a list."
         self._attributes = attributes
+        self._source = source
+
+    @property
+    def cartridge(self):
+        """Get the extractor cartridge."""
+        return self._cartridge
+
+    @property
+    def method(self):
+        """Get the extractor method."""
+        return self._method
+
+    @property
+    def tag(self):
+        """Get the extractor tag."""
+        return self._tag
+
+    @property
+    def source(self):
+        """Get the file read by the command, or None."""
+        return self._source
 
     def get_attributes(self):
         s = ","
@@ -49,5 +72,5 @@ class RawDataExtractor(object):
                                                               attributes)
 
     def run(self):
-        """Execute the RDE."""
-        subprocess.call(self.get_command_line())
\ No newline at end of file
+        """Execute the RDE and return its exit code."""
+        return subprocess.call(self.get_command_line(), shell=True)
@@ -29,6 +29,27 @@ class RawDataIndexer(object):
         self._path = path
         self._file_name_with_extracted_data = file_name_with_extracted_data
         self._extra_arguments = extra_arguments
+        self._source = os.path.join(path, file_name_with_extracted_data)
+
+    @property
+    def cartridge(self):
+        """Get the extractor cartridge."""
+        return self._cartridge
+
+    @property
+    def method(self):
+        """Get the extractor method."""
+        return self._method
+
+    @property
+    def tag(self):
+        """Get the extractor tag."""
+        return self._tag
+
+    @property
+    def source(self):
+        """Get the file with the extracted data."""
+        return self._source
 
     def get_attributes(self):
         s = ","
@@ -46,7 +67,6 @@ class RawDataIndexer(object):
         file_name_with_extracted_data = self._file_name_with_extracted_data
         attributes = self.get_attributes()
         extra_arguments = self._extra_arguments
-        print(extra_arguments)
         return "{0}/bin/RDE {1}:{2} {3} {4} \
         {5} {6} {7}".format(dfanalyzer_dir,
                             cartridge,
@@ -58,5 +78,5 @@ class RawDataIndexer(object):
                             extra_arguments)
 
     def run(self):
-        """Execute the RDI."""
-        subprocess.call(self.get_command_line())
\ No newline at end of file
+        """Execute the RDI and return its exit code."""
+        return subprocess.call(self.get_command_line(), shell=True)
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import threading
+
+from .backend import get_backend
+
+
+def specification_digest(message):
+    """ Get the hash of a specification, independent of its key order.
+
+    Args:
+        - message (:obj:`dict`): A provenance specification.
+
+    Returns:
+        The sha256 hex digest of its canonical JSON serialization.
+    """
+    canonical = json.dumps(message, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class DataflowCache(object):
+    """
+    This class defines the local cache of registered dataflows: a JSON
+    file mapping each backend location and dataflow tag to the digest of
+    the last specification stored there. The file is replaced atomically,
+    so concurrent launches never read a partial cache.
+
+    Attributes:
+        - path (:obj:`str`): Cache file.
+    """
+    def __init__(self, path):
+        assert isinstance(path, str), \
+            "The path must be a string."
+        self._path = path
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        """Get the cache file."""
+        return self._path
+
+    def get(self, location, tag):
+        """ Get the digest of the last dataflow stored.
+
+        Args:
+            - location (:obj:`str`): Backend location.
+            - tag (:obj:`str`): Dataflow tag.
+
+        Returns:
+            The digest, or None when the dataflow is not cached.
+        """
+        with self._lock:
+            return self._read().get(location, {}).get(tag)
+
+    def put(self, location, tag, digest):
+        """ Record the digest of a stored dataflow.
+
+        Args:
+            - location (:obj:`str`): Backend location.
+            - tag (:obj:`str`): Dataflow tag.
+            - digest (:obj:`str`): Specification digest, or None to forget
+              the dataflow.
+        """
+        with self._lock:
+            entries = self._read()
+            tags = entries.setdefault(location, {})
+            if digest is None:
+                tags.pop(tag, None)
+            else:
+                tags[tag] = digest
+            directory = os.path.dirname(os.path.abspath(self._path))
+            os.makedirs(directory, exist_ok=True)
+            temporary = "{0}.{1}.tmp".format(self._path, os.getpid())
+            with open(temporary, "w") as f:
+                json.dump(entries, f, indent=2, sort_keys=True)
+            os.replace(temporary, self._path)
+
+    def _read(self):
+        try:
+            with open(self._path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # a missing or corrupted cache only costs a registration
+            return {}
+
+
+def register_dataflow(dataflow, force=False, verify=True, cache=None,
+                      backend=None):
+    """ Store a dataflow unless the same specification is already stored.
+
+    The specification digest is compared with the local cache. On a match
+    the backend is asked whether it still holds the dataflow, e.g. after
+    the Dataflow Analyzer database was reset: a definite no registers it
+    again, while a backend that cannot tell is trusted to still hold it.
+
+    Args:
+        - dataflow (:obj:`Dataflow`): The dataflow.
+        - force (:obj:`bool`, optional): Store it even when cached.
+        - verify (:obj:`bool`, optional): Ask the backend on a cache hit.
+        - cache (:obj:`DataflowCache`, optional): Defaults to
+          :func:`get_dataflow_cache`.
+        - backend (:obj:`Backend`, optional): Where to store it, defaults
+          to :func:`get_backend`.
+
+    Returns:
+        True when the dataflow was stored, False when it was skipped or
+        the backend refused it.
+    """
+    cache = cache if cache is not None else get_dataflow_cache()
+    backend = backend if backend is not None else get_backend()
+    message = dataflow.get_specification()
+    tag = message.get("tag")
+    digest = specification_digest(message)
+    if not force and cache.get(backend.location, tag) == digest:
+        if not verify or backend.has_dataflow(tag) is not False:
+            return False
+    stored = backend.save_dataflow(message) is not False
+    cache.put(backend.location, tag, digest if stored else None)
+    return stored
+
+
+_cache = None
+_lock = threading.Lock()
+
+
+def get_dataflow_cache():
+    """ Get the cache used by :func:`register_dataflow`.
+
+    The shared cache is created on first use in the DFA_DATAFLOW_CACHE
+    file (default ``.dfa_dataflows.json``).
+
+    Returns:
+        The shared :obj:`DataflowCache`.
+    """
+    global _cache
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                _cache = DataflowCache(os.environ.get(
+                    'DFA_DATAFLOW_CACHE', '.dfa_dataflows.json'))
+    return _cache
+
+
+def set_dataflow_cache(cache):
+    """ Install the cache used by :func:`register_dataflow`.
+
+    Args:
+        - cache (:obj:`DataflowCache`): The new cache, or None to rebuild
+          it from the environment on next use.
+    """
+    global _cache
+    assert cache is None or isinstance(cache, DataflowCache), \
+        "The cache must be valid."
+    _cache = cache
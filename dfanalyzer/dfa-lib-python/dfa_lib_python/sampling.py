@@ -0,0 +1,228 @@
+import os
+import threading
+from enum import IntEnum
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class Verbosity(IntEnum):
+    """ This class is a enum with the provenance verbosity levels. A task
+        is recorded when its level is at most the configured verbosity.
+    """
+    OFF = 0
+    SETUP = 1
+    ROUND = 2
+    DETAIL = 3
+
+
+class Always(object):
+    """
+    This class defines the sampling policy that records every round.
+    Policies whose decision waits for the task metric are ``deferred``:
+    their tasks send nothing until they end.
+    """
+    deferred = False
+
+    def sample(self, round, num_rounds=None):
+        """ Check whether a round is recorded.
+
+        Args:
+            - round (:obj:`int`): Round number, starting at 0.
+            - num_rounds (:obj:`int`, optional): Number of rounds, when known.
+        """
+        return True
+
+    def changed(self, key, value):
+        """ Check whether a reported metric is worth a record.
+
+        Args:
+            - key (:obj:`str`): Metric key, e.g. the transformation tag.
+            - value: The metric value.
+        """
+        return True
+
+
+class EveryNth(Always):
+    """
+    This class defines the sampling policy that records one round out of
+    ``n``, and the last one when the number of rounds is known.
+
+    Attributes:
+        - n (:obj:`int`): Sampling period.
+    """
+    def __init__(self, n):
+        assert isinstance(n, int) and n > 0, \
+            "The sampling period must be a positive integer."
+        self.n = n
+
+    def sample(self, round, num_rounds=None):
+        return round % self.n == 0 or \
+            (num_rounds is not None and round >= num_rounds - 1)
+
+
+class FirstLast(Always):
+    """
+    This class defines the sampling policy that records only the first and
+    last ``k`` rounds. The last rounds are only recognised when the number
+    of rounds is known.
+
+    Attributes:
+        - k (:obj:`int`, optional): Rounds recorded at each end.
+    """
+    def __init__(self, k=1):
+        assert isinstance(k, int) and k > 0, \
+            "The number of rounds must be a positive integer."
+        self.k = k
+
+    def sample(self, round, num_rounds=None):
+        return round < self.k or \
+            (num_rounds is not None and round >= num_rounds - self.k)
+
+
+class OnChange(Always):
+    """
+    This class defines the sampling policy that records a task only when
+    the metric it reports differs from the last recorded one by more than
+    a relative tolerance. Tasks that report no metric are always recorded.
+
+    Attributes:
+        - tolerance (:obj:`float`, optional): Relative tolerance.
+    """
+    deferred = True
+
+    def __init__(self, tolerance=1e-3):
+        self.tolerance = float(tolerance)
+        self._last = {}
+        self._lock = threading.Lock()
+
+    def changed(self, key, value):
+        with self._lock:
+            last = self._last.get(key)
+            if last is not None and _close(last, value, self.tolerance):
+                return False
+            self._last[key] = np.array(value, dtype=float) \
+                if np is not None else value
+            return True
+
+
+def _close(a, b, tolerance):
+    if np is not None:
+        a, b = np.asarray(a, dtype=float), np.asarray(b, dtype=float)
+        if a.shape != b.shape:
+            return False
+        return bool(np.allclose(a, b, rtol=tolerance, atol=0.0))
+    return abs(a - b) <= tolerance * abs(b)
+
+
+class Sampler(object):
+    """
+    This class defines which tasks are recorded, from their
+    :obj:`Verbosity` level and a per-round sampling policy. Checks are
+    cheap, so callers skip building payloads for records that will not be
+    emitted.
+
+    Attributes:
+        - verbosity (:obj:`Verbosity`, optional): Highest level recorded.
+        - policy (optional): Sampling policy of the per-round tasks, e.g.
+          :obj:`EveryNth`, :obj:`FirstLast` or :obj:`OnChange`.
+        - num_rounds (:obj:`int`, optional): Number of rounds, when known.
+    """
+    def __init__(self, verbosity=Verbosity.DETAIL, policy=None,
+                 num_rounds=None):
+        self.verbosity = Verbosity(verbosity)
+        self.policy = policy if policy is not None else Always()
+        self.num_rounds = num_rounds
+
+    def set_num_rounds(self, num_rounds):
+        """ Set the number of rounds, ignoring unknown values.
+
+        Args:
+            - num_rounds (:obj:`int`): Number of rounds.
+        """
+        if num_rounds is not None:
+            self.num_rounds = int(num_rounds)
+
+    def sample(self, level=Verbosity.DETAIL, round=None):
+        """ Check whether a task is recorded.
+
+        Args:
+            - level (:obj:`Verbosity`, optional): Task level.
+            - round (:obj:`int`, optional): Round of a per-round task.
+        """
+        if level > self.verbosity:
+            return False
+        if round is None or level <= Verbosity.SETUP:
+            return True
+        return self.policy.sample(round, self.num_rounds)
+
+    def changed(self, key, value):
+        """ Check whether a task reporting a metric is recorded.
+
+        Args:
+            - key (:obj:`str`): Metric key, e.g. the transformation tag.
+            - value: The metric value, a number or an array.
+        """
+        return self.policy.changed(key, value)
+
+
+def parse_policy(spec):
+    """ Create a sampling policy from its textual form: ``all``,
+        ``every:N``, ``first_last[:K]`` or ``on_change[:TOLERANCE]``.
+
+    Args:
+        - spec (:obj:`str`): Policy specification.
+    """
+    name, _, arg = spec.strip().lower().partition(":")
+    if name in ("", "all"):
+        return Always()
+    if name == "every":
+        return EveryNth(int(arg))
+    if name == "first_last":
+        return FirstLast(int(arg) if arg else 1)
+    if name == "on_change":
+        return OnChange(float(arg) if arg else 1e-3)
+    raise ValueError("Unknown sampling policy: {0}".format(spec))
+
+
+_sampler = None
+_lock = threading.Lock()
+
+
+def get_sampler():
+    """ Get the sampler used by :func:`task_scope`.
+
+    The shared sampler is created on first use from the DFA_VERBOSITY
+    (``off``, ``setup``, ``round`` or ``detail``, default ``detail``),
+    DFA_SAMPLING (see :func:`parse_policy`, default ``all``) and
+    DFA_NUM_ROUNDS environment variables.
+
+    Returns:
+        The shared :obj:`Sampler`.
+    """
+    global _sampler
+    if _sampler is None:
+        with _lock:
+            if _sampler is None:
+                env = os.environ
+                num_rounds = env.get('DFA_NUM_ROUNDS')
+                _sampler = Sampler(
+                    Verbosity[env.get('DFA_VERBOSITY', 'detail').upper()],
+                    parse_policy(env.get('DFA_SAMPLING', 'all')),
+                    int(num_rounds) if num_rounds else None)
+    return _sampler
+
+
+def set_sampler(sampler):
+    """ Install the sampler used by :func:`task_scope`.
+
+    Args:
+        - sampler (:obj:`Sampler`): The new sampler, or None to rebuild it
+          from the environment on next use.
+    """
+    global _sampler
+    assert sampler is None or isinstance(sampler, Sampler), \
+        "The sampler must be valid."
+    _sampler = sampler
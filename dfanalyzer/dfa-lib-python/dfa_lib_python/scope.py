@@ -0,0 +1,220 @@
+import contextvars
+import datetime
+import functools
+import os
+
+from .dataset import DataSet
+from .dependency import Dependency
+from .element import Element
+from .sampling import Verbosity, get_sampler
+from .set_type import SetType
+from .task import Task
+
+dfa_enabled = os.environ.get('DFA_ENABLED', '1').lower() not in ('0', 'false', 'no')
+
+_current = contextvars.ContextVar("dfa_task_scope", default=None)
+
+
+class TaskScope(object):
+    """
+    This class defines the lifetime of a :obj:`Task` as a context: the Task
+    begins on enter and ends on exit, FINISHED or FAILED with the error
+    when an exception escapes. Datasets are attached with :meth:`input` and
+    :meth:`output`, and values given as callables are only built on exit.
+
+    Attributes:
+        - id (:obj:`str`): Task Id.
+        - dataflow_tag (:obj:`str`): Dataflow tag.
+        - transformation_tag (:obj:`str`): Transformation tag.
+        - dependency (:obj:`Task` or :obj:`Dependency`, optional): Task
+          dependency.
+        - eager (:obj:`bool`, optional): Passed to :meth:`Task.begin`.
+        - kwargs: Other :obj:`Task` arguments, e.g. ``coalesce``.
+    """
+    def __init__(self, id, dataflow_tag, transformation_tag, dependency=None,
+                 eager=None, **kwargs):
+        self.task = Task(id, dataflow_tag, transformation_tag,
+                         dependency=dependency
+                         if isinstance(dependency, Task) else None,
+                         **kwargs)
+        if isinstance(dependency, Dependency):
+            self.task.add_dependency(dependency)
+        self.eager = eager
+        self.started_at = None
+        self.datasets = []
+        self.discarded = False
+        self.token = None
+
+    def __enter__(self):
+        self.started_at = datetime.datetime.now()
+        self.task.begin(eager=self.eager)
+        self.token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self.token)
+        failed = exc_type is not None
+        for _, tag, values in self.datasets:
+            if callable(values):
+                try:
+                    values = values()
+                except Exception:
+                    if not failed:
+                        raise
+                    # the body failed before the values were computed
+                    continue
+            self.task.add_dataset(DataSet(tag, [Element(values)]))
+        if failed:
+            self.task.fail(exc)
+        elif not self.discarded:
+            self.task.end()
+        return False
+
+    @property
+    def enabled(self):
+        """Whether the scope records provenance."""
+        return True
+
+    def elapsed(self):
+        """Get the time since the Task began, in seconds."""
+        return self.task.elapsed()
+
+    def metric(self, value, key=None):
+        """ Report the metric of the Task. Under the
+            :obj:`sampling.OnChange` policy, a Task whose metric did not
+            change is not recorded unless it fails.
+
+        Args:
+            - value: The metric, a number or an array.
+            - key (:obj:`str`, optional): Metric key, defaults to the
+              transformation tag.
+        """
+        key = key if key is not None else self.task._transformation
+        if not get_sampler().changed(key, value):
+            self.discarded = True
+
+    def input(self, tag, values):
+        """ Attach an input dataset with a single element.
+
+        Args:
+            - tag (:obj:`str`): Dataset tag.
+            - values (:obj:`list` or callable): Element values, or a
+              callable returning them, called on exit.
+        """
+        self._attach(SetType.INPUT, tag, values)
+
+    def output(self, tag, values):
+        """ Attach an output dataset with a single element.
+
+        Args:
+            - tag (:obj:`str`): Dataset tag.
+            - values (:obj:`list` or callable): Element values, or a
+              callable returning them, called on exit.
+        """
+        self._attach(SetType.OUTPUT, tag, values)
+
+    def _attach(self, set_type, tag, values):
+        assert isinstance(set_type, SetType), \
+            "The set_type must be valid."
+        self.datasets.append((set_type, tag, values))
+
+
+class NullScope(object):
+    """
+    This class defines the scope used when provenance is disabled: every
+    method is a no-op and callables given as values are never called.
+    """
+    task = None
+    started_at = None
+    enabled = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def elapsed(self):
+        return 0.0
+
+    def metric(self, value, key=None):
+        pass
+
+    def input(self, tag, values):
+        pass
+
+    def output(self, tag, values):
+        pass
+
+
+NULL_SCOPE = NullScope()
+
+
+def task_scope(id, dataflow_tag, transformation_tag, level=Verbosity.DETAIL,
+               round=None, **kwargs):
+    """ Get the context of a :obj:`Task`.
+
+    Example:
+        with task_scope(3, "df", "LoadData") as scope:
+            data = load()
+            scope.output("oLoadData", lambda: [len(data), scope.elapsed()])
+
+    Args:
+        - id (:obj:`str`): Task Id.
+        - dataflow_tag (:obj:`str`): Dataflow tag.
+        - transformation_tag (:obj:`str`): Transformation tag.
+        - level (:obj:`Verbosity`, optional): Task verbosity level.
+        - round (:obj:`int`, optional): Round of a per-round task, checked
+          against the sampling policy.
+        - kwargs: Other :obj:`TaskScope` arguments.
+
+    Returns:
+        A :obj:`TaskScope`, or the shared no-op :obj:`NullScope` when
+        provenance is disabled with DFA_ENABLED=0 or the Task is not
+        sampled (see :func:`sampling.get_sampler`).
+    """
+    if not dfa_enabled:
+        return NULL_SCOPE
+    sampler = get_sampler()
+    if not sampler.sample(level, round):
+        return NULL_SCOPE
+    if round is not None and sampler.policy.deferred:
+        kwargs.update(coalesce=True, eager=False)
+    return TaskScope(id, dataflow_tag, transformation_tag, **kwargs)
+
+
+def current_scope():
+    """ Get the innermost active scope.
+
+    Returns:
+        The :obj:`TaskScope` of the running code, or the :obj:`NullScope`.
+    """
+    scope = _current.get()
+    return scope if scope is not None else NULL_SCOPE
+
+
+def provenance_task(dataflow_tag, transformation_tag, id, **kwargs):
+    """ Decorate a function so that each call runs in a :func:`task_scope`.
+        The function reaches its scope with :func:`current_scope`.
+
+    Args:
+        - dataflow_tag (:obj:`str`): Dataflow tag.
+        - transformation_tag (:obj:`str`): Transformation tag.
+        - id (:obj:`str` or callable): Task Id, or a callable computing it
+          from the call arguments.
+        - kwargs: Other :obj:`TaskScope` arguments; callables are also
+          called with the call arguments.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kw):
+            if not dfa_enabled:
+                return function(*args, **kw)
+            task_id = id(*args, **kw) if callable(id) else id
+            options = {k: v(*args, **kw) if callable(v) else v
+                       for k, v in kwargs.items()}
+            with task_scope(task_id, dataflow_tag, transformation_tag,
+                            **options):
+                return function(*args, **kw)
+        return wrapper
+    return decorator
@@ -15,6 +15,8 @@ class Set(ProvenanceObject):
         - extractors (:obj:`list`): Set extractors.
         - dependency (:obj:`str`, optional): Set dependency.
     """
+    __slots__ = ("_attributes", "_type", "_extractors", "_dependency")
+
     def __init__(self, tag, type, attributes, extractors=[], dependency=""):
         ProvenanceObject.__init__(self, tag)
         self.attributes = attributes
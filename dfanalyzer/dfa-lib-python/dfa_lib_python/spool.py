@@ -0,0 +1,292 @@
+import argparse
+import atexit
+import json
+import os
+import threading
+import time
+
+from .batch import Batcher
+
+SEGMENT_PREFIX = "spool-"
+SEGMENT_SUFFIX = ".log"
+PROGRESS_SUFFIX = ".sent"
+
+
+class Spool(object):
+    """
+    This class defines a durable local spool (write-ahead log) for
+    provenance messages. Messages are appended as JSON lines to segment
+    files that are rotated by size, and :meth:`replay` ships them to the
+    Dataflow Analyzer API later in bulk. The lines of a segment accepted
+    by the server are recorded next to it (``<segment>.sent``), so a
+    replay never sends them again.
+
+    Attributes:
+        - directory (:obj:`str`): Directory holding the segment files.
+        - segment_bytes (:obj:`int`, optional): Size after which a new
+          segment is started.
+        - fsync_every (:obj:`int`, optional): Appends between two fsyncs.
+        - fsync_interval (:obj:`float`, optional): Maximum time between two
+          fsyncs, in seconds, checked on append.
+    """
+    def __init__(self, directory, segment_bytes=64 * 1024 * 1024,
+                 fsync_every=100, fsync_interval=1.0):
+        assert isinstance(directory, str), \
+            "The directory must be a string."
+        assert isinstance(segment_bytes, int) and segment_bytes > 0, \
+            "The segment_bytes must be a positive integer."
+        assert isinstance(fsync_every, int) and fsync_every > 0, \
+            "The fsync_every must be a positive integer."
+        os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        self._segment_bytes = segment_bytes
+        self._fsync_every = fsync_every
+        self._fsync_interval = float(fsync_interval)
+        self._lock = threading.Lock()
+        self._file = None
+        self._size = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        segments = self.segments()
+        self._sequence = self._segment_number(segments[-1]) if segments else 0
+
+    @property
+    def directory(self):
+        """Get the spool directory."""
+        return self._directory
+
+    def segments(self):
+        """ Get the segment files, oldest first.
+
+        Returns:
+            A :obj:`list` of segment paths.
+        """
+        names = sorted(x for x in os.listdir(self._directory)
+                       if x.startswith(SEGMENT_PREFIX)
+                       and x.endswith(SEGMENT_SUFFIX))
+        return [os.path.join(self._directory, x) for x in names]
+
+    def append(self, url, message):
+        """ Append a message to the active segment.
+
+        Args:
+            - url (:obj:`str`): Endpoint that will receive the message.
+            - message (:obj:`dict` or :obj:`str`): A provenance
+              specification, or its JSON serialization.
+        """
+        if not isinstance(message, str):
+            message = json.dumps(message)
+        line = '{"url": ' + json.dumps(url) + ', "message": ' + message + '}\n'
+        data = line.encode("utf-8")
+        with self._lock:
+            if self._file is None or self._size >= self._segment_bytes:
+                self._rotate()
+            self._file.write(data)
+            self._size += len(data)
+            self._unsynced += 1
+            if self._unsynced >= self._fsync_every or \
+                    time.monotonic() - self._last_sync >= self._fsync_interval:
+                self._sync()
+
+    def sync(self):
+        """Flush and fsync the active segment."""
+        with self._lock:
+            if self._file is not None:
+                self._sync()
+
+    def close(self):
+        """Fsync and close the active segment."""
+        with self._lock:
+            self._close_segment()
+
+    def replay(self, batcher=None, dfa_url=None, delete=True):
+        """ Ship every spooled message in bulk, oldest segment first.
+            A segment is deleted only when all its messages were accepted;
+            replay stops at the first message that failed. The accepted
+            messages of a segment that is kept are recorded and skipped
+            by the next replays.
+
+        Args:
+            - batcher (:obj:`Batcher`, optional): Batcher used to post
+              the messages.
+            - dfa_url (:obj:`str`, optional): Dataflow Analyzer url that
+              replaces the one recorded with each message.
+            - delete (:obj:`bool`, optional): Whether shipped segments are
+              removed.
+
+        Returns:
+            The number of messages shipped.
+        """
+        batcher = batcher if batcher is not None else Batcher()
+        with self._lock:
+            self._close_segment()
+        shipped = 0
+        for path in self.segments():
+            progress = path + PROGRESS_SUFFIX
+            sent = self._read_progress(progress)
+            groups = {}
+            for number, url, message in self._records(path):
+                if number in sent:
+                    continue
+                if dfa_url is not None and "/pde/" in url:
+                    url = dfa_url.rstrip("/") + url[url.index("/pde/"):]
+                groups.setdefault(url, []).append((number, message))
+            complete = True
+            for url, records in groups.items():
+                accepted = batcher.send_batch(url, [x[1] for x in records])
+                for (number, _), ok in zip(records, accepted):
+                    if ok:
+                        sent.add(number)
+                        shipped += 1
+                complete = all(accepted)
+                if not complete:
+                    break
+            if complete and delete:
+                os.remove(path)
+                if os.path.exists(progress):
+                    os.remove(progress)
+            elif groups:
+                self._write_progress(progress, sent)
+            if not complete:
+                break
+        return shipped
+
+    def _read(self, path):
+        for _, url, message in self._records(path):
+            yield url, message
+
+    def _records(self, path):
+        # line number, url and message of each complete line
+        with open(path, "r", encoding="utf-8") as f:
+            for number, line in enumerate(f):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # torn write at the end of a segment
+                    continue
+                yield number, record["url"], record["message"]
+
+    @staticmethod
+    def _read_progress(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return set(json.load(f))
+        except (OSError, ValueError):
+            return set()
+
+    @staticmethod
+    def _write_progress(path, sent):
+        # replaced atomically, a crash leaves the previous progress
+        temporary = path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(sorted(sent), f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+
+    def _rotate(self):
+        self._close_segment()
+        self._sequence += 1
+        name = "{0}{1:08d}{2}".format(SEGMENT_PREFIX, self._sequence,
+                                      SEGMENT_SUFFIX)
+        self._file = open(os.path.join(self._directory, name), "ab")
+        self._size = 0
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _close_segment(self):
+        if self._file is not None:
+            self._sync()
+            self._file.close()
+            self._file = None
+
+    @staticmethod
+    def _segment_number(path):
+        name = os.path.basename(path)
+        return int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+
+
+_spool = None
+_lock = threading.Lock()
+
+
+def get_spool():
+    """ Get the shared spool used by :obj:`Task`.
+
+    Spooling is enabled by the DFA_SPOOL_DIR environment variable, or by
+    :func:`set_spool`. DFA_SPOOL_SEGMENT_BYTES and DFA_SPOOL_FSYNC_EVERY
+    tune the shared spool.
+
+    Returns:
+        The shared :obj:`Spool`, or None when spooling is disabled.
+    """
+    global _spool
+    directory = os.environ.get('DFA_SPOOL_DIR')
+    if _spool is None and directory:
+        with _lock:
+            if _spool is None:
+                env = os.environ
+                _spool = Spool(
+                    directory,
+                    segment_bytes=int(env.get('DFA_SPOOL_SEGMENT_BYTES',
+                                              64 * 1024 * 1024)),
+                    fsync_every=int(env.get('DFA_SPOOL_FSYNC_EVERY', 100)))
+    return _spool
+
+
+def set_spool(spool):
+    """ Install the shared spool, closing the previous one.
+
+    Args:
+        - spool (:obj:`Spool`): The new spool, or None to disable spooling.
+    """
+    global _spool
+    assert spool is None or isinstance(spool, Spool), \
+        "The spool must be valid."
+    with _lock:
+        previous, _spool = _spool, spool
+    if previous is not None and previous is not spool:
+        previous.close()
+
+
+def close():
+    """Fsync and close the shared spool."""
+    if _spool is not None:
+        _spool.close()
+
+
+atexit.register(close)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m dfa_lib_python.spool",
+        description="Ship spooled provenance messages to DfAnalyzer.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    replay = subparsers.add_parser(
+        "replay",
+        help="Replay a spool directory that is no longer written to.")
+    replay.add_argument("directory", type=str, help="Spool directory")
+    replay.add_argument("--dfa_url", type=str, default=None,
+                        help="DfAnalyzer url, overrides the recorded one")
+    replay.add_argument("--batch_size", type=int, default=500,
+                        help="Messages per batch request")
+    replay.add_argument("--keep", action="store_true",
+                        help="Keep the segments after shipping them")
+    args = parser.parse_args()
+
+    spool = Spool(args.directory)
+    batcher = Batcher(max_size=args.batch_size)
+    shipped = spool.replay(batcher, dfa_url=args.dfa_url,
+                           delete=not args.keep)
+    print("{0} messages shipped, {1} failed".format(shipped, batcher.failed))
+    if batcher.failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
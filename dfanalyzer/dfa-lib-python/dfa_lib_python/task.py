@@ -1,13 +1,20 @@
-import requests
 import os
+import threading
+import time
+import warnings
 from .ProvenanceObject import ProvenanceObject
 from .dependency import Dependency
 from .task_status import TaskStatus
 from .dataset import DataSet
-from .performance import Performance
+from .performance import Performance, peak_rss
+from .backend import get_url_backend
+from . import aio
 from datetime import datetime
 
-dfa_url = os.environ.get('DFA_URL',"http://localhost:22000/")
+# deprecated, set DFA_URL or install an HttpBackend with set_backend
+dfa_url = os.environ.get('DFA_URL', "http://localhost:22000/")
+_default_dfa_url = dfa_url
+dfa_coalesce = os.environ.get('DFA_COALESCE', '').lower() in ('1', 'true', 'yes')
 
 
 class Task(ProvenanceObject):
@@ -24,10 +31,18 @@ class Task(ProvenanceObject):
         - resource (:obj:`str`, optional): Task resource.
         - output (:obj:`str`, optional): Task output.
         - error (:obj:`str`, optional): Task error.
+        - coalesce (:obj:`bool`, optional): Hold the RUNNING state locally
+          and send a single record on :meth:`end`. Defaults to the
+          DFA_COALESCE environment variable.
     """
+    __slots__ = ("_workspace", "_resource", "_dependency", "_output", "_error",
+                 "_sets", "_status", "_dataflow", "_transformation", "_id",
+                 "_sub_id", "_performances", "start_time", "end_time",
+                 "start_ns", "start_cpu_ns", "coalesce", "_dfa_url")
+
     def __init__(self, id, dataflow_tag, transformation_tag,
                  sub_id="", dependency=None, workspace="", resource="",
-                 output="", error=""):
+                 output="", error="", coalesce=None):
         ProvenanceObject.__init__(self, transformation_tag)
         self._workspace = workspace
         self._resource = resource
@@ -41,9 +56,12 @@ class Task(ProvenanceObject):
         self._id = str(id)
         self._sub_id = sub_id
         self._performances = []
-        self.dfa_url = dfa_url
         self.start_time = None
         self.end_time = None
+        self.start_ns = None
+        self.start_cpu_ns = None
+        self.coalesce = dfa_coalesce if coalesce is None else coalesce
+        self._dfa_url = None
         if isinstance(dependency, Task):
             dependency = Dependency([dependency._tag], [dependency._id])
             self._dependency = dependency.get_specification()
@@ -89,26 +107,140 @@ class Task(ProvenanceObject):
             "The task status must be valid."
         self._status = status.value
 
-    def begin(self):
+    def begin(self, eager=None):
         """ Send a post request to the Dataflow Analyzer API to store the Task.
-        """        
+            In coalescing mode the RUNNING state is only kept locally.
+
+        Args:
+            - eager (:obj:`bool`, optional): Send the RUNNING state even in
+              coalescing mode, e.g. for long tasks.
+        """
+        if self._start(eager):
+            self.save()
+        self._started()
+
+    async def abegin(self, eager=None):
+        """ Store the Task like :meth:`begin`, without blocking the event
+            loop, see :func:`aio.save_task`.
+
+        Args:
+            - eager (:obj:`bool`, optional): Send the RUNNING state even in
+              coalescing mode, e.g. for long tasks.
+        """
+        if self._start(eager):
+            await self.asave()
+        self._started()
+
+    def _start(self, eager):
         self.set_status(TaskStatus.RUNNING)
         self.start_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        self.save()
+        return eager or (eager is None and not self.coalesce)
+
+    def _started(self):
+        self.start_ns = time.perf_counter_ns()
+        self.start_cpu_ns = time.process_time_ns()
+
+    def elapsed(self):
+        """ Get the time since :meth:`begin`, in seconds.
+
+        Returns:
+            A monotonic duration, or 0.0 when the Task has not begun.
+        """
+        if self.start_ns is None:
+            return 0.0
+        return (time.perf_counter_ns() - self.start_ns) / 1e9
 
     def end(self):
         """ Send a post request to the Dataflow Analyzer API to store the Task.
+            The :obj:`Performance` record holds the monotonic duration and
+            CPU time since :meth:`begin`, in nanoseconds, the peak RSS and
+            the number of live threads.
+        """
+        self._finish(TaskStatus.FINISHED)
+        self.save()
+
+    async def aend(self):
+        """ Store the Task like :meth:`end`, without blocking the event
+            loop, see :func:`aio.save_task`.
+        """
+        self._finish(TaskStatus.FINISHED)
+        await self.asave()
+
+    def fail(self, error):
+        """ Send a post request to the Dataflow Analyzer API to store the Task
+            as FAILED, with its :obj:`Performance` record.
+
+        Args:
+            - error (:obj:`str` or :obj:`Exception`): The failure cause.
+        """
+        self._set_error(error)
+        self._finish(TaskStatus.FAILED)
+        self.save()
+
+    async def afail(self, error):
+        """ Store the Task like :meth:`fail`, without blocking the event
+            loop, see :func:`aio.save_task`.
+
+        Args:
+            - error (:obj:`str` or :obj:`Exception`): The failure cause.
         """
-        self.set_status(TaskStatus.FINISHED)
+        self._set_error(error)
+        self._finish(TaskStatus.FAILED)
+        await self.asave()
+
+    def _set_error(self, error):
+        if isinstance(error, BaseException):
+            error = "{0}: {1}".format(type(error).__name__, error)
+        self._error = str(error)
+
+    def _finish(self, status):
+        end_ns = time.perf_counter_ns()
+        end_cpu_ns = time.process_time_ns()
+        self.set_status(status)
         self.end_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        performance = Performance(self.start_time, self.end_time)
+        if self.start_ns is None:
+            performance = Performance(self.start_time, self.end_time)
+        else:
+            performance = Performance(
+                self.start_time, self.end_time,
+                duration_ns=end_ns - self.start_ns,
+                cpu_time_ns=end_cpu_ns - self.start_cpu_ns,
+                peak_rss=peak_rss(),
+                threads=threading.active_count())
         self._performances.append(performance.get_specification())
-        self.save()
+
+    @property
+    def dfa_url(self):
+        """Get the Dataflow Analyzer url of the Task (deprecated)."""
+        return self._dfa_url if self._dfa_url is not None else dfa_url
+
+    @dfa_url.setter
+    def dfa_url(self, value):
+        """ Set the Dataflow Analyzer url of the Task. Deprecated, set
+            DFA_URL or install an :obj:`HttpBackend` with
+            :func:`set_backend`.
+        """
+        warnings.warn(
+            "Task.dfa_url is deprecated, set DFA_URL or install "
+            "HttpBackend(dfa_url) with set_backend.",
+            DeprecationWarning, stacklevel=2)
+        self._dfa_url = value
 
     def save(self):
-        """ Send a post request to the Dataflow Analyzer API to store the Task.
+        """ Store the Task in the provenance :obj:`Backend`: by default a
+            post request to the Dataflow Analyzer API, see
+            :func:`get_backend`. A url set through the deprecated
+            ``dfa_url`` attribute or module global is still honored.
+        """
+        url = self._dfa_url
+        if url is None and dfa_url != _default_dfa_url:
+            url = dfa_url
+        get_url_backend(url).save_task(self.get_specification())
+
+    async def asave(self):
+        """ Store the Task in the provenance :obj:`Backend` without
+            blocking the event loop. The specification is the same as
+            :meth:`save`; it is batched when an :obj:`aio.AsyncSender` is
+            installed, see :func:`aio.get_async_sender`.
         """
-        url = dfa_url + '/pde/task/json'
-        message = self.get_specification()
-        r = requests.post(url, json=message)
-        print(r.status_code)
+        await aio.save_task(self.get_specification())
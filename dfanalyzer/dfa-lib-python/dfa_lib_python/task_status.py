@@ -7,3 +7,4 @@ class TaskStatus(Enum):
     READY = 'READY'
     RUNNING = 'RUNNING'
     FINISHED = 'FINISHED'
+    FAILED = 'FAILED'
@@ -11,6 +11,8 @@ class Transformation(ProvenanceObject):
         - tag (:obj:`str`): Transformation tag.
         - sets (:obj:`list`, optional): Transformation sets.
     """
+    __slots__ = ("_sets",)
+
     def __init__(self, tag, sets=[]):
         ProvenanceObject.__init__(self, tag.lower())
         self.sets = sets
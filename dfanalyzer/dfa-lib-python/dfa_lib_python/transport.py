@@ -0,0 +1,260 @@
+import gzip
+import os
+import threading
+from json import dumps
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+JSON_CONTENT_TYPE = "application/json"
+UNSUPPORTED_ENCODING = 415
+
+
+class Transport(object):
+    """
+    This class defines the HTTP transport used to reach the Dataflow
+    Analyzer API. It keeps a :obj:`requests.Session` with a pool of
+    keep-alive connections, so consecutive posts reuse the same TCP
+    connection instead of opening a new one.
+
+    Attributes:
+        - pool_size (:obj:`int`, optional): Connections kept alive per host.
+        - retries (:obj:`int`, optional): Retries on connection errors,
+          and for get requests also on read errors and on 502, 503 and 504
+          responses. Posts are not idempotent, a server may have stored a
+          record whose response was lost, so they are only retried when
+          the connection could not be made.
+        - backoff_factor (:obj:`float`, optional): Exponential backoff
+          factor between retries, in seconds.
+        - timeout (:obj:`float`, optional): Connect and read timeout, in seconds.
+        - compression (:obj:`str`, optional): Request body compression:
+          ``off``, ``gzip`` or ``zstd`` to always compress, or ``auto`` to
+          compress only for servers that list a supported coding in the
+          ``Accept-Encoding`` header of their responses. ``zstd`` requires
+          the ``zstandard`` package.
+        - min_size (:obj:`int`, optional): Bodies smaller than this many
+          bytes are sent uncompressed.
+        - level (:obj:`int`, optional): Compression level, defaults to the
+          codec default.
+    """
+    def __init__(self, pool_size=10, retries=3, backoff_factor=0.5,
+                 timeout=10.0, compression="off", min_size=1024, level=None):
+        assert isinstance(pool_size, int) and pool_size > 0, \
+            "The pool size must be a positive integer."
+        assert isinstance(retries, int) and retries >= 0, \
+            "The retries must be a non-negative integer."
+        assert compression in ("off", "auto", "gzip", "zstd"), \
+            "The compression must be off, auto, gzip or zstd."
+        assert compression != "zstd" or zstandard is not None, \
+            "The zstd compression requires the zstandard package."
+        assert isinstance(min_size, int) and min_size >= 0, \
+            "The min_size must be a non-negative integer."
+        self._pool_size = pool_size
+        self._retries = retries
+        self._backoff_factor = float(backoff_factor)
+        self._timeout = float(timeout)
+        self._compression = compression
+        self._min_size = min_size
+        self._level = level
+        self._encodings = {}
+        self._local = threading.local()
+        retry = Retry(total=retries,
+                      backoff_factor=self._backoff_factor,
+                      status_forcelist=(502, 503, 504),
+                      allowed_methods=frozenset(["GET"]),
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_size,
+                              pool_maxsize=pool_size,
+                              max_retries=retry)
+        self._session = requests.Session()
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+    @property
+    def pool_size(self):
+        """Get the number of connections kept alive per host."""
+        return self._pool_size
+
+    @property
+    def retries(self):
+        """Get the number of retries."""
+        return self._retries
+
+    @property
+    def backoff_factor(self):
+        """Get the backoff factor between retries."""
+        return self._backoff_factor
+
+    @property
+    def timeout(self):
+        """Get the request timeout."""
+        return self._timeout
+
+    @property
+    def compression(self):
+        """Get the request body compression."""
+        return self._compression
+
+    @property
+    def min_size(self):
+        """Get the smallest body that is compressed."""
+        return self._min_size
+
+    def encoding(self, url):
+        """ Get the coding used for the request bodies sent to a server.
+
+        Args:
+            - url (:obj:`str`): Request url.
+
+        Returns:
+            ``gzip``, ``zstd``, or None when bodies are sent as they are.
+        """
+        if self._compression in ("gzip", "zstd"):
+            return self._compression
+        if self._compression == "auto":
+            return self._encodings.get(urlsplit(url).netloc)
+        return None
+
+    def compress(self, body, encoding):
+        """ Compress a request body.
+
+        Args:
+            - body (:obj:`bytes`): Serialized body.
+            - encoding (:obj:`str`): ``gzip`` or ``zstd``.
+
+        Returns:
+            The compressed :obj:`bytes`.
+        """
+        if encoding == "zstd":
+            compressor = getattr(self._local, "zstd", None)
+            if compressor is None:
+                # compressors are not thread-safe, keep one per thread
+                compressor = zstandard.ZstdCompressor(
+                    level=self._level if self._level is not None else 3)
+                self._local.zstd = compressor
+            return compressor.compress(body)
+        return gzip.compress(body, self._level if self._level is not None
+                             else 6)
+
+    def post(self, url, json=None, data=None, headers=None):
+        """ Send a post request through the pooled session. Bodies of at
+            least ``min_size`` bytes are compressed with the coding chosen
+            by :meth:`encoding`.
+
+        Args:
+            - url (:obj:`str`): Request url.
+            - json (:obj:`dict`, optional): Message serialized as the body.
+            - data (:obj:`str`, optional): Already serialized body.
+            - headers (:obj:`dict`, optional): Extra request headers.
+
+        Returns:
+            The :obj:`requests.Response`.
+        """
+        if self._compression == "off":
+            return self._session.post(url, json=json, data=data,
+                                      headers=headers, timeout=self._timeout)
+        headers = dict(headers or {})
+        if data is None:
+            data = dumps(json)
+            headers.setdefault("Content-Type", JSON_CONTENT_TYPE)
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        encoding = self.encoding(url)
+        if encoding is None or len(data) < self._min_size:
+            r = self._session.post(url, data=data, headers=headers,
+                                   timeout=self._timeout)
+        else:
+            compressed = dict(headers)
+            compressed["Content-Encoding"] = encoding
+            r = self._session.post(url, data=self.compress(data, encoding),
+                                   headers=compressed, timeout=self._timeout)
+            if r.status_code == UNSUPPORTED_ENCODING and \
+                    self._compression == "auto":
+                # the server no longer takes this coding, resend as is
+                self._encodings[urlsplit(url).netloc] = None
+                return self._session.post(url, data=data, headers=headers,
+                                          timeout=self._timeout)
+        if self._compression == "auto":
+            self._negotiate(url, r)
+        return r
+
+    def _negotiate(self, url, r):
+        accepted = [x.split(";")[0].strip().lower() for x in
+                    r.headers.get("Accept-Encoding", "").split(",")]
+        if "zstd" in accepted and zstandard is not None:
+            encoding = "zstd"
+        elif "gzip" in accepted:
+            encoding = "gzip"
+        else:
+            encoding = None
+        self._encodings[urlsplit(url).netloc] = encoding
+
+    def get(self, url):
+        """ Send a get request through the pooled session.
+
+        Args:
+            - url (:obj:`str`): Request url.
+
+        Returns:
+            The :obj:`requests.Response`.
+        """
+        return self._session.get(url, timeout=self._timeout)
+
+    def close(self):
+        """Close every pooled connection."""
+        self._session.close()
+
+
+_transport = None
+_lock = threading.Lock()
+
+
+def get_transport():
+    """ Get the transport shared by every provenance object.
+
+    The shared transport is created on first use from the DFA_POOL_SIZE,
+    DFA_RETRIES, DFA_BACKOFF, DFA_TIMEOUT, DFA_COMPRESSION,
+    DFA_COMPRESSION_MIN_SIZE and DFA_COMPRESSION_LEVEL environment
+    variables.
+
+    Returns:
+        The shared :obj:`Transport`.
+    """
+    global _transport
+    if _transport is None:
+        with _lock:
+            if _transport is None:
+                env = os.environ
+                level = env.get('DFA_COMPRESSION_LEVEL')
+                _transport = Transport(
+                    pool_size=int(env.get('DFA_POOL_SIZE', 10)),
+                    retries=int(env.get('DFA_RETRIES', 3)),
+                    backoff_factor=float(env.get('DFA_BACKOFF', 0.5)),
+                    timeout=float(env.get('DFA_TIMEOUT', 10.0)),
+                    compression=env.get('DFA_COMPRESSION', 'off').lower(),
+                    min_size=int(env.get('DFA_COMPRESSION_MIN_SIZE', 1024)),
+                    level=int(level) if level else None)
+    return _transport
+
+
+def set_transport(transport):
+    """ Install the transport shared by every provenance object.
+
+    Args:
+        - transport (:obj:`Transport`): The new transport, or None to
+          rebuild it from the environment on next use.
+    """
+    global _transport
+    assert transport is None or isinstance(transport, Transport), \
+        "The transport must be valid."
+    with _lock:
+        previous, _transport = _transport, transport
+    if previous is not None and previous is not transport:
+        previous.close()
@@ -0,0 +1,134 @@
+import asyncio
+from dfa_lib_python.aio import AsyncSender, set_async_sender
+from dfa_lib_python.backend import HttpBackend, SQLiteBackend, set_backend
+from dfa_lib_python.dataflow import Dataflow
+from dfa_lib_python.dataset import DataSet
+from dfa_lib_python.element import Element
+from dfa_lib_python.mock_server import MockDfAnalyzer
+from dfa_lib_python.task import Task
+from dfa_lib_python.transformation import Transformation
+
+
+def strip(message):
+    # performances hold timings, which differ between runs
+    return {k: v for k, v in message.items() if k != "performances"}
+
+
+async def run_async_tasks(n, sender=None):
+    set_async_sender(sender)
+    try:
+        await Dataflow("df", [Transformation("tf")]).asave()
+        for i in range(n):
+            task = Task(i, "df", "tf")
+            await task.abegin()
+            task.add_dataset(DataSet("otf", [Element([i, "a"])]))
+            await task.aend()
+        if sender is not None:
+            await sender.close()
+    finally:
+        set_async_sender(None)
+
+
+def test_async_same_json_pass():
+    with MockDfAnalyzer() as server:
+        set_backend(HttpBackend(server.url))
+        try:
+            Dataflow("df", [Transformation("tf")]).save()
+            for i in range(3):
+                task = Task(i, "df", "tf")
+                task.begin()
+                task.add_dataset(DataSet("otf", [Element([i, "a"])]))
+                task.end()
+            expected = [(p, strip(m)) for p, m in server.messages]
+            server.reset()
+            asyncio.run(run_async_tasks(3))
+        finally:
+            set_backend(None)
+    assert [(p, strip(m)) for p, m in server.messages] == expected
+
+
+def test_async_sender_pass():
+    with MockDfAnalyzer(latency=0.01) as server:
+        set_backend(HttpBackend(server.url))
+        sender = AsyncSender(max_size=4, max_delay=60, concurrency=2)
+        try:
+            asyncio.run(run_async_tasks(10, sender))
+        finally:
+            set_backend(None)
+    tasks = [m for p, m in server.messages if p == "/pde/task/json"]
+    assert len(tasks) == 20
+    assert sender.sent == 20 and sender.failed == 0
+    assert sender.requests == 5
+    for i in range(10):
+        states = [m["status"] for m in tasks if m["id"] == str(i)]
+        assert states == ["RUNNING", "FINISHED"]
+
+
+def test_async_sender_delay_pass():
+    async def run(url):
+        sender = AsyncSender(max_size=100, max_delay=0.05)
+        await sender.add(url, {"id": "1"})
+        await asyncio.sleep(0.2)
+        sent = sender.sent
+        await sender.close()
+        return sent
+
+    with MockDfAnalyzer() as server:
+        assert asyncio.run(run(server.url + "/pde/task/json")) == 1
+    assert server.requests == 1
+
+
+def test_async_sender_fallback_pass():
+    async def run(url):
+        async with AsyncSender(max_size=4, concurrency=3) as sender:
+            for i in range(8):
+                await sender.add(url, {"id": str(i)})
+        return sender
+
+    with MockDfAnalyzer(batch=False) as server:
+        sender = asyncio.run(run(server.url + "/pde/task/json"))
+    assert sender.sent == 8
+    assert sorted(int(m["id"]) for _, m in server.messages) == list(range(8))
+
+
+def test_async_sqlite_backend_pass(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "provenance.sqlite"))
+    set_backend(backend)
+    try:
+        asyncio.run(run_async_tasks(2, AsyncSender()))
+        rows = backend.connection.execute(
+            "SELECT id, status FROM task ORDER BY seq").fetchall()
+    finally:
+        set_backend(None)
+    assert rows == [("0", "RUNNING"), ("0", "FINISHED"),
+                    ("1", "RUNNING"), ("1", "FINISHED")]
+
+
+def test_async_sender_flush_while_waiting_pass():
+    async def run(sender):
+        url = server.url + "/pde/task/json"
+        # the second add waits for the only slot while flush runs
+        adds = [asyncio.ensure_future(sender.add(url, {"id": str(i)}))
+                for i in range(3)]
+        await asyncio.sleep(0)
+        await sender.flush()
+        await asyncio.gather(*adds)
+        await sender.flush()
+        await sender.add(url, {"id": "3"})
+        await sender.close()
+        return sender._semaphore._value
+
+    with MockDfAnalyzer(latency=0.02) as server:
+        sender = AsyncSender(max_size=1, max_delay=60, concurrency=1)
+        assert asyncio.run(run(sender)) == 1
+        # reused by a second event loop
+        sender2 = AsyncSender(max_size=1, max_delay=60, concurrency=1)
+
+        async def add_flush(i):
+            await sender2.add(server.url + "/pde/task/json", {"id": str(i)})
+            await sender2.flush()
+        asyncio.run(add_flush(4))
+        asyncio.run(add_flush(5))
+        asyncio.run(sender2.close())
+    assert sender.sent == 4 and sender.failed == 0
+    assert sender2.sent == 2
@@ -0,0 +1,33 @@
+import json
+import os
+import numpy as np
+from dfa_lib_python.artifact import ArtifactStore
+
+
+def test_put_get_pass(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    array = np.arange(12, dtype=np.float32).reshape(3, 4)
+    reference = store.put(array)
+    assert reference["shape"] == [3, 4]
+    assert reference["dtype"] == "float32"
+    assert os.path.exists(store.path(reference["artifact"]))
+    assert np.array_equal(store.get(reference["artifact"]), array)
+
+
+def test_put_deduplicates_pass(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    first = store.put(np.ones((4, 4)))
+    second = store.put(np.ones((4, 4)))
+    other = store.put(np.ones((2, 8)))
+    assert first == second
+    assert first["artifact"] != other["artifact"]
+    files = [x for _, _, names in os.walk(str(tmp_path)) for x in names]
+    assert len(files) == 2
+
+
+def test_encode_threshold_pass(tmp_path):
+    store = ArtifactStore(str(tmp_path), threshold=0)
+    reference = json.loads(store.encode(np.array([1.5, 2.5])))
+    assert reference["shape"] == [2]
+    store = ArtifactStore(str(tmp_path), threshold=1024)
+    assert store.encode(np.array([1.5, 2.5])) == "[1.5, 2.5]"
@@ -0,0 +1,84 @@
+import json
+import pytest
+from dfa_lib_python.backend import HttpBackend, SQLiteBackend, \
+    set_backend, ship
+from dfa_lib_python.dataflow import Dataflow
+from dfa_lib_python.dataset import DataSet
+from dfa_lib_python.element import Element
+from dfa_lib_python.mock_server import MockDfAnalyzer
+from dfa_lib_python.task import Task
+from dfa_lib_python.transformation import Transformation
+
+
+def run_dataflow(backend):
+    set_backend(backend)
+    try:
+        Dataflow("df", [Transformation("tf")]).save()
+        for i in range(3):
+            task = Task(i, "df", "tf")
+            task.begin()
+            task.add_dataset(DataSet("otf", [Element([i, "a"])]))
+            task.end()
+        backend.flush()
+    finally:
+        set_backend(None)
+
+
+def test_http_backend_pass():
+    with MockDfAnalyzer() as server:
+        run_dataflow(HttpBackend(server.url))
+    paths = [x[0] for x in server.messages]
+    assert paths[0] == "/pde/dataflow/json"
+    assert paths[1:] == ["/pde/task/json"] * 6
+
+
+def test_sqlite_backend_pass(tmp_path):
+    path = str(tmp_path / "provenance.sqlite")
+    run_dataflow(SQLiteBackend(path))
+    backend = SQLiteBackend(path)
+    rows = backend.connection.execute(
+        "SELECT id, status FROM task ORDER BY seq").fetchall()
+    assert rows == [(str(i), x) for i in range(3)
+                    for x in ("RUNNING", "FINISHED")]
+    values = backend.connection.execute(
+        "SELECT vals FROM element WHERE dataset = 'otf'").fetchall()
+    assert [json.loads(x[0]) for x in values] == [["0", "a"], ["1", "a"],
+                                                 ["2", "a"]]
+    with MockDfAnalyzer() as server:
+        shipped = ship(backend, server.url)
+    backend.close()
+    assert shipped == 7
+    assert server.messages[0][0] == "/pde/dataflow/json"
+    assert [x[1]["status"] for x in server.messages[1:3]] == \
+        ["RUNNING", "FINISHED"]
+
+
+def test_parquet_backend_pass(tmp_path):
+    pytest.importorskip("pyarrow")
+    from dfa_lib_python.backend import ParquetBackend
+    backend = ParquetBackend(str(tmp_path), row_group_size=4)
+    run_dataflow(backend)
+    assert len(list((tmp_path / "task").iterdir())) == 2
+    records = list(ParquetBackend(str(tmp_path)).records())
+    assert [x[0] for x in records] == \
+        ["/pde/dataflow/json"] + ["/pde/task/json"] * 6
+    assert json.loads(records[-1][1])["status"] == "FINISHED"
+
+
+def test_backend_sub_id_pass(tmp_path):
+    pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+    from dfa_lib_python.backend import ParquetBackend
+    path = str(tmp_path / "provenance.sqlite")
+    for backend in (SQLiteBackend(path), ParquetBackend(str(tmp_path))):
+        set_backend(backend)
+        try:
+            Task(1, "df", "tf", sub_id="7").begin()
+        finally:
+            set_backend(None)
+    backend = SQLiteBackend(path)
+    rows = backend.connection.execute("SELECT sub_id FROM task").fetchall()
+    backend.close()
+    assert rows == [("7",)]
+    table = pq.read_table(str(tmp_path / "task"))
+    assert table.column("sub_id").to_pylist() == ["7"]
@@ -0,0 +1,66 @@
+import time
+from dfa_lib_python.batch import Batcher
+from dfa_lib_python.emitter import Emitter
+from dfa_lib_python.mock_server import MockDfAnalyzer
+
+
+def test_batch_size_flush_pass():
+    with MockDfAnalyzer() as server:
+        url = server.url + "/pde/task/json"
+        batcher = Batcher(max_size=10, max_delay=60)
+        for i in range(25):
+            batcher.add(url, {"id": str(i)})
+        assert server.requests == 2
+        assert batcher.pending == 5
+        batcher.flush()
+    assert server.requests == 3
+    assert [x[1]["id"] for x in server.messages] == \
+        [str(i) for i in range(25)]
+    assert batcher.sent == 25
+
+
+def test_batch_time_flush_pass():
+    with MockDfAnalyzer() as server:
+        url = server.url + "/pde/task/json"
+        batcher = Batcher(max_size=100, max_delay=0.05)
+        batcher.add(url, {"id": "1"})
+        batcher.add(url, {"id": "2"})
+        assert server.requests == 0
+        time.sleep(0.1)
+        batcher.poll()
+    assert server.requests == 1
+    assert len(server.messages) == 2
+
+
+def test_batch_ndjson_pass():
+    with MockDfAnalyzer() as server:
+        url = server.url + "/pde/task/json"
+        batcher = Batcher(max_size=3, mode="ndjson")
+        batcher.send_batch(url, [{"id": str(i)} for i in range(3)])
+    assert server.requests == 1
+    assert [x[1]["id"] for x in server.messages] == ["0", "1", "2"]
+
+
+def test_batch_fallback_pass():
+    with MockDfAnalyzer(batch=False) as server:
+        url = server.url + "/pde/task/json"
+        batcher = Batcher(max_size=4)
+        batcher.send_batch(url, [{"id": str(i)} for i in range(8)])
+    assert not batcher.supports_batch(url)
+    assert server.requests == 8
+    assert batcher.sent == 8
+    assert [x[1]["id"] for x in server.messages] == \
+        [str(i) for i in range(8)]
+
+
+def test_emitter_with_batcher_pass():
+    with MockDfAnalyzer() as server:
+        url = server.url + "/pde/task/json"
+        emitter = Emitter(batcher=Batcher(max_size=50, max_delay=60))
+        for i in range(20):
+            emitter.emit(url, {"id": str(i)})
+        assert emitter.flush(timeout=5)
+        assert emitter.pending == 0
+        emitter.close()
+    assert server.requests == 1
+    assert len(server.messages) == 20
@@ -1,3 +1,6 @@
+import json
+import numpy as np
+from dfa_lib_python.artifact import ArtifactStore, set_artifact_store
 from dfa_lib_python.element import Element
 
 
@@ -15,3 +18,26 @@ def test_set_values_pass():
     element = Element(values)
     element.values = new_values
     assert element.values == expected_values
+
+
+def test_small_array_inline_pass(tmp_path):
+    set_artifact_store(ArtifactStore(str(tmp_path), threshold=1024))
+    try:
+        element = Element([np.arange(3), None])
+    finally:
+        set_artifact_store(None)
+    assert element.values == ["[0, 1, 2]", "None"]
+
+
+def test_large_array_offload_pass(tmp_path):
+    store = ArtifactStore(str(tmp_path), threshold=64)
+    array = np.random.RandomState(0).rand(100, 10)
+    set_artifact_store(store)
+    try:
+        element = Element(["trial", array])
+    finally:
+        set_artifact_store(None)
+    reference = json.loads(element.values[1])
+    assert reference["shape"] == [100, 10]
+    assert reference["dtype"] == "float64"
+    assert np.array_equal(store.get(reference["artifact"]), array)
@@ -0,0 +1,189 @@
+import json
+import threading
+import time
+from dfa_lib_python.batch import Batcher
+from dfa_lib_python.emitter import Emitter, _BoundedQueue, get_emitter, \
+    parse_priorities, set_emitter
+from dfa_lib_python.mock_server import MockDfAnalyzer
+from dfa_lib_python.spool import Spool
+from dfa_lib_python.task import Task
+
+
+class RecordingEmitter(Emitter):
+    def __init__(self, maxsize=10000, gate=None, **kwargs):
+        self.received = []
+        self.gate = gate
+        Emitter.__init__(self, maxsize, **kwargs)
+
+    def _send(self, url, body):
+        if self.gate is not None:
+            self.gate.wait()
+        self.received.append((url, json.loads(body)))
+
+
+def test_emit_flush_pass():
+    emitter = RecordingEmitter()
+    for i in range(10):
+        emitter.emit("http://dfa/pde/task/json", {"id": str(i)})
+    assert emitter.flush(timeout=5)
+    assert [x[1]["id"] for x in emitter.received] == \
+        [str(i) for i in range(10)]
+    emitter.close()
+
+
+def test_emit_snapshots_message_pass():
+    gate = threading.Event()
+    emitter = RecordingEmitter(gate=gate)
+    message = {"status": "RUNNING", "sets": []}
+    emitter.emit("http://dfa/pde/task/json", message)
+    message["status"] = "FINISHED"
+    message["sets"].append({"tag": "ds"})
+    gate.set()
+    emitter.flush(timeout=5)
+    assert emitter.received[0][1] == {"status": "RUNNING", "sets": []}
+    emitter.close()
+
+
+def test_flush_timeout_pass():
+    gate = threading.Event()
+    emitter = RecordingEmitter(gate=gate)
+    emitter.emit("http://dfa/pde/task/json", {"id": "1"})
+    assert not emitter.flush(timeout=0.05)
+    assert emitter.pending == 1
+    gate.set()
+    assert emitter.flush(timeout=5)
+    emitter.close()
+
+
+def test_close_drains_pass():
+    emitter = RecordingEmitter()
+    for i in range(100):
+        emitter.emit("http://dfa/pde/task/json", {"id": str(i)})
+    emitter.close(timeout=5)
+    assert emitter.closed
+    assert len(emitter.received) == 100
+
+
+def test_task_uses_emitter_pass():
+    emitter = RecordingEmitter()
+    set_emitter(emitter)
+    try:
+        task = Task(1, "df", "tf")
+        task.begin()
+        task.end()
+        emitter.flush(timeout=5)
+    finally:
+        set_emitter(None)
+    assert get_emitter() is None
+    assert emitter.closed
+    statuses = [x[1]["status"] for x in emitter.received]
+    assert statuses == ["RUNNING", "FINISHED"]
+    assert emitter.received[0][0].endswith("/pde/task/json")
+
+
+def hold_worker(emitter):
+    # the worker takes the first message and waits on the gate
+    emitter.emit("http://dfa/pde/task/json", {"id": "held"})
+    while emitter._queue.qsize():
+        time.sleep(0.001)
+
+
+def test_drop_oldest_pass():
+    gate = threading.Event()
+    emitter = RecordingEmitter(maxsize=3, gate=gate, policy="drop_oldest")
+    hold_worker(emitter)
+    for i in range(5):
+        emitter.emit("http://dfa/pde/task/json", {"id": str(i)})
+    assert emitter.dropped == 2
+    gate.set()
+    emitter.close(timeout=5)
+    assert [x[1]["id"] for x in emitter.received] == ["held", "2", "3", "4"]
+
+
+def test_drop_priority_pass():
+    gate = threading.Event()
+    emitter = RecordingEmitter(maxsize=2, gate=gate, policy="drop_priority")
+    hold_worker(emitter)
+    url = "http://dfa/pde/task/json"
+    emitter.emit(url, {"id": "1", "transformation": "assemble",
+                       "status": "FINISHED"})
+    emitter.emit(url, {"id": "2", "transformation": "getmodelparams",
+                       "status": "FINISHED"})
+    emitter.emit(url, {"id": "3", "transformation": "assemble",
+                       "status": "RUNNING"})
+    emitter.emit(url, {"id": "4", "transformation": "getmodelparams",
+                       "status": "FINISHED"})
+    emitter.emit(url, {"id": "5", "transformation": "assemble",
+                       "status": "FINISHED"})
+    stats = emitter.stats()
+    assert stats["dropped"] == 3
+    assert stats["dropped_by"] == {"getmodelparams": 2, "assemble": 1}
+    gate.set()
+    emitter.close(timeout=5)
+    assert [x[1]["id"] for x in emitter.received] == ["held", "1", "5"]
+
+
+def test_bounded_queue_ranks_pass():
+    q = _BoundedQueue(100)
+    for i in range(100000):
+        q.offer(i, i % 3)
+        assert q.get() == i
+    assert q._ranks == {}
+    assert len(q.queue) == 0
+
+
+def test_bounded_queue_evict_pass():
+    q = _BoundedQueue(10)
+    for i in range(100000):
+        q.offer(i, 0)
+    assert q.qsize() == 10
+    assert len(q.queue) <= 2 * 10 + 64
+    assert sum(len(x) for x in q._ranks.values()) == 10
+    assert [q.get() for _ in range(10)] == list(range(99990, 100000))
+
+
+def test_stats_with_batcher_pass():
+    with MockDfAnalyzer() as server:
+        url = server.url + "/pde/task/json"
+        emitter = Emitter(batcher=Batcher(max_size=4, max_delay=60))
+        for i in range(10):
+            emitter.emit(url, {"id": str(i)})
+        assert emitter.flush(timeout=5)
+        emitter.close()
+    assert emitter.stats()["sent"] == 10
+    assert emitter.stats()["failed"] == 0
+
+
+def test_spill_pass(tmp_path):
+    gate = threading.Event()
+    spool = Spool(str(tmp_path))
+    emitter = RecordingEmitter(maxsize=1, gate=gate, policy="spill",
+                               spool=spool)
+    hold_worker(emitter)
+    for i in range(4):
+        emitter.emit("/pde/task/json", {"id": str(i)})
+    assert emitter.spilled == 3 and emitter.dropped == 0
+    gate.set()
+    emitter.close(timeout=5)
+    assert [x[1]["id"] for x in emitter.received] == ["held", "0"]
+    with MockDfAnalyzer() as server:
+        assert spool.replay(Batcher(), dfa_url=server.url) == 3
+    assert [x[1]["id"] for x in server.messages] == ["1", "2", "3"]
+
+
+def test_parse_priorities_pass():
+    assert parse_priorities("Assemble=3, getmodelparams=0") == \
+        {"assemble": 3, "getmodelparams": 0}
+
+
+def test_get_emitter_policy_pass(monkeypatch, tmp_path):
+    monkeypatch.setenv("DFA_ASYNC", "1")
+    monkeypatch.setenv("DFA_ASYNC_POLICY", "spill")
+    monkeypatch.setenv("DFA_ASYNC_SPILL_DIR", str(tmp_path))
+    set_emitter(None)
+    try:
+        emitter = get_emitter()
+        assert emitter.policy == "spill"
+        assert emitter.spool.directory == str(tmp_path)
+    finally:
+        set_emitter(None)
@@ -0,0 +1,123 @@
+import os
+import stat
+import threading
+import time
+
+from dfa_lib_python.attribute import Attribute
+from dfa_lib_python.attribute_type import AttributeType
+from dfa_lib_python.extraction_pool import ExtractionIndex, ExtractionPool, \
+    run_extractors
+from dfa_lib_python.extractor_cartridge import ExtractorCartridge
+from dfa_lib_python.raw_data_indexer import RawDataIndexer
+
+RDE = """#!/bin/sh
+sleep 0.3
+echo "$4" >> "$(dirname "$0")/calls.log"
+case "$4" in *bad*) echo "cannot index $4"; exit 3;; esac
+"""
+
+
+def make_dfanalyzer(monkeypatch, tmp_path):
+    directory = tmp_path / "dfanalyzer"
+    (directory / "bin").mkdir(parents=True)
+    script = directory / "bin" / "RDE"
+    script.write_text(RDE)
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("DFANALYZER_DIR", str(directory))
+    return directory / "bin" / "calls.log"
+
+
+def make_indexers(directory, names):
+    attributes = [Attribute("centers", AttributeType.FILE)]
+    return [RawDataIndexer(ExtractorCartridge.INDEXING, "npz", str(directory),
+                           name, attributes) for name in names]
+
+
+def calls(log):
+    return sorted(os.path.basename(x) for x in log.read_text().split())
+
+
+def test_pool_parallel_pass(monkeypatch, tmp_path):
+    log = make_dfanalyzer(monkeypatch, tmp_path)
+    names = ["r{0}.npz".format(i) for i in range(4)]
+    for i, name in enumerate(names):
+        (tmp_path / name).write_bytes(bytes([i]))
+    start = time.perf_counter()
+    results = ExtractionPool(max_workers=4).run(
+        make_indexers(tmp_path, names))
+    assert time.perf_counter() - start < 1.0
+    assert [x.returncode for x in results] == [0, 0, 0, 0]
+    assert all(x.duration >= 0.3 for x in results)
+    assert calls(log) == names
+
+
+def test_pool_index_skips_pass(monkeypatch, tmp_path):
+    log = make_dfanalyzer(monkeypatch, tmp_path)
+    for name, content in (("a.npz", b"a"), ("b.npz", b"b"),
+                          ("copy.npz", b"a"), ("bad.npz", b"c")):
+        (tmp_path / name).write_bytes(content)
+    names = ["a.npz", "b.npz", "copy.npz", "bad.npz"]
+    index = str(tmp_path / "index.jsonl")
+    results = run_extractors(make_indexers(tmp_path, names), index=index)
+    assert [x.skipped for x in results].count(True) == 1
+    assert results[3].returncode == 3 and not results[3].ok
+    assert "cannot index" in results[3].output
+    assert len(calls(log)) == 3
+
+    (tmp_path / "b.npz").write_bytes(b"changed")
+    results = run_extractors(make_indexers(tmp_path, names), index=index)
+    assert [x.skipped for x in results] == [True, False, True, False]
+    assert calls(log).count("b.npz") == 2
+    assert calls(log).count("bad.npz") == 2
+
+
+def test_pool_timeout_pass(monkeypatch, tmp_path):
+    make_dfanalyzer(monkeypatch, tmp_path)
+    (tmp_path / "a.npz").write_bytes(b"a")
+    index = ExtractionIndex(str(tmp_path / "index.jsonl"))
+    results = ExtractionPool(index=index, timeout=0.05).run(
+        make_indexers(tmp_path, ["a.npz"]))
+    assert results[0].returncode is None and not results[0].ok
+    assert results[0].key not in index
+
+
+def test_extraction_index_torn_line_pass(tmp_path):
+    path = tmp_path / "index.jsonl"
+    path.write_text('{"key": "k1", "source": "a"}\n{"key": "k2", "sou')
+    index = ExtractionIndex(str(path))
+    assert index.get("k1") == {"key": "k1", "source": "a"}
+    assert "k2" not in index
+
+
+def test_pool_repeat_waits_for_failure_pass(monkeypatch, tmp_path):
+    log = make_dfanalyzer(monkeypatch, tmp_path)
+    names = ["bad1.npz", "bad2.npz", "bad3.npz"]
+    for name in names:
+        (tmp_path / name).write_bytes(b"c")
+    index = str(tmp_path / "index.jsonl")
+    results = run_extractors(make_indexers(tmp_path, names), max_workers=3,
+                             index=index)
+    assert len(calls(log)) == 1
+    assert [x.returncode for x in results] == [3, 3, 3]
+    assert not any(x.ok or x.skipped for x in results)
+    assert all("cannot index" in x.output for x in results)
+
+
+def test_pool_concurrent_runs_pass(monkeypatch, tmp_path):
+    log = make_dfanalyzer(monkeypatch, tmp_path)
+    for name, content in (("a.npz", b"a"), ("a2.npz", b"a"),
+                          ("b.npz", b"b"), ("b2.npz", b"b")):
+        (tmp_path / name).write_bytes(content)
+    pool = ExtractionPool(max_workers=1,
+                          index=ExtractionIndex(str(tmp_path / "i.jsonl")))
+    results = {}
+    threads = [threading.Thread(target=lambda x=x: results.update(
+        {x: pool.run(make_indexers(tmp_path, [x + ".npz", x + "2.npz"]))}))
+        for x in ("a", "b")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert calls(log) == ["a.npz", "b.npz"]
+    assert [[y.skipped for y in results[x]] for x in ("a", "b")] == \
+        [[False, True], [False, True]]
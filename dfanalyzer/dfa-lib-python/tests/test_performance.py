@@ -68,4 +68,15 @@ def test_set_description_pass():
     new_description = "Another simple description"
     performance = Performance(start_time, end_time, description=description)
     performance.description = new_description
-    assert performance.description == new_description
\ No newline at end of file
+    assert performance.description == new_description
+
+
+def test_high_resolution_fields_pass():
+    start_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    end_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    performance = Performance(start_time, end_time, duration_ns=1500,
+                              cpu_time_ns=1000, peak_rss=4096, threads=2)
+    assert performance.durationNs == 1500
+    assert performance.get_specification()["cpuTimeNs"] == "1000"
+    assert performance.peakRss == 4096
+    assert Performance(start_time, end_time).threads is None
@@ -0,0 +1,114 @@
+import pytest
+from dfa_lib_python.attribute import Attribute
+from dfa_lib_python.attribute_type import AttributeType
+from dfa_lib_python.backend import HttpBackend, SQLiteBackend, set_backend
+from dfa_lib_python.dataflow import Dataflow
+from dfa_lib_python.mock_server import MockDfAnalyzer
+from dfa_lib_python.registry import DataflowCache, set_dataflow_cache, \
+    specification_digest
+from dfa_lib_python.set import Set
+from dfa_lib_python.set_type import SetType
+from dfa_lib_python.transformation import Transformation
+
+
+def make_dataflow(attribute="att1"):
+    sets = [Set("itf", SetType.INPUT,
+                [Attribute(attribute, AttributeType.TEXT)])]
+    return Dataflow("df", [Transformation("tf", sets=sets)])
+
+
+def dataflows(server):
+    return [x for p, x in server.messages if p == "/pde/dataflow/json"]
+
+
+def test_specification_digest_pass():
+    assert specification_digest({"a": 1, "b": [2]}) == \
+        specification_digest({"b": [2], "a": 1})
+    assert specification_digest({"a": 1}) != specification_digest({"a": 2})
+
+
+def test_register_skips_unchanged_pass(tmp_path):
+    set_dataflow_cache(DataflowCache(str(tmp_path / "cache.json")))
+    with MockDfAnalyzer() as server:
+        set_backend(HttpBackend(server.url))
+        try:
+            assert make_dataflow().register()
+            assert not make_dataflow().register()
+            assert make_dataflow("att2").register()
+            assert make_dataflow().register(force=True)
+        finally:
+            set_backend(None)
+            set_dataflow_cache(None)
+    assert len(dataflows(server)) == 3
+
+
+def test_register_server_reset_pass(tmp_path):
+    cache = DataflowCache(str(tmp_path / "cache.json"))
+    set_dataflow_cache(cache)
+    try:
+        with MockDfAnalyzer() as server:
+            set_backend(HttpBackend(server.url))
+            assert make_dataflow().register()
+            server.reset()
+            assert make_dataflow().register()
+            assert not make_dataflow().register()
+            assert len(dataflows(server)) == 1
+    finally:
+        set_backend(None)
+        set_dataflow_cache(None)
+
+
+def test_register_unknown_server_pass(tmp_path):
+    cache = DataflowCache(str(tmp_path / "cache.json"))
+    set_dataflow_cache(cache)
+    try:
+        with MockDfAnalyzer() as server:
+            backend = HttpBackend(server.url)
+            cache.put(backend.location, "df",
+                      specification_digest(make_dataflow().get_specification()))
+            # the server cannot tell, so the cache is trusted
+            backend.has_dataflow = lambda tag: None
+            set_backend(backend)
+            assert not make_dataflow().register()
+    finally:
+        set_backend(None)
+        set_dataflow_cache(None)
+    assert dataflows(server) == []
+
+
+def test_register_sqlite_pass(tmp_path):
+    set_dataflow_cache(DataflowCache(str(tmp_path / "cache.json")))
+    try:
+        set_backend(SQLiteBackend(str(tmp_path / "a.sqlite")))
+        assert make_dataflow().register()
+        assert not make_dataflow().register()
+        set_backend(SQLiteBackend(str(tmp_path / "b.sqlite")))
+        assert make_dataflow().register()
+    finally:
+        set_backend(None)
+        set_dataflow_cache(None)
+
+
+def test_dataflow_cache_corrupted_pass(tmp_path):
+    path = tmp_path / "cache.json"
+    path.write_text("{not json")
+    cache = DataflowCache(str(path))
+    assert cache.get("http://x", "df") is None
+    cache.put("http://x", "df", "abc")
+    assert DataflowCache(str(path)).get("http://x", "df") == "abc"
+
+
+def test_register_deprecated_dfa_url_pass(tmp_path, monkeypatch):
+    from dfa_lib_python import dataflow as dataflow_module
+    set_dataflow_cache(DataflowCache(str(tmp_path / "cache.json")))
+    try:
+        with MockDfAnalyzer() as server:
+            set_backend(HttpBackend("http://127.0.0.1:9"))
+            monkeypatch.setattr(dataflow_module, "dfa_url", server.url)
+            with pytest.warns(DeprecationWarning):
+                assert make_dataflow().register()
+            make_dataflow().save()
+    finally:
+        set_backend(None)
+        set_dataflow_cache(None)
+    assert len(dataflows(server)) == 2
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from dfa_lib_python.backend import HttpBackend, set_backend
+from dfa_lib_python.mock_server import MockDfAnalyzer
+from dfa_lib_python.sampling import EveryNth, FirstLast, OnChange, \
+    Sampler, Verbosity, parse_policy, set_sampler
+from dfa_lib_python.scope import NULL_SCOPE, task_scope
+
+
+def test_every_nth_pass():
+    sampler = Sampler(policy=EveryNth(10), num_rounds=25)
+    rounds = [r for r in range(25) if sampler.sample(Verbosity.ROUND, r)]
+    assert rounds == [0, 10, 20, 24]
+
+
+def test_first_last_pass():
+    sampler = Sampler(policy=FirstLast(2))
+    assert [r for r in range(6) if sampler.sample(round=r)] == [0, 1]
+    sampler.set_num_rounds(6)
+    assert [r for r in range(6) if sampler.sample(round=r)] == [0, 1, 4, 5]
+
+
+def test_verbosity_pass():
+    sampler = Sampler(Verbosity.ROUND, policy=EveryNth(5))
+    assert sampler.sample(Verbosity.SETUP, round=3)
+    assert not sampler.sample(Verbosity.ROUND, round=3)
+    assert not sampler.sample(Verbosity.DETAIL, round=0)
+    assert not Sampler(Verbosity.OFF).sample(Verbosity.SETUP)
+
+
+def test_on_change_pass():
+    policy = OnChange(1e-3)
+    center = np.ones((3, 2))
+    assert policy.changed("assemble", center)
+    center += 1e-6
+    assert not policy.changed("assemble", center)
+    center += 1.0
+    assert policy.changed("assemble", center)
+    assert policy.changed("clientvalidation", 0.5)
+    assert not policy.changed("clientvalidation", 0.5)
+
+
+def test_parse_policy_pass():
+    assert isinstance(parse_policy("every:5"), EveryNth)
+    assert parse_policy("first_last:3").k == 3
+    assert parse_policy("on_change").tolerance == 1e-3
+    with pytest.raises(ValueError):
+        parse_policy("sometimes")
+
+
+def test_scope_sampling_pass():
+    with MockDfAnalyzer() as server:
+        set_backend(HttpBackend(server.url))
+        set_sampler(Sampler(policy=OnChange(1e-3)))
+        try:
+            assert task_scope(1, "df", "tf", level=Verbosity.DETAIL,
+                              round=1) is not NULL_SCOPE
+            for r, metric in enumerate([0.5, 0.5, 0.7]):
+                with task_scope(r, "df", "ClientValidation", eager=True,
+                                round=r) as scope:
+                    scope.metric(metric)
+                    scope.output("oClientValidation", [metric])
+            set_sampler(Sampler(Verbosity.SETUP))
+            assert task_scope(9, "df", "tf", round=0) is NULL_SCOPE
+        finally:
+            set_sampler(None)
+            set_backend(None)
+    messages = [x[1] for x in server.messages]
+    assert [(x["id"], x["status"]) for x in messages] == \
+        [("0", "FINISHED"), ("2", "FINISHED")]
@@ -0,0 +1,82 @@
+import pytest
+from dfa_lib_python import scope as scope_module
+from dfa_lib_python.backend import HttpBackend, set_backend
+from dfa_lib_python.dependency import Dependency
+from dfa_lib_python.mock_server import MockDfAnalyzer
+from dfa_lib_python.scope import NULL_SCOPE, current_scope, \
+    provenance_task, task_scope
+from dfa_lib_python.set_type import SetType
+
+
+def record(function):
+    with MockDfAnalyzer() as server:
+        set_backend(HttpBackend(server.url))
+        try:
+            function()
+        finally:
+            set_backend(None)
+    return [x[1] for x in server.messages]
+
+
+def test_task_scope_pass():
+    def run():
+        with task_scope(3, "df", "LoadData") as scope:
+            assert current_scope() is scope
+            scope.input("iLoadData", ["a"])
+            data = [1, 2, 3]
+            scope.output("oLoadData", lambda: [len(data), scope.elapsed()])
+            assert [x[0] for x in scope.datasets] == [SetType.INPUT,
+                                                       SetType.OUTPUT]
+        assert current_scope() is NULL_SCOPE
+    messages = record(run)
+    assert [x["status"] for x in messages] == ["RUNNING", "FINISHED"]
+    sets = messages[-1]["sets"]
+    assert [x["tag"] for x in sets] == ["iloaddata", "oloaddata"]
+    assert sets[1]["elements"][0][0] == "3"
+    assert float(sets[1]["elements"][0][1]) > 0
+
+
+def test_task_scope_failure_pass():
+    def run():
+        with pytest.raises(ValueError):
+            with task_scope(5, "df", "ClientTraining", coalesce=True,
+                            dependency=Dependency(["LoadData"], ["3"])) as scope:
+                scope.input("iClientTraining", [1])
+                scope.output("oClientTraining", lambda: [result])
+                raise ValueError("bad input")
+                result = 1
+    messages = record(run)
+    assert len(messages) == 1
+    assert messages[0]["status"] == "FAILED"
+    assert messages[0]["error"] == "ValueError: bad input"
+    assert [x["tag"] for x in messages[0]["sets"]] == ["iclienttraining"]
+    assert messages[0]["dependency"]["ids"] == [{"id": "3"}]
+
+
+def test_provenance_task_pass():
+    @provenance_task("df", "Assemble", id=lambda round: 7 + 4 * round,
+                     coalesce=True)
+    def assemble(round):
+        current_scope().output("oAssemble", [round])
+        return round * 2
+
+    results = []
+    messages = record(lambda: results.append(assemble(2)))
+    assert results == [4]
+    assert messages[0]["id"] == "15"
+    assert messages[0]["sets"][0]["elements"] == [["2"]]
+
+
+def test_disabled_pass(monkeypatch):
+    monkeypatch.setattr(scope_module, "dfa_enabled", False)
+
+    @provenance_task("df", "Assemble", id=1)
+    def assemble():
+        return current_scope()
+
+    def run():
+        with task_scope(1, "df", "tf") as scope:
+            scope.output("otf", lambda: pytest.fail("values were built"))
+        assert scope is NULL_SCOPE
+        assert assemble() is NULL_SCOPE
+    assert record(run) == []
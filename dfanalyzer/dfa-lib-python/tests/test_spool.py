@@ -0,0 +1,117 @@
+import os
+from dfa_lib_python.backend import HttpBackend, set_backend
+from dfa_lib_python.batch import Batcher
+from dfa_lib_python.mock_server import MockDfAnalyzer
+from dfa_lib_python.spool import Spool, set_spool
+from dfa_lib_python.task import Task
+from dfa_lib_python.transport import Transport, set_transport
+
+
+def test_append_rotate_pass(tmp_path):
+    spool = Spool(str(tmp_path), segment_bytes=200, fsync_every=1)
+    for i in range(10):
+        spool.append("http://dfa/pde/task/json", {"id": str(i)})
+    spool.close()
+    segments = spool.segments()
+    assert len(segments) > 1
+    reopened = Spool(str(tmp_path))
+    reopened.append("http://dfa/pde/task/json", {"id": "10"})
+    reopened.close()
+    assert reopened.segments()[:-1] == segments
+    assert len(reopened.segments()) == len(segments) + 1
+
+
+def test_replay_pass(tmp_path):
+    spool = Spool(str(tmp_path), segment_bytes=200)
+    for i in range(10):
+        spool.append("http://unreachable:1/pde/task/json", {"id": str(i)})
+    with MockDfAnalyzer() as server:
+        shipped = spool.replay(Batcher(max_size=4), dfa_url=server.url)
+    assert shipped == 10
+    assert spool.segments() == []
+    assert [x[1]["id"] for x in server.messages] == \
+        [str(i) for i in range(10)]
+    assert server.requests < 10
+
+
+def test_replay_keeps_failed_segments_pass(tmp_path):
+    spool = Spool(str(tmp_path))
+    spool.append("http://127.0.0.1:1/pde/task/json", {"id": "1"})
+    spool.append("http://127.0.0.1:1/pde/task/json", {"id": "2"})
+    set_transport(Transport(retries=0))
+    try:
+        assert spool.replay(Batcher()) == 0
+    finally:
+        set_transport(None)
+    assert len(spool.segments()) == 1
+
+
+def test_replay_skips_torn_line_pass(tmp_path):
+    spool = Spool(str(tmp_path))
+    spool.append("http://dfa/pde/task/json", {"id": "1"})
+    spool.close()
+    with open(spool.segments()[0], "a") as f:
+        f.write('{"url": "http://dfa/pde/task/json", "mess')
+    with MockDfAnalyzer() as server:
+        shipped = spool.replay(dfa_url=server.url)
+    assert shipped == 1
+    assert len(server.messages) == 1
+
+
+def test_task_uses_spool_pass(tmp_path):
+    set_backend(HttpBackend("http://127.0.0.1:1"))
+    spool = Spool(str(tmp_path))
+    set_spool(spool)
+    try:
+        task = Task(1, "df", "tf")
+        task.begin()
+        task.end()
+    finally:
+        set_spool(None)
+        set_backend(None)
+    records = list(spool._read(spool.segments()[0]))
+    assert [x[1]["status"] for x in records] == ["RUNNING", "FINISHED"]
+    assert os.path.basename(spool.segments()[0]) == "spool-00000001.log"
+
+
+class FailingBatcher(Batcher):
+    """Batcher whose requests fail after the first ``accepted`` ones."""
+    def __init__(self, accepted, **kwargs):
+        super().__init__(**kwargs)
+        self.accepted = accepted
+
+    def _post(self, url, data, headers):
+        if self.requests >= self.accepted:
+            self.requests += 1
+            return None
+        return super()._post(url, data, headers)
+
+
+def test_replay_resumes_inside_segment_pass(tmp_path):
+    spool = Spool(str(tmp_path))
+    for i in range(10):
+        endpoint = "task" if i % 2 else "dataflow"
+        spool.append("http://dfa/pde/{0}/json".format(endpoint),
+                     {"id": str(i)})
+    with MockDfAnalyzer() as server:
+        shipped = spool.replay(FailingBatcher(2, max_size=2),
+                               dfa_url=server.url)
+        assert shipped == 4
+        assert len(spool.segments()) == 1
+        shipped = spool.replay(Batcher(max_size=2), dfa_url=server.url)
+    assert shipped == 6
+    assert spool.segments() == []
+    assert os.listdir(str(tmp_path)) == []
+    ids = sorted(int(x[1]["id"]) for x in server.messages)
+    assert ids == list(range(10))
+
+
+def test_replay_keep_skips_sent_messages_pass(tmp_path):
+    spool = Spool(str(tmp_path))
+    for i in range(3):
+        spool.append("http://dfa/pde/task/json", {"id": str(i)})
+    with MockDfAnalyzer() as server:
+        assert spool.replay(dfa_url=server.url, delete=False) == 3
+        assert spool.replay(dfa_url=server.url, delete=False) == 0
+    assert len(server.messages) == 3
+    assert len(spool.segments()) == 1
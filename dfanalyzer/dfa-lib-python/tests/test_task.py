@@ -0,0 +1,95 @@
+import pytest
+from dfa_lib_python import task as task_module
+from dfa_lib_python.backend import HttpBackend, set_backend
+from dfa_lib_python.dataset import DataSet
+from dfa_lib_python.element import Element
+from dfa_lib_python.mock_server import MockDfAnalyzer
+from dfa_lib_python.task import Task
+
+
+def run_task(server, monkeypatch, eager=None, **kwargs):
+    set_backend(HttpBackend(server.url))
+    try:
+        task = Task(1, "df", "tf", **kwargs)
+        task.begin(eager=eager)
+        task.add_dataset(DataSet("itf", [Element([1, 2])]))
+        task.end()
+    finally:
+        set_backend(None)
+    return [x[1] for x in server.messages]
+
+
+def test_begin_end_pass(monkeypatch):
+    with MockDfAnalyzer() as server:
+        messages = run_task(server, monkeypatch)
+    assert [x["status"] for x in messages] == ["RUNNING", "FINISHED"]
+
+
+def test_coalesce_pass(monkeypatch):
+    with MockDfAnalyzer() as server:
+        messages = run_task(server, monkeypatch, coalesce=True)
+    assert len(messages) == 1
+    assert messages[0]["status"] == "FINISHED"
+    assert messages[0]["sets"] == [{"tag": "itf", "elements": [["1", "2"]]}]
+    assert messages[0]["performances"][0]["startTime"]
+
+
+def test_coalesce_eager_begin_pass(monkeypatch):
+    with MockDfAnalyzer() as server:
+        messages = run_task(server, monkeypatch, eager=True, coalesce=True)
+    assert [x["status"] for x in messages] == ["RUNNING", "FINISHED"]
+
+
+def test_coalesce_default_pass(monkeypatch):
+    monkeypatch.setattr(task_module, "dfa_coalesce", True)
+    assert Task(1, "df", "tf").coalesce
+    assert not Task(1, "df", "tf", coalesce=False).coalesce
+
+
+def test_performance_record_pass(monkeypatch):
+    with MockDfAnalyzer() as server:
+        messages = run_task(server, monkeypatch)
+    performance = messages[-1]["performances"][0]
+    assert int(performance["durationNs"]) > 0
+    assert int(performance["cpuTimeNs"]) >= 0
+    assert int(performance["threads"]) >= 1
+
+
+def test_elapsed_pass():
+    task = Task(1, "df", "tf")
+    assert task.elapsed() == 0.0
+    task.coalesce = True
+    task.begin()
+    assert task.elapsed() > 0
+
+
+def test_task_slots_pass():
+    task = Task(1, "df", "tf", sub_id="2")
+    assert not hasattr(task, "__dict__")
+    assert task.get_specification() == {
+        "tag": "tf", "status": "READY", "dataflow": "df",
+        "transformation": "tf", "id": "1", "sub": "2"}
+
+
+def test_deprecated_module_dfa_url_pass(monkeypatch):
+    from dfa_lib_python import dataflow as dataflow_module
+    from dfa_lib_python.dataflow import Dataflow
+    set_backend(None)
+    with MockDfAnalyzer() as server:
+        monkeypatch.setattr(task_module, "dfa_url", server.url)
+        monkeypatch.setattr(dataflow_module, "dfa_url", server.url)
+        with pytest.warns(DeprecationWarning):
+            Task(1, "df", "tf").save()
+        Dataflow("df").save()
+        paths = [x[0] for x in server.messages]
+    assert paths == ["/pde/task/json", "/pde/dataflow/json"]
+
+
+def test_deprecated_task_dfa_url_pass():
+    with MockDfAnalyzer() as server:
+        task = Task(1, "df", "tf")
+        with pytest.warns(DeprecationWarning):
+            task.dfa_url = server.url
+            task.save()
+        assert task.dfa_url == server.url
+        assert len(server.messages) == 1
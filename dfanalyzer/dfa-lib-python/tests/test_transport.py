@@ -0,0 +1,166 @@
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+from dfa_lib_python.mock_server import MockDfAnalyzer
+from dfa_lib_python.transport import Transport, get_transport, set_transport
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        server = self.server
+        server.clients.add(self.client_address)
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        status = 200
+        if server.failures > 0:
+            server.failures -= 1
+            status = 503
+        server.posts += 1
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        server = self.server
+        status = 200
+        if server.failures > 0:
+            server.failures -= 1
+            status = 503
+        server.gets += 1
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(failures=0):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.clients = set()
+    server.posts = 0
+    server.gets = 0
+    server.failures = failures
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, "http://127.0.0.1:{0}".format(server.server_port)
+
+
+def test_keep_alive_pass():
+    server, url = start_server()
+    transport = Transport()
+    for i in range(20):
+        r = transport.post(url + "/pde/task/json", json={"id": str(i)})
+        assert r.status_code == 200
+    transport.close()
+    server.shutdown()
+    assert server.posts == 20
+    assert len(server.clients) == 1
+
+
+def test_retry_pass():
+    server, url = start_server(failures=2)
+    transport = Transport(retries=3, backoff_factor=0)
+    r = transport.get(url + "/pde/dataflow")
+    transport.close()
+    server.shutdown()
+    assert r.status_code == 200
+    assert server.gets == 3
+
+
+def test_post_not_resent_on_status_pass():
+    # the record may be stored already when a proxy answers 503
+    server, url = start_server(failures=1)
+    transport = Transport(retries=3, backoff_factor=0)
+    r = transport.post(url + "/pde/task/json", json={"id": "1"})
+    transport.close()
+    server.shutdown()
+    assert r.status_code == 503
+    assert server.posts == 1
+
+
+def test_post_retried_on_connect_error_pass():
+    transport = Transport(retries=3, backoff_factor=0)
+    retry = transport._session.get_adapter("http://localhost").max_retries
+    transport.close()
+    assert retry.connect is None and retry.total == 3
+    assert not retry.is_retry("POST", 503)
+    assert retry.is_retry("GET", 503)
+    assert not retry._is_method_retryable("POST")
+
+
+def test_get_transport_from_environment_pass(monkeypatch):
+    monkeypatch.setenv("DFA_TIMEOUT", "2.5")
+    monkeypatch.setenv("DFA_RETRIES", "1")
+    set_transport(None)
+    try:
+        transport = get_transport()
+        assert transport.timeout == 2.5
+        assert transport.retries == 1
+        assert get_transport() is transport
+    finally:
+        set_transport(None)
+
+
+def large_message(i):
+    return {"id": str(i), "sets": [{"tag": "oassemble",
+                                    "elements": [[str(x) for x in range(500)]]}]}
+
+
+def test_gzip_compression_pass():
+    with MockDfAnalyzer() as server:
+        transport = Transport(compression="gzip")
+        r = transport.post(server.url + "/pde/task/json", json=large_message(1))
+        small = transport.post(server.url + "/pde/task/json", json={"id": "2"})
+        transport.close()
+    assert r.status_code == 200 and small.status_code == 200
+    assert [x[1] for x in server.messages] == [large_message(1), {"id": "2"}]
+    assert server.bytes_received < server.bytes_decoded
+
+
+def test_auto_compression_pass():
+    with MockDfAnalyzer() as server:
+        url = server.url + "/pde/task/json"
+        transport = Transport(compression="auto")
+        assert transport.encoding(url) is None
+        transport.post(url, json=large_message(1))
+        first = server.bytes_received
+        assert transport.encoding(url) in ("gzip", "zstd")
+        transport.post(url, json=large_message(2))
+        transport.close()
+    assert server.bytes_received - first < first
+    assert [x[1]["id"] for x in server.messages] == ["1", "2"]
+
+
+def test_auto_compression_unsupported_pass():
+    with MockDfAnalyzer(encodings=()) as server:
+        url = server.url + "/pde/task/json"
+        transport = Transport(compression="auto")
+        for i in range(2):
+            transport.post(url, json=large_message(i))
+        transport.close()
+    assert transport.encoding(url) is None
+    assert server.bytes_received == server.bytes_decoded
+
+
+def test_auto_compression_refused_pass():
+    with MockDfAnalyzer(encodings=()) as server:
+        url = server.url + "/pde/task/json"
+        transport = Transport(compression="auto")
+        transport._encodings[urlsplit(url).netloc] = "gzip"
+        r = transport.post(url, json=large_message(1))
+        transport.close()
+    assert r.status_code == 200
+    assert transport.encoding(url) is None
+    assert len(server.messages) == 1
+
+
+def test_zstd_compression_pass():
+    pytest.importorskip("zstandard")
+    with MockDfAnalyzer() as server:
+        transport = Transport(compression="zstd")
+        transport.post(server.url + "/pde/task/json", json=large_message(1))
+        transport.close()
+    assert server.messages[0][1] == large_message(1)
+    assert server.bytes_received < server.bytes_decoded
@@ -0,0 +1,224 @@
+"""Incrementally export the provenance tables of DfAnalyzer to Parquet.
+
+The tables and columns are those of ``save_results.sql``. Instead of
+dumping every table in full on each run, the exporter remembers, per
+table and trial, the highest row ``id`` already exported and the number of
+rows, and only appends the new rows, as one Parquet file per run under a
+hive-style partition::
+
+    results/parquet/oClientTraining/trial_id=<hash>/part-<from>-<to>.parquet
+
+Task ids and timestamps are neither unique nor ordered by insertion, so
+they are never used as a mark. A table without an ``id`` column, or a
+trial that gained rows below its mark, is rewritten in full as
+``part-all.parquet`` whenever its row count changes.
+
+Analysis tools read a table with column pruning and partition filters, e.g.
+``pyarrow.dataset.dataset("results/parquet/oClientValidation",
+partitioning="hive").to_table(columns=["current_round",
+"silhouette_score"])``, or ``pandas.read_parquet`` on the same directory.
+
+Usage:
+  python export_results.py [--out results/parquet] [--state STATE]
+      [--host localhost] [--port 50000] [--database dataflow_analyzer]
+      [--user monetdb] [--password monetdb] [--only oAssemble ...]
+"""
+import argparse
+import json
+import os
+import re
+from pathlib import Path
+from urllib.parse import quote
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+SQL_PATH = Path(__file__).resolve().with_name("save_results.sql")
+PARTITION_COLUMN = "trial_id"
+# high-water mark column, an increasing row id
+MARK_COLUMN = "id"
+
+EXPORT_PATTERN = re.compile(
+    r"SELECT\s+(?P<columns>.*?)\s+FROM\s+(?P<table>\w+)\s*\)\s*"
+    r"INTO\s+'results/(?P<name>\w+)\.csv'", re.S | re.I)
+
+
+def read_exports(sql_path: Path = SQL_PATH) -> list:
+    """Return the (name, table, columns) exports of save_results.sql."""
+    exports = []
+    for match in EXPORT_PATTERN.finditer(sql_path.read_text()):
+        columns = [c.strip() for c in match.group("columns").split(",")]
+        exports.append((match.group("name"), match.group("table"), columns))
+    return exports
+
+
+class ExportState:
+    """High-water marks of the exported rows, per export and trial, kept
+    in a JSON file replaced atomically after each written partition."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        try:
+            self.marks = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            self.marks = {}
+
+    def get(self, name: str, trial: str) -> dict:
+        return self.marks.get(name, {}).get(trial)
+
+    def put(self, name: str, trial: str, entry: dict):
+        self.marks.setdefault(name, {})[trial] = entry
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        temporary.write_text(json.dumps(self.marks, indent=2, sort_keys=True,
+                                        default=str))
+        os.replace(temporary, self.path)
+
+
+class Exporter:
+    """Append the rows added since the last run to partitioned Parquet.
+
+    Args:
+        connection: A DB-API connection to the DfAnalyzer MonetDB database.
+        out_dir: Root of the Parquet dataset.
+        state: The high-water marks of previous runs.
+    """
+
+    def __init__(self, connection, out_dir: Path, state: ExportState):
+        self.connection = connection
+        self.out_dir = Path(out_dir)
+        self.state = state
+
+    def query(self, sql: str, parameters=()) -> tuple:
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(sql, parameters)
+            names = [d[0] for d in cursor.description]
+            return names, cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def table_columns(self, table: str) -> list:
+        _, rows = self.query(
+            "SELECT c.name FROM sys.columns c "
+            "JOIN sys.tables t ON c.table_id = t.id WHERE t.name = %s",
+            (table.lower(),))
+        return [r[0].lower() for r in rows]
+
+    def export(self, name: str, table: str, columns: list) -> int:
+        """Export the new rows of one table, returning how many."""
+        available = self.table_columns(table)
+        wanted = [c.lower() for c in columns]
+        if not available or not set(wanted) <= set(available) \
+                or PARTITION_COLUMN not in wanted:
+            # e.g. the DBSCAN columns of a k-means database
+            print(f"{name}: skipped, {table} has no such columns")
+            return 0
+        mark = MARK_COLUMN if MARK_COLUMN in available else None
+        select, order = ", ".join(wanted), ""
+        if mark is not None:
+            select += f", {mark} AS dfa_mark"
+            order = f" ORDER BY {mark}"
+        summary = f"SELECT {PARTITION_COLUMN}, COUNT(*) FROM {table} " \
+                  f"GROUP BY {PARTITION_COLUMN}"
+        exported = 0
+        for row in self.query(summary)[1]:
+            trial, count = str(row[0]), row[1]
+            previous = self.state.get(name, trial) or {}
+            if previous.get("column") != mark:
+                # exported with another mark column, start the trial over
+                previous = {}
+            if previous.get("rows") == count:
+                continue
+            rows = None
+            if "mark" in previous:
+                names, rows = self.query(
+                    f"SELECT {select} FROM {table} WHERE {PARTITION_COLUMN} "
+                    f"= %s AND {mark} > %s{order}",
+                    (row[0], previous["mark"]))
+                if previous["rows"] + len(rows) != count:
+                    # rows were committed below the mark
+                    rows = None
+            if rows is None:
+                # first run, no id column or late rows: the whole trial
+                names, rows = self.query(
+                    f"SELECT {select} FROM {table} "
+                    f"WHERE {PARTITION_COLUMN} = %s{order}", (row[0],))
+                previous = {}
+            if not rows:
+                continue
+            if mark is None:
+                path = self.write(name, trial, "part-all", names, rows)
+                entry = {"column": None, "rows": len(rows)}
+            else:
+                low, high = previous.get("mark", "start"), rows[-1][-1]
+                path = self.write(name, trial, f"part-{low}-{high}",
+                                  names[:-1], [r[:-1] for r in rows])
+                entry = {"column": mark, "mark": high,
+                         "rows": previous.get("rows", 0) + len(rows)}
+            if not previous:
+                # the trial was read in full, drop its older files
+                self.clear(name, trial, keep=path)
+            self.state.put(name, trial, entry)
+            exported += len(rows)
+        print(f"{name}: {exported} rows")
+        return exported
+
+    def partition(self, name: str, trial: str) -> Path:
+        return self.out_dir / name / \
+            f"{PARTITION_COLUMN}={quote(trial, safe='')}"
+
+    def clear(self, name: str, trial: str, keep: Path = None):
+        """Remove the Parquet files of a trial, except ``keep``."""
+        for path in self.partition(name, trial).glob("part-*.parquet"):
+            if path != keep:
+                path.unlink()
+
+    def write(self, name: str, trial: str, part: str, names: list,
+              rows: list):
+        directory = self.partition(name, trial)
+        directory.mkdir(parents=True, exist_ok=True)
+        keep = [i for i, n in enumerate(names)
+                if n.lower() != PARTITION_COLUMN]
+        table = pa.table({names[i].lower(): [r[i] for r in rows]
+                          for i in keep})
+        path = directory / f"{quote(str(part), safe='-')}.parquet"
+        # dataset readers ignore files starting with a dot
+        temporary = directory / f".{path.name}.tmp"
+        pq.write_table(table, temporary)
+        os.replace(temporary, path)
+        return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", default="results/parquet")
+    parser.add_argument("--state", default=None,
+                        help="High-water marks, default <out>/_state.json.")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=50000)
+    parser.add_argument("--database", default="dataflow_analyzer")
+    parser.add_argument("--user", default="monetdb")
+    parser.add_argument("--password", default="monetdb")
+    parser.add_argument("--only", nargs="+", default=None,
+                        help="Names of the exports to run.")
+    args = parser.parse_args()
+
+    import pymonetdb
+
+    connection = pymonetdb.connect(username=args.user,
+                                   password=args.password,
+                                   hostname=args.host, port=args.port,
+                                   database=args.database)
+    state = ExportState(args.state or Path(args.out) / "_state.json")
+    exporter = Exporter(connection, args.out, state)
+    try:
+        for name, table, columns in read_exports():
+            if args.only is None or name in args.only:
+                exporter.export(name, table, columns)
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
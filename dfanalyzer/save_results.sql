@@ -64,6 +64,8 @@ COPY (
         n_init,
         reassignment_ratio,
         random_state,
+        local_algorithm,
+        init_method,
         timestamp
     FROM iClientTraining
 )
@@ -79,6 +81,7 @@ COPY (
         center_local,
         count_local,
         center_global,
+        skipped_distances,
         training_time,
         timestamp
     FROM oClientTraining
@@ -198,6 +201,9 @@ COPY (
         client_id,
         current_round,
         silhouette_score,
+        validation_metric,
+        score_ci_low,
+        score_ci_high,
         validation_time,
         timestamp
     FROM oClientValidation
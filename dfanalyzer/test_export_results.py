@@ -0,0 +1,113 @@
+import os
+import sqlite3
+import pytest
+
+pytest.importorskip("pyarrow")
+from export_results import ExportState, Exporter  # noqa: E402
+
+COLUMNS = ["trial_id", "current_round", "silhouette_score"]
+
+
+class FakeConnection(object):
+    """A DB-API connection over sqlite that answers the MonetDB catalog
+    query and the ``%s`` parameters used by the exporter."""
+    def __init__(self, with_id=True):
+        self.db = sqlite3.connect(":memory:")
+        key = "id INTEGER PRIMARY KEY, " if with_id else ""
+        self.db.execute("CREATE TABLE oclientvalidation ({0}trial_id TEXT, "
+                        "current_round INTEGER, silhouette_score REAL, "
+                        "clientvalidation_task_id INTEGER)".format(key))
+
+    def insert(self, trial, rnd, row_id=None, task_id=0):
+        if row_id is None:
+            self.db.execute("INSERT INTO oclientvalidation (trial_id, "
+                            "current_round, silhouette_score, "
+                            "clientvalidation_task_id) VALUES (?, ?, ?, ?)",
+                            (trial, rnd, rnd / 10.0, task_id))
+        else:
+            self.db.execute("INSERT INTO oclientvalidation VALUES "
+                            "(?, ?, ?, ?, ?)",
+                            (row_id, trial, rnd, rnd / 10.0, task_id))
+
+    def cursor(self):
+        return FakeCursor(self.db)
+
+
+class FakeCursor(object):
+    def __init__(self, db):
+        self.db = db
+        self.description = None
+        self.rows = []
+
+    def execute(self, sql, parameters=()):
+        if "sys.columns" in sql:
+            info = self.db.execute(
+                "PRAGMA table_info({0})".format(parameters[0])).fetchall()
+            self.description = [("name",)]
+            self.rows = [(x[1],) for x in info]
+            return
+        cursor = self.db.execute(sql.replace("%s", "?"), parameters)
+        self.description = cursor.description
+        self.rows = cursor.fetchall()
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+def read(out_dir):
+    import pyarrow.dataset as ds
+    table = ds.dataset(str(out_dir / "oClientValidation"),
+                       partitioning="hive").to_table()
+    return sorted(zip(table.column("trial_id").to_pylist(),
+                      table.column("current_round").to_pylist()))
+
+
+def export(connection, tmp_path):
+    exporter = Exporter(connection, tmp_path / "out",
+                        ExportState(tmp_path / "state.json"))
+    return exporter.export("oClientValidation", "oClientValidation", COLUMNS)
+
+
+def test_export_incremental_pass(tmp_path):
+    connection = FakeConnection()
+    for i in range(3):
+        connection.insert("a", i)
+    connection.insert("b", 0)
+    assert export(connection, tmp_path) == 4
+    assert export(connection, tmp_path) == 0
+    connection.insert("a", 3)
+    connection.insert("a", 4)
+    assert export(connection, tmp_path) == 2
+    files = os.listdir(str(tmp_path / "out" / "oClientValidation" /
+                           "trial_id=a"))
+    assert len(files) == 2
+    assert read(tmp_path / "out") == \
+        [("a", i) for i in range(5)] + [("b", 0)]
+
+
+def test_export_late_rows_pass(tmp_path):
+    connection = FakeConnection()
+    connection.insert("a", 0, row_id=1)
+    connection.insert("a", 2, row_id=3)
+    assert export(connection, tmp_path) == 2
+    # a row committed after the export, with an id below the mark
+    connection.insert("a", 1, row_id=2)
+    connection.insert("a", 3, row_id=4)
+    assert export(connection, tmp_path) == 4
+    assert read(tmp_path / "out") == [("a", i) for i in range(4)]
+    assert export(connection, tmp_path) == 0
+
+
+def test_export_without_id_pass(tmp_path):
+    connection = FakeConnection(with_id=False)
+    # task ids repeat and are not ordered, they are never used as a mark
+    connection.insert("a", 0, task_id=5)
+    connection.insert("a", 1, task_id=5)
+    assert export(connection, tmp_path) == 2
+    connection.insert("a", 2, task_id=1)
+    assert export(connection, tmp_path) == 3
+    assert read(tmp_path / "out") == [("a", i) for i in range(3)]
+    assert export(connection, tmp_path) == 0
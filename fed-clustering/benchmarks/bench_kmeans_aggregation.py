@@ -0,0 +1,97 @@
+"""Compare the per-center loop of the KMeansAssembler update with the
+batched aggregate_centers across k x clients x features.
+
+Both run on the same random centers and counts, and the results are
+checked to be bitwise identical before timing.
+
+Usage (from fed-clustering/, with dfa-lib-python and nvflare installed):
+  python benchmarks/bench_kmeans_aggregation.py [--clusters 10 100 500]
+      [--clients 10 100 500] [--features 9 64] [--dtypes float64 float32]
+      [--repeat 5]
+"""
+import argparse
+import importlib.util
+import itertools
+import os
+from time import perf_counter
+
+import numpy as np
+
+ASSEMBLER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..",
+                         "jobs", "sklearn_kmeans_base", "app", "custom",
+                         "kmeans_assembler.py")
+
+
+def load_aggregate_centers():
+    spec = importlib.util.spec_from_file_location("kmeans_assembler",
+                                                  ASSEMBLER)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.aggregate_centers
+
+
+def loop_aggregate(center, count, centers, counts):
+    """The per-center loop that aggregate_centers replaces."""
+    center = center.copy()
+    count = count.copy()
+    for center_idx in range(center.shape[0]):
+        centers_global_rescale = center[center_idx] * count[center_idx]
+        for client_center, client_count in zip(centers, counts):
+            centers_global_rescale += (
+                client_center[center_idx] * client_count[center_idx]
+            )
+            count[center_idx] += client_count[center_idx]
+        centers_global_rescale *= 1 / count[center_idx]
+        center[center_idx] = centers_global_rescale
+    return center, count
+
+
+def best(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        function()
+        times.append(perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clusters", type=int, nargs="+",
+                        default=[10, 100, 500])
+    parser.add_argument("--clients", type=int, nargs="+",
+                        default=[10, 100, 500])
+    parser.add_argument("--features", type=int, nargs="+", default=[9, 64])
+    parser.add_argument("--dtypes", nargs="+", default=["float64", "float32"])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    aggregate_centers = load_aggregate_centers()
+    rng = np.random.default_rng(0)
+    print("{0:>5} {1:>7} {2:>8} {3:<8} {4:>10} {5:>10} {6:>8}".format(
+        "k", "clients", "features", "dtype", "loop ms", "batch ms",
+        "speedup"))
+    for k, m, f, dtype in itertools.product(args.clusters, args.clients,
+                                            args.features, args.dtypes):
+        center = rng.normal(size=(k, f)).astype(dtype)
+        count = rng.integers(1, 1000, k).astype(np.float64)
+        centers = [rng.normal(size=(k, f)).astype(dtype) for _ in range(m)]
+        counts = [rng.integers(0, 1000, k).astype(np.float64)
+                  for _ in range(m)]
+
+        expected = loop_aggregate(center, count, centers, counts)
+        result = aggregate_centers(center, count, centers, counts)
+        assert result[0].dtype == center.dtype
+        assert np.array_equal(expected[0], result[0]) and \
+            np.array_equal(expected[1], result[1]), "results differ"
+
+        loop = best(lambda: loop_aggregate(center, count, centers, counts),
+                    args.repeat)
+        batch = best(lambda: aggregate_centers(center, count, centers,
+                                               counts), args.repeat)
+        print("{0:>5} {1:>7} {2:>8} {3:<8} {4:>10.2f} {5:>10.2f} {6:>7.1f}x"
+              .format(k, m, f, dtype, loop * 1e3, batch * 1e3, loop / batch))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""Measure the provenance instrumentation overhead of the k-means and DBSCAN
+learners against a local stand-in DfAnalyzer server.
+
+Each algorithm runs its train -> assemble -> validate loop for a number of
+rounds on synthetic data. Every task scope is timed, and the time spent in
+dfa_lib_python (entering and leaving the scope: building datasets,
+encoding elements, posting to the server) is reported against the time
+spent in the task body, per task type, with the bytes sent. The same loop
+is then run with provenance disabled as a baseline.
+
+Usage (from fed-clustering/, with dfa-lib-python and nvflare installed):
+  python benchmarks/bench_provenance_overhead.py [--rounds 20] [--samples 20000]
+      [--latency 0.002] [--algorithms kmeans dbscan]
+      [--output benchmarks/results/provenance_overhead.json]
+"""
+import argparse
+import datetime
+import importlib.util
+import json
+import os
+import platform
+import sys
+import tempfile
+from collections import defaultdict
+from time import perf_counter
+
+import numpy as np
+from sklearn.datasets import make_blobs
+
+from nvflare.apis.dxo import DXO, DataKind
+from nvflare.apis.fl_context import FLContext
+from nvflare.app_common.app_constant import AppConstants
+
+from dfa_lib_python import scope as scope_module
+from dfa_lib_python.artifact import ArtifactStore, set_artifact_store
+from dfa_lib_python.backend import HttpBackend, set_backend
+from dfa_lib_python.mock_server import MockDfAnalyzer
+
+JOBS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "jobs")
+# modules shared by the jobs, packaged into them by prepare_job_config.py
+UTILS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils")
+
+
+def load_class(job, module, name):
+    custom = os.path.join(JOBS, job, "app", "custom")
+    # the modules of a job import their neighbours, as under NVFlare
+    for path in (UTILS, custom):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    path = os.path.join(custom, module + ".py")
+    spec = importlib.util.spec_from_file_location(module, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return getattr(module, name)
+
+
+class ScopeTimer(object):
+    """Times the enter and exit of every TaskScope, per transformation."""
+
+    def __init__(self):
+        self.stats = defaultdict(lambda: {"tasks": 0, "total": 0.0,
+                                          "instrumentation": 0.0})
+        self._enter = scope_module.TaskScope.__enter__
+        self._exit = scope_module.TaskScope.__exit__
+
+    def install(self):
+        timer = self
+
+        def enter(scope):
+            start = perf_counter()
+            result = timer._enter(scope)
+            scope.bench_start = start
+            scope.bench_enter = perf_counter() - start
+            return result
+
+        def exit(scope, exc_type, exc, tb):
+            start = perf_counter()
+            result = timer._exit(scope, exc_type, exc, tb)
+            end = perf_counter()
+            stats = timer.stats[scope.task._transformation]
+            stats["tasks"] += 1
+            stats["total"] += end - scope.bench_start
+            stats["instrumentation"] += scope.bench_enter + end - start
+            return result
+
+        scope_module.TaskScope.__enter__ = enter
+        scope_module.TaskScope.__exit__ = exit
+
+    def uninstall(self):
+        scope_module.TaskScope.__enter__ = self._enter
+        scope_module.TaskScope.__exit__ = self._exit
+
+
+def make_data(path, n_samples, n_features, n_clusters, seed):
+    x, _ = make_blobs(n_samples=n_samples, n_features=n_features,
+                      centers=n_clusters, cluster_std=0.5, random_state=seed)
+    ids = np.arange(n_samples).reshape(-1, 1)
+    np.savetxt(path, np.hstack([ids, x]), delimiter=",", fmt="%.8g")
+
+
+def fl_context(curr_round, num_rounds):
+    fl_ctx = FLContext()
+    fl_ctx.set_prop(AppConstants.CURRENT_ROUND, curr_round, private=True,
+                    sticky=False)
+    fl_ctx.set_prop(AppConstants.NUM_ROUNDS, num_rounds, private=True,
+                    sticky=False)
+    return fl_ctx
+
+
+def run_kmeans(data_path, args):
+    learner = load_class("sklearn_kmeans_base", "kmeans_learner",
+                         "KMeansLearner")(
+        data_path=data_path, valid_frac=0.2, client_id=1,
+        hash_trial="benchmark", random_state=0)
+    assembler = load_class("sklearn_kmeans_base", "kmeans_assembler",
+                           "KMeansAssembler")(hash_trial="benchmark")
+    learner.initialize({}, fl_context(0, args.rounds))
+    global_param = {"n_clusters": args.clusters}
+    for curr_round in range(args.rounds):
+        fl_ctx = fl_context(curr_round, args.rounds)
+        params, _ = learner.train(curr_round, global_param, fl_ctx)
+        dxo = DXO(data_kind=DataKind.WEIGHTS, data=params)
+        assembler.collection = {"site-1": assembler.get_model_params(dxo)}
+        global_param = assembler.assemble({}, fl_ctx).data
+        learner.validate(curr_round + 1, global_param, fl_ctx)
+    learner.finalize(fl_context(args.rounds - 1, args.rounds))
+
+
+def run_dbscan(data_path, args):
+    learner = load_class("sklearn_dbscan_base", "dbscan_learner",
+                         "DBSCANLearner")(
+        data_path=data_path, client_id=1, hash_trial="benchmark",
+        valid_frac=0.2, eps=0.5, min_samples=5,
+        max_core_points=args.max_core_points)
+    assembler = load_class("sklearn_dbscan_base", "dbscan_assembler",
+                           "DBSCANAssembler")(hash_trial="benchmark", eps=0.5)
+    learner.initialize({}, fl_context(0, args.rounds))
+    global_param = None
+    for curr_round in range(args.rounds):
+        fl_ctx = fl_context(curr_round, args.rounds)
+        params, _ = learner.train(curr_round, global_param, fl_ctx)
+        dxo = DXO(data_kind=DataKind.WEIGHTS, data=params)
+        payload = assembler.get_model_params(dxo)
+        global_param = assembler.assemble({"site-1": payload}, fl_ctx).data
+        learner.validate(curr_round + 1, global_param, fl_ctx)
+    learner.finalize(fl_context(args.rounds - 1, args.rounds))
+
+
+ALGORITHMS = {"kmeans": run_kmeans, "dbscan": run_dbscan}
+
+
+def measure(algorithm, data_path, args):
+    run = ALGORITHMS[algorithm]
+
+    scope_module.dfa_enabled = False
+    # warm-up run, so that import and first-call costs do not land in the
+    # baseline
+    run(data_path, args)
+    start = perf_counter()
+    run(data_path, args)
+    baseline = perf_counter() - start
+
+    scope_module.dfa_enabled = True
+    timer = ScopeTimer()
+    with MockDfAnalyzer(latency=args.latency) as server:
+        set_backend(HttpBackend(server.url))
+        timer.install()
+        try:
+            start = perf_counter()
+            run(data_path, args)
+            instrumented = perf_counter() - start
+        finally:
+            timer.uninstall()
+            set_backend(None)
+        messages = list(server.messages)
+        requests, bytes_received = server.requests, server.bytes_received
+
+    sizes = defaultdict(lambda: [0, 0])
+    for _, message in messages:
+        size = sizes[message.get("transformation", "")]
+        size[0] += 1
+        size[1] += len(json.dumps(message).encode("utf-8"))
+
+    tasks = {}
+    for name, stats in sorted(timer.stats.items()):
+        compute = stats["total"] - stats["instrumentation"]
+        tasks[name] = {
+            "tasks": stats["tasks"],
+            "records": sizes[name][0],
+            "bytes": sizes[name][1],
+            "total_s": stats["total"],
+            "instrumentation_s": stats["instrumentation"],
+            "compute_s": compute,
+            "instrumentation_fraction":
+                stats["instrumentation"] / stats["total"]
+                if stats["total"] else 0.0,
+        }
+    return {
+        "baseline_s": baseline,
+        "instrumented_s": instrumented,
+        "overhead_s": instrumented - baseline,
+        "requests": requests,
+        "bytes": bytes_received,
+        "tasks": tasks,
+    }
+
+
+def report(results):
+    header = "{0:<8} {1:<18} {2:>6} {3:>10} {4:>10} {5:>8} {6:>10}".format(
+        "algo", "task", "tasks", "instr s", "compute s", "instr %", "bytes")
+    print(header)
+    print("-" * len(header))
+    for algorithm, result in results.items():
+        for name, task in result["tasks"].items():
+            print("{0:<8} {1:<18} {2:>6} {3:>10.4f} {4:>10.4f} {5:>7.1f}% "
+                  "{6:>10}".format(algorithm, name, task["tasks"],
+                                   task["instrumentation_s"],
+                                   task["compute_s"],
+                                   100 * task["instrumentation_fraction"],
+                                   task["bytes"]))
+        print("{0:<8} {1:<18} baseline {2:.3f}s, instrumented {3:.3f}s, "
+              "{4} requests, {5} bytes".format(
+                  algorithm, "(run)", result["baseline_s"],
+                  result["instrumented_s"], result["requests"],
+                  result["bytes"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--algorithms", nargs="+", choices=sorted(ALGORITHMS),
+                        default=sorted(ALGORITHMS))
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--samples", type=int, default=20000)
+    parser.add_argument("--features", type=int, default=9)
+    parser.add_argument("--clusters", type=int, default=3)
+    parser.add_argument("--max-core-points", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.002,
+                        help="Server latency per request, in seconds.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=str,
+                        default=os.path.join("benchmarks", "results",
+                                             "provenance_overhead.json"),
+                        help="JSON file receiving the results.")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output)
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        # learners and assemblers write their artifacts in the working
+        # directory
+        os.chdir(workdir)
+        try:
+            set_artifact_store(ArtifactStore(os.path.join(workdir,
+                                                          "artifacts")))
+            data_path = os.path.join(workdir, "data.csv")
+            make_data(data_path, args.samples, args.features, args.clusters,
+                      args.seed)
+            results = {algorithm: measure(algorithm, data_path, args)
+                       for algorithm in args.algorithms}
+        finally:
+            set_artifact_store(None)
+            os.chdir(cwd)
+
+    report(results)
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "benchmark": "provenance_overhead",
+            "timestamp": datetime.datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "config": vars(args),
+            "results": results,
+        }, f, indent=2)
+    print("Results written to {0}".format(output))
+
+
+if __name__ == "__main__":
+    main()
@@ -15,14 +15,16 @@
 from typing import Optional, Tuple
 import numpy as np
 from sklearn.cluster import DBSCAN
-from sklearn.metrics import silhouette_score, calinski_harabasz_score
+from sklearn.metrics import calinski_harabasz_score
 from sklearn.neighbors import NearestNeighbors
 
 from nvflare.apis.fl_context import FLContext
 from nvflare.app_common.abstract.learner_spec import Learner
-from nvflare.app_opt.sklearn.data_loader import load_data_for_range, load_data
 from nvflare.app_common.app_constant import AppConstants
 
+from data_cache import load_csv
+from validation_metrics import METRIC_NAMES, validation_score
+
 from dfa_lib_python.dataflow import Dataflow
 from dfa_lib_python.transformation import Transformation
 from dfa_lib_python.attribute import Attribute
@@ -30,12 +32,11 @@ from dfa_lib_python.attribute_type import AttributeType
 from dfa_lib_python.set import Set
 from dfa_lib_python.set_type import SetType
 from dfa_lib_python.task import Task
-from dfa_lib_python.dataset import DataSet
-from dfa_lib_python.element import Element
 from dfa_lib_python.task_status import TaskStatus
 from dfa_lib_python.dependency import Dependency
+from dfa_lib_python.scope import task_scope
+from dfa_lib_python.sampling import Verbosity, get_sampler
 
-from time import perf_counter
 import datetime
 
 dataflow_tag = "nvidiaflare-df"
@@ -68,6 +69,9 @@ class DBSCANLearner(Learner):
         min_samples: int = 5,  # Minimum samples in neighborhood for core point
         random_state: int = None,
         max_core_points: int = 0,
+        data_cache: bool = False,
+        validation_metric: str = "silhouette",
+        validation_sample_size: int = 10000,
     ):
         super().__init__()
         self.data_path = data_path
@@ -82,6 +86,12 @@ class DBSCANLearner(Learner):
         self.n_samples = None
         self.hash_trial = hash_trial
         self.max_core_points = int(max_core_points) if max_core_points else 0
+        # keep a memory-mapped .npy copy of the CSV next to it
+        self.data_cache = bool(data_cache)
+        if validation_metric not in METRIC_NAMES:
+            raise ValueError(f"validation_metric must be one of {list(METRIC_NAMES)}")
+        self.validation_metric = validation_metric
+        self.validation_sample_size = int(validation_sample_size)
 
     def _sanitize_features(self, x: np.ndarray, fl_ctx: FLContext, stage: str) -> np.ndarray:
         x_array = np.asarray(x, dtype=np.float32)
@@ -212,33 +222,18 @@ class DBSCANLearner(Learner):
         return core_points[selected_indices], core_labels[selected_indices]
 
     def load_data(self) -> dict:
-        t3 = Task(3, dataflow_tag, "LoadData")
-        t3.begin()
-        start = perf_counter()
+        with task_scope(3, dataflow_tag, "LoadData",
+                        level=Verbosity.SETUP) as scope:
+            x, y = load_csv(self.data_path, cache=self.data_cache)
+            data_size = x.shape[0]
+            valid_size = int(round(data_size * self.valid_frac))
 
-        train_data = load_data(self.data_path, require_header=True)
-        data_size = train_data[-1]
-        valid_size = int(round(data_size * self.valid_frac))
+            # the validation rows are the first ones, as views of the data
+            train_data = (x, y, data_size)
+            valid_data = (x[:valid_size], y[:valid_size], valid_size)
 
-        indices = {
-            "valid": {"start": 0, "end": valid_size},
-        }
-        
-        train_data = load_data(self.data_path)
-        valid_data = load_data_for_range(
-            self.data_path,  
-            indices["valid"]["start"],
-            indices["valid"]["end"],
-        )   
-
-        duration = perf_counter() - start
-        timestamp = datetime.datetime.now()
-        to_dfanalyzer = [self.hash_trial, self.client_id, duration, timestamp]
-        t3_input = DataSet("iLoadData", [Element(to_dfanalyzer)])
-        t3.add_dataset(t3_input)
-        t3_output = DataSet("oLoadData", [Element([])])
-        t3.add_dataset(t3_output)
-        t3.end()
+            scope.input("iLoadData", lambda: [self.hash_trial, self.client_id, scope.elapsed(), datetime.datetime.now()])
+            scope.output("oLoadData", [])
 
         return {"train": train_data, "valid": valid_data}
 
@@ -247,19 +242,11 @@ class DBSCANLearner(Learner):
         self.train_data = data["train"]
         self.valid_data = data["valid"]
 
-        t4 = Task(4, dataflow_tag, "InitializeClient",
-                  dependency=Task(3, dataflow_tag, "LoadData"))
-        t4.begin()
-        start = perf_counter()
-        duration = perf_counter() - start
-
-        timestamp = datetime.datetime.now()
-        to_dfanalyzer = [self.hash_trial, self.client_id, duration, timestamp]
-        t4_input = DataSet("iInitializeClient", [Element(to_dfanalyzer)])
-        t4.add_dataset(t4_input)
-        t4_output = DataSet("oInitializeClient", [Element([])])
-        t4.add_dataset(t4_output)
-        t4.end()
+        with task_scope(4, dataflow_tag, "InitializeClient",
+                        dependency=Task(3, dataflow_tag, "LoadData"),
+                        level=Verbosity.SETUP, coalesce=True) as scope:
+            scope.input("iInitializeClient", lambda: [self.hash_trial, self.client_id, scope.elapsed(), datetime.datetime.now()])
+            scope.output("oInitializeClient", [])
 
         # set number of samples for compatibility with SKLearnExecutor
         # load_data returns a tuple like (x, y, n_samples)
@@ -276,107 +263,98 @@ class DBSCANLearner(Learner):
     def train(
         self, curr_round: int, global_param: Optional[dict], fl_ctx: FLContext
     ) -> Tuple[dict, dict]:
-        t5 = Task(5 + 4 * (curr_round), dataflow_tag, "ClientTraining")
         if curr_round == 0:
-            t5.add_dependency(
-                Dependency(
-                    ["InitializeClient", "ClientValidation"],
-                    ["4", "0"],
-                )
+            dependency = Dependency(
+                ["InitializeClient", "ClientValidation"],
+                ["4", "0"],
             )
         else:
-            t5.add_dependency(
-                Dependency(
-                    ["InitializeClient", "ClientValidation"],
-                    ["4", str(8 + 4 * (curr_round - 2))],
-                )
+            dependency = Dependency(
+                ["InitializeClient", "ClientValidation"],
+                ["4", str(8 + 4 * (curr_round - 2))],
             )
 
-        t5.begin()
-        start = perf_counter()
-        timestamp = datetime.datetime.now()
-        
-        # Update hyperparameters from global if provided
-        if global_param:
-            self.eps = global_param.get("eps", self.eps)
-            self.min_samples = global_param.get("min_samples", self.min_samples)
-
-        to_dfanalyzer = [
-            self.hash_trial,
-            self.client_id,
-            curr_round,
-            self.eps,
-            self.min_samples,
-            timestamp
-        ]
-
-        t5_input = DataSet("iClientTraining", [Element(to_dfanalyzer)])
-        t5.add_dataset(t5_input)
-
-        # Get training data and perform local DBSCAN
-        (x_train, y_train, train_size) = self.train_data
-        x_train = self._sanitize_features(x_train, fl_ctx, "train")
-        dbscan = DBSCAN(
-            eps=self.eps,
-            min_samples=self.min_samples,
-        )
-        dbscan.fit(x_train)
-
-        # Extract core points and their labels
-        core_mask = np.zeros_like(dbscan.labels_, dtype=bool)
-        core_mask[dbscan.core_sample_indices_] = True
-        
-        core_points = np.asarray(x_train[core_mask], dtype=np.float32)
-        core_labels = np.asarray(dbscan.labels_[core_mask], dtype=np.int32)
-        original_core_point_count = len(core_points)
-        core_points, core_labels = self._limit_core_points(core_points, core_labels)
-        if len(core_points) != original_core_point_count:
-            self.log_info(
-                fl_ctx,
-                f"Limited core points from {original_core_point_count} to {len(core_points)}",
+        get_sampler().set_num_rounds(fl_ctx.get_prop(AppConstants.NUM_ROUNDS))
+        with task_scope(5 + 4 * (curr_round), dataflow_tag, "ClientTraining",
+                        dependency=dependency, eager=True,
+                        level=Verbosity.DETAIL, round=curr_round) as scope:
+            timestamp = datetime.datetime.now()
+
+            # Update hyperparameters from global if provided
+            if global_param:
+                self.eps = global_param.get("eps", self.eps)
+                self.min_samples = global_param.get("min_samples", self.min_samples)
+
+            eps, min_samples = self.eps, self.min_samples
+            scope.input("iClientTraining", lambda: [
+                self.hash_trial,
+                self.client_id,
+                curr_round,
+                eps,
+                min_samples,
+                timestamp
+            ])
+
+            # Get training data and perform local DBSCAN
+            (x_train, y_train, train_size) = self.train_data
+            x_train = self._sanitize_features(x_train, fl_ctx, "train")
+            dbscan = DBSCAN(
+                eps=self.eps,
+                min_samples=self.min_samples,
             )
+            dbscan.fit(x_train)
+
+            # Extract core points and their labels
+            core_mask = np.zeros_like(dbscan.labels_, dtype=bool)
+            core_mask[dbscan.core_sample_indices_] = True
+
+            core_points = np.asarray(x_train[core_mask], dtype=np.float32)
+            core_labels = np.asarray(dbscan.labels_[core_mask], dtype=np.int32)
+            original_core_point_count = len(core_points)
+            core_points, core_labels = self._limit_core_points(core_points, core_labels)
+            if len(core_points) != original_core_point_count:
+                self.log_info(
+                    fl_ctx,
+                    f"Limited core points from {original_core_point_count} to {len(core_points)}",
+                )
 
-        saved_path = None
-        try:
-            filename = f"dbscan_client_{self.client_id}_r{curr_round}.npz"
-
-            # Ensure numpy arrays for saving
-            cp_arr = np.array(core_points)
-            cl_arr = np.array(core_labels)
-            np.savez_compressed(filename, core_points=cp_arr, core_labels=cl_arr)
-            saved_path = filename
-        except Exception as e:
-            try:
-                self.log_error(fl_ctx, f"dbscan learner: failed to save artifact: {e}")
-            except Exception:
-                pass
-        # Prepare return parameters - only core points and their labels
-        # Ensure all numpy types are converted to Python native types for serialization
-        params = {
-            "core_points": core_points.tolist() if isinstance(core_points, np.ndarray) else list(core_points),
-            "core_labels": [int(x) for x in core_labels.tolist()] if isinstance(core_labels, np.ndarray) else [int(x) for x in core_labels],
-            "eps": float(self.eps),
-            "min_samples": int(self.min_samples),
-            "n_clusters": int(len(set(core_labels)) - (1 if -1 in core_labels else 0))
-        }
-
-        duration = perf_counter() - start
-        timestamp = datetime.datetime.now()
+            saved_path = None
+            # the artifact is only referenced by the provenance record
+            if scope.enabled:
+                try:
+                    filename = f"dbscan_client_{self.client_id}_r{curr_round}.npz"
+
+                    # Ensure numpy arrays for saving
+                    cp_arr = np.array(core_points)
+                    cl_arr = np.array(core_labels)
+                    np.savez_compressed(filename, core_points=cp_arr, core_labels=cl_arr)
+                    saved_path = filename
+                except Exception as e:
+                    try:
+                        self.log_error(fl_ctx, f"dbscan learner: failed to save artifact: {e}")
+                    except Exception:
+                        pass
+            # Prepare return parameters - only core points and their labels
+            # Ensure all numpy types are converted to Python native types for serialization
+            params = {
+                "core_points": core_points.tolist() if isinstance(core_points, np.ndarray) else list(core_points),
+                "core_labels": [int(x) for x in core_labels.tolist()] if isinstance(core_labels, np.ndarray) else [int(x) for x in core_labels],
+                "eps": float(self.eps),
+                "min_samples": int(self.min_samples),
+                "n_clusters": int(len(set(core_labels)) - (1 if -1 in core_labels else 0))
+            }
 
-        to_dfanalyzer = [
-            self.hash_trial,
-            self.client_id,
-            curr_round,
-            saved_path,
-            params["n_clusters"],
-            len(core_points),
-            duration,
-            timestamp
-        ]
-
-        t5_output = DataSet("oClientTraining", [Element(to_dfanalyzer)])
-        t5.add_dataset(t5_output)
-        t5.end()
+            scope.metric([params["n_clusters"], len(core_points)])
+            scope.output("oClientTraining", lambda: [
+                self.hash_trial,
+                self.client_id,
+                curr_round,
+                saved_path,
+                params["n_clusters"],
+                len(core_points),
+                scope.elapsed(),
+                datetime.datetime.now()
+            ])
 
         # Explicitly clean up the DBSCAN model object to prevent serialization issues
         del dbscan
@@ -390,102 +368,97 @@ class DBSCANLearner(Learner):
     def validate(
         self, curr_round: int, global_param: Optional[dict], fl_ctx: FLContext
     ) -> Tuple[dict, dict]:
-        t7 = Task(
+        with task_scope(
             8 + 4 * (curr_round-1),
             dataflow_tag,
             "ClientValidation",
             dependency=Task(7 + 4 * (curr_round-1), dataflow_tag, "Assemble"),
-        )
-        t7.begin()
-        start = perf_counter()
-        timestamp = datetime.datetime.now()
-        to_dfanalyzer = [self.hash_trial, self.client_id, curr_round, timestamp]
-        t7_input = DataSet("iClientValidation", [Element(to_dfanalyzer)])
-        t7.add_dataset(t7_input)
-
-        # Get validation data
-        (x_valid, y_valid, valid_size) = self.valid_data
-        x_valid = self._sanitize_features(x_valid, fl_ctx, "valid")
-
-        # Use global parameters for validation
-        if global_param and "core_points" in global_param and len(global_param["core_points"]) > 0:
-            core_points = global_param["core_points"]
-            core_labels = global_param["core_labels"]
-            
-            # Convert lists back to numpy arrays if needed
-            if isinstance(core_points, list):
-                core_points = np.asarray(core_points, dtype=np.float32)
-            else:
-                core_points = np.asarray(core_points, dtype=np.float32)
-            core_points = self._sanitize_features(core_points, fl_ctx, "global_core")
-            
-            # Assign points to nearest core points within eps
-            nn = NearestNeighbors(radius=self.eps)
-            nn.fit(core_points)
-            
-            # Find neighbors within eps
-            distances, indices = nn.radius_neighbors(x_valid)
-            
-            # Assign labels based on nearest core points
-            y_pred = np.full(len(x_valid), -1)  # Initialize all as noise
-            for i, neighbor_idx in enumerate(indices):
-                if len(neighbor_idx) > 0:
-                    # Assign the label of the nearest core point
-                    nearest_idx = neighbor_idx[np.argmin(distances[i])]
-                    y_pred[i] = core_labels[nearest_idx]
-            
-            # Calculate validation metrics
-            if len(set(y_pred)) > 1:  # More than one cluster
-                silhouette = silhouette_score(x_valid, y_pred)
-                calinski = calinski_harabasz_score(x_valid, y_pred)
-                self.log_info(fl_ctx, f"Silhouette Score {silhouette:.4f}")
-                self.log_info(fl_ctx, f"Calinski-Harabasz Score {calinski:.4f}")
-                metrics = {
-                    "Silhouette Score": silhouette,
-                    "Calinski-Harabasz Score": calinski
-                }
+            level=Verbosity.ROUND,
+            round=curr_round - 1,
+        ) as scope:
+            timestamp = datetime.datetime.now()
+            scope.input("iClientValidation", lambda: [self.hash_trial, self.client_id, curr_round, timestamp])
+
+            name = METRIC_NAMES[self.validation_metric]
+            # Get validation data
+            (x_valid, y_valid, valid_size) = self.valid_data
+            x_valid = self._sanitize_features(x_valid, fl_ctx, "valid")
+
+            # Use global parameters for validation
+            if global_param and "core_points" in global_param and len(global_param["core_points"]) > 0:
+                core_points = global_param["core_points"]
+                core_labels = global_param["core_labels"]
+
+                # Convert lists back to numpy arrays if needed
+                if isinstance(core_points, list):
+                    core_points = np.asarray(core_points, dtype=np.float32)
+                else:
+                    core_points = np.asarray(core_points, dtype=np.float32)
+                core_points = self._sanitize_features(core_points, fl_ctx, "global_core")
+
+                # Assign points to nearest core points within eps
+                nn = NearestNeighbors(radius=self.eps)
+                nn.fit(core_points)
+
+                # Find neighbors within eps
+                distances, indices = nn.radius_neighbors(x_valid)
+
+                # Assign labels based on nearest core points
+                y_pred = np.full(len(x_valid), -1)  # Initialize all as noise
+                for i, neighbor_idx in enumerate(indices):
+                    if len(neighbor_idx) > 0:
+                        # Assign the label of the nearest core point
+                        nearest_idx = neighbor_idx[np.argmin(distances[i])]
+                        y_pred[i] = core_labels[nearest_idx]
+
+                # Calculate validation metrics
+                if len(set(y_pred)) > 1:  # More than one cluster
+                    score, score_low, score_high = validation_score(
+                        x_valid,
+                        y_pred,
+                        self.validation_metric,
+                        sample_size=self.validation_sample_size,
+                        random_state=self.random_state,
+                    )
+                    calinski = calinski_harabasz_score(x_valid, y_pred)
+                    self.log_info(fl_ctx, f"{name} {score:.4f} [{score_low:.4f}, {score_high:.4f}]")
+                    self.log_info(fl_ctx, f"Calinski-Harabasz Score {calinski:.4f}")
+                    metrics = {
+                        name: score,
+                        "Calinski-Harabasz Score": calinski
+                    }
+                else:
+                    metrics = {
+                        name: 0.0,
+                        "Calinski-Harabasz Score": 0.0
+                    }
+                    score = score_low = score_high = 0.0
             else:
                 metrics = {
-                    "Silhouette Score": 0.0,
+                    name: 0.0,
                     "Calinski-Harabasz Score": 0.0
                 }
-                silhouette = 0.0
-        else:
-            metrics = {
-                "Silhouette Score": 0.0,
-                "Calinski-Harabasz Score": 0.0
-            }
-            silhouette = 0.0
+                score = score_low = score_high = 0.0
 
-        duration = perf_counter() - start
-        timestamp = datetime.datetime.now()
+            scope.metric(score)
+            scope.output("oClientValidation", lambda: [self.hash_trial, self.client_id, curr_round, score, self.validation_metric, score_low, score_high, scope.elapsed(), datetime.datetime.now()])
 
-        to_dfanalyzer = [self.hash_trial, self.client_id, curr_round, silhouette, duration, timestamp]
-        
-        t7_output = DataSet("oClientValidation", [Element(to_dfanalyzer)])
-        t7.add_dataset(t7_output)
-        t7.end()
-        
         return metrics, None
 
     def finalize(self, fl_ctx: FLContext) -> None:
         curr_round = fl_ctx.get_prop(AppConstants.CURRENT_ROUND)
         timestamp = datetime.datetime.now()
 
-        t9 = Task(
+        with task_scope(
             9 + 4 * (curr_round),
             dataflow_tag,
             "FinalizeClient",
             dependency=Task(8 + 4 * (curr_round-1), dataflow_tag, "ClientValidation"),
-        )
-        t9.begin()
-        start = perf_counter()
-        del self.train_data
-        del self.valid_data
-        self.log_info(fl_ctx, "Freed training resources")
-
-        duration = perf_counter() - start
-        to_dfanalyzer = [self.hash_trial, self.client_id, duration, timestamp]
-        t9_output = DataSet("oFinalizeClient", [Element(to_dfanalyzer)])
-        t9.add_dataset(t9_output)
-        t9.end()
\ No newline at end of file
+            level=Verbosity.SETUP,
+            coalesce=True,
+        ) as scope:
+            del self.train_data
+            del self.valid_data
+            self.log_info(fl_ctx, "Freed training resources")
+
+            scope.output("oFinalizeClient", lambda: [self.hash_trial, self.client_id, scope.elapsed(), timestamp])
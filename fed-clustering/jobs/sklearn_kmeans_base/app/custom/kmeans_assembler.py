@@ -29,16 +29,37 @@ from dfa_lib_python.set import Set
 from dfa_lib_python.set_type import SetType
 from dfa_lib_python.task import Task
 from dfa_lib_python.dependency import Dependency
-from dfa_lib_python.dataset import DataSet
-from dfa_lib_python.element import Element
 from dfa_lib_python.task_status import TaskStatus
 from dfa_lib_python.extractor_extension import ExtractorExtension
-from time import perf_counter
+from dfa_lib_python.scope import task_scope
+from dfa_lib_python.sampling import Verbosity, get_sampler
 import pickle
 import datetime
 dataflow_tag = "nvidiaflare-df"
 
 
+def aggregate_centers(center, count, centers, counts):
+    """Mini-batch k-Means update of the global centers.
+
+    Adds the client centers to the previous estimate, weighted by counts,
+    and rescales to the mean of all points (old and new combined). The
+    clients are stacked along a leading axis and accumulated over it in
+    client order (unlike a sum, which may add pairwise), the summation
+    order of a per-center loop, so the result is identical to it. The
+    centers keep their dtype.
+
+    Returns:
+        The updated (center, count) arrays.
+    """
+    terms = np.concatenate(
+        [(center * count[:, None])[None], np.stack(centers) * np.stack(counts)[..., None]]
+    )
+    count = np.add.accumulate(np.concatenate([count[None], np.stack(counts)]), axis=0)[-1].copy()
+    center_global = np.add.accumulate(terms, axis=0, out=terms)[-1]
+    center_global *= (1 / count)[:, None]
+    return center_global.astype(center.dtype), count
+
+
 class KMeansAssembler(Assembler):
     def __init__(self, hash_trial: str):
         super().__init__(data_kind=DataKind.WEIGHTS)
@@ -52,104 +73,93 @@ class KMeansAssembler(Assembler):
 
     def get_model_params(self, dxo: DXO):
 
-        t6 = Task(
+        with task_scope(
             6 + 4 * (self.current_round),
             dataflow_tag,
             "GetModelParams",
             dependency=Task(
                 5 + 4 * (self.current_round), dataflow_tag, "ClientTraining"
             ),
-        )
-        t6.begin()
-        data = dxo.data
+            level=Verbosity.DETAIL,
+            round=self.current_round,
+            coalesce=True,
+        ) as scope:
+            data = dxo.data
 
-        to_dfanalyzer = [self.hash_trial, data["center"], data["count"]]
-        t6_input = DataSet("iGetModelParams", [Element(to_dfanalyzer)])
-        t6.add_dataset(t6_input)
-        t6_output = DataSet("oGetModelParams", [Element([])])
-        t6.add_dataset(t6_output)
-        t6.end()
+            scope.input("iGetModelParams", lambda: [self.hash_trial, data["center"], data["count"]])
+            scope.output("oGetModelParams", [])
 
-        return {"center": data["center"], "count": data["count"]}
+        return {"center": data["center"], "count": data["count"], "n_clusters": data.get("n_clusters")}
 
     def assemble(self, data: Dict[str, dict], fl_ctx: FLContext) -> DXO:
         current_round = fl_ctx.get_prop(AppConstants.CURRENT_ROUND)
         n_feature = 0
-        t8 = Task(
+        get_sampler().set_num_rounds(fl_ctx.get_prop(AppConstants.NUM_ROUNDS))
+        with task_scope(
             7 + 4 * (current_round),
             dataflow_tag,
             "Assemble",
             dependency=Task(6 + 4 * (current_round), dataflow_tag, "GetModelParams"),
-        )
-        t8.begin()
-        start = perf_counter()
-        kmeans_time = 0
-        timestamp_beginning = datetime.datetime.now()
-
-        if current_round == 0:
-            # First round, collect the information regarding n_feature and n_cluster
-            # Initialize the aggregated center and count to all zero
-            client_0 = list(self.collection.keys())[0]
-            self.n_cluster = self.collection[client_0]["center"].shape[0]
-            n_feature = self.collection[client_0]["center"].shape[1]
-            self.center = np.zeros([self.n_cluster, n_feature])
-            self.count = np.zeros([self.n_cluster])
-            # perform one round of KMeans over the submitted centers
-            # to be used as the original center points
-            # no count for this round
-            center_collect = []
-            for _, record in self.collection.items():
-                center_collect.append(record["center"])
-            centers = np.concatenate(center_collect)
-            kmeans_center_initial = KMeans(n_clusters=self.n_cluster)
-            kmeans_center_initial.fit(centers)
-            self.center = kmeans_center_initial.cluster_centers_
-        else:
-            # Mini-batch k-Means step to assemble the received centers
-            start_kmeans = perf_counter()
-            for center_idx in range(self.n_cluster):
-                centers_global_rescale = (
-                    self.center[center_idx] * self.count[center_idx]
-                )
-                # Aggregate center, add new center to previous estimate, weighted by counts
+            level=Verbosity.ROUND,
+            round=current_round,
+        ) as scope:
+            kmeans_time = 0
+            timestamp_beginning = datetime.datetime.now()
+
+            if current_round == 0:
+                # First round, collect the information regarding n_feature and n_cluster
+                # Initialize the aggregated center and count to all zero
+                client_0 = list(self.collection.keys())[0]
+                # k-means|| clients send more candidates than clusters
+                self.n_cluster = self.collection[client_0].get("n_clusters") or self.collection[client_0]["center"].shape[0]
+                n_feature = self.collection[client_0]["center"].shape[1]
+                self.center = np.zeros([self.n_cluster, n_feature])
+                self.count = np.zeros([self.n_cluster])
+                # perform one round of KMeans over the submitted centers
+                # to be used as the original center points
+                # no count for this round, only the k-means|| weights
+                center_collect = []
+                weight_collect = []
                 for _, record in self.collection.items():
-                    centers_global_rescale += (
-                        record["center"][center_idx] * record["count"][center_idx]
-                    )
-                    self.count[center_idx] += record["count"][center_idx]
-                # Rescale to compute mean of all points (old and new combined)
-                alpha = 1 / self.count[center_idx]
-                centers_global_rescale *= alpha
-                # Update the global center
-                self.center[center_idx] = centers_global_rescale
-            kmeans_time = perf_counter() - start_kmeans
-
-
-
-        # Define what you want to save
-        model_state = {
-            'center': self.center,
-            'count': self.count,
-            'collection': self.collection,
-            'hash_trial': self.hash_trial,
-            'n_cluster': self.n_cluster,
-        }
-
-        # Save the model to disk
-        with open('kmeans_model.pkl', 'wb') as f:
-            pickle.dump(model_state, f)
-
-        assembling_time = perf_counter() - start
-        timestamp = datetime.datetime.now()
-        to_dfanalyzer = [self.hash_trial, current_round, n_feature, self.n_cluster, timestamp_beginning]
-        t8_input = DataSet("iAssemble", [Element(to_dfanalyzer)])
-        t8.add_dataset(t8_input)
-        t8_output = DataSet(
-            "oAssemble",
-            [Element([self.hash_trial, self.current_round, self.center, self.count, assembling_time, kmeans_time, timestamp])],
-        )
-        t8.add_dataset(t8_output)
-        t8.end()
+                    center_collect.append(record["center"])
+                    weight_collect.append(record["count"])
+                centers = np.concatenate(center_collect)
+                # weighted k-means++ seeding and Lloyd steps
+                weights = None if any(w is None for w in weight_collect) else np.concatenate(weight_collect)
+                kmeans_center_initial = KMeans(n_clusters=self.n_cluster)
+                kmeans_center_initial.fit(centers, sample_weight=weights)
+                self.center = kmeans_center_initial.cluster_centers_
+            else:
+                # Mini-batch k-Means step to assemble the received centers
+                start_kmeans = scope.elapsed()
+                self.center, self.count = aggregate_centers(
+                    self.center,
+                    self.count,
+                    [record["center"] for record in self.collection.values()],
+                    [record["count"] for record in self.collection.values()],
+                )
+                kmeans_time = scope.elapsed() - start_kmeans
+
+            # Define what you want to save
+            model_state = {
+                'center': self.center,
+                'count': self.count,
+                'collection': self.collection,
+                'hash_trial': self.hash_trial,
+                'n_cluster': self.n_cluster,
+            }
+
+            # Save the model to disk
+            with open('kmeans_model.pkl', 'wb') as f:
+                pickle.dump(model_state, f)
+
+            scope.metric(self.center)
+            scope.input("iAssemble", lambda: [self.hash_trial, current_round, n_feature, self.n_cluster, timestamp_beginning])
+            scope.output(
+                "oAssemble",
+                lambda: [self.hash_trial, self.current_round, self.center, self.count, scope.elapsed(), kmeans_time, datetime.datetime.now()],
+            )
+
         params = {"center": self.center}
         dxo = DXO(data_kind=self.expected_data_kind, data=params)
 
@@ -14,14 +14,17 @@
 
 from typing import Optional, Tuple
 
-from sklearn.cluster import KMeans, MiniBatchKMeans, kmeans_plusplus
-from sklearn.metrics import homogeneity_score, silhouette_score
+from sklearn.metrics import homogeneity_score
 
 from nvflare.apis.fl_context import FLContext
 from nvflare.app_common.abstract.learner_spec import Learner
-from nvflare.app_opt.sklearn.data_loader import load_data_for_range, load_data
 from nvflare.app_common.app_constant import AppConstants
 
+from center_model import CenterModel
+from data_cache import load_csv
+from local_kmeans import INIT_METHODS, LOCAL_ALGORITHMS
+from validation_metrics import METRIC_NAMES, validation_score
+
 from dfa_lib_python.dataflow import Dataflow
 from dfa_lib_python.transformation import Transformation
 from dfa_lib_python.attribute import Attribute
@@ -29,13 +32,12 @@ from dfa_lib_python.attribute_type import AttributeType
 from dfa_lib_python.set import Set
 from dfa_lib_python.set_type import SetType
 from dfa_lib_python.task import Task
-from dfa_lib_python.dataset import DataSet
-from dfa_lib_python.element import Element
 from dfa_lib_python.task_status import TaskStatus
 from dfa_lib_python.extractor_extension import ExtractorExtension
 from dfa_lib_python.dependency import Dependency
+from dfa_lib_python.scope import task_scope
+from dfa_lib_python.sampling import Verbosity, get_sampler
 
-from time import perf_counter
 import datetime
 
 from pathlib import Path
@@ -55,6 +57,11 @@ class KMeansLearner(Learner):
         max_iter: int = 1,
         n_init: int = 1,
         reassignment_ratio: int = 0,
+        data_cache: bool = False,
+        validation_metric: str = "silhouette",
+        validation_sample_size: int = 10000,
+        local_algorithm: str = "minibatch",
+        init_method: str = "k-means++",
     ):
         super().__init__()
         self.data_path = data_path
@@ -63,45 +70,44 @@ class KMeansLearner(Learner):
         self.max_iter = max_iter
         self.n_init = n_init
         self.reassignment_ratio = reassignment_ratio
+        # keep a memory-mapped .npy copy of the CSV next to it
+        self.data_cache = bool(data_cache)
+        if validation_metric not in METRIC_NAMES:
+            raise ValueError(f"validation_metric must be one of {list(METRIC_NAMES)}")
+        self.validation_metric = validation_metric
+        self.validation_sample_size = int(validation_sample_size)
+        # local steps: sklearn mini-batch steps, or Lloyd steps that keep
+        # Hamerly's distance bounds across rounds
+        if local_algorithm not in LOCAL_ALGORITHMS:
+            raise ValueError(f"local_algorithm must be one of {list(LOCAL_ALGORITHMS)}")
+        self.local_algorithm = local_algorithm
+        # round 0: k-means++ centers, or k-means|| weighted candidates
+        # reduced to the initial centers by the server
+        if init_method not in INIT_METHODS:
+            raise ValueError(f"init_method must be one of {list(INIT_METHODS)}")
+        self.init_method = init_method
         self.client_id = client_id  # Will be set from FL context if None
         self.train_data = None
         self.valid_data = None
         self.n_samples = None
         self.n_clusters = None
+        # local k-means engine, kept from the first round to the last
+        self.engine = None
         self.hash_trial = hash_trial  # Will be set from FL context if None
 
     def load_data(self) -> dict:
-        t3 = Task(3, dataflow_tag, "LoadData")
-        t3.begin()
-        start = perf_counter()
-
-        train_data = load_data(self.data_path, require_header=True)
-        data_size = train_data[-1]
+        with task_scope(3, dataflow_tag, "LoadData",
+                        level=Verbosity.SETUP) as scope:
+            x, y = load_csv(self.data_path, cache=self.data_cache)
+            data_size = x.shape[0]
+            valid_size = int(round(data_size * self.valid_frac))
 
-        valid_size = int(round(data_size * self.valid_frac))
+            # the validation rows are the first ones, as views of the data
+            train_data = (x, y, data_size)
+            valid_data = (x[:valid_size], y[:valid_size], valid_size)
 
-        indices = {
-            "valid": {"start": 0, "end": valid_size},
-        }
-        
-        train_data = load_data(
-            self.data_path,
-        )
-
-        valid_data = load_data_for_range(
-            self.data_path,  
-            indices["valid"]["start"],
-            indices["valid"]["end"],
-        )   
-
-        duration = perf_counter() - start
-        timestamp = datetime.datetime.now()
-        to_dfanalyzer = [self.hash_trial, self.client_id, duration, timestamp]
-        t3_input = DataSet("iLoadData", [Element(to_dfanalyzer)])
-        t3.add_dataset(t3_input)
-        t3_output = DataSet("oLoadData", [Element([])])
-        t3.add_dataset(t3_output)
-        t3.end()
+            scope.input("iLoadData", lambda: [self.hash_trial, self.client_id, scope.elapsed(), datetime.datetime.now()])
+            scope.output("oLoadData", [])
 
         return {"train": train_data, "valid": valid_data}
 
@@ -122,109 +128,100 @@ class KMeansLearner(Learner):
         # train data size, to be used for setting
         # NUM_STEPS_CURRENT_ROUND for potential use in aggregation
         self.n_samples = data["train"][-1]
-        t4 = Task(4, dataflow_tag, "InitializeClient",
-                  dependency=Task(3, dataflow_tag, "LoadData"))
-        t4.begin()
-        start = perf_counter()
-        duration = perf_counter() - start
-
-        timestamp = datetime.datetime.now()
-        to_dfanalyzer = [self.hash_trial, self.client_id, self.n_samples, duration, timestamp]
-        t4_input = DataSet("iInitializeClient", [Element(to_dfanalyzer)])
-        t4.add_dataset(t4_input)
-        t4_output = DataSet("oInitializeClient", [Element([])])
-        t4.add_dataset(t4_output)
-        t4.end()
-        # note that the model needs to be created every round
-        # due to the available API for center initialization
+        with task_scope(4, dataflow_tag, "InitializeClient",
+                        dependency=Task(3, dataflow_tag, "LoadData"),
+                        level=Verbosity.SETUP, coalesce=True) as scope:
+            scope.input("iInitializeClient", lambda: [self.hash_trial, self.client_id, self.n_samples, scope.elapsed(), datetime.datetime.now()])
+            scope.output("oInitializeClient", [])
 
     def train(
         self, curr_round: int, global_param: Optional[dict], fl_ctx: FLContext
     ) -> Tuple[dict, dict]:
-        t5 = Task(5 + 4 * (curr_round), dataflow_tag, "ClientTraining")
         if curr_round == 0:
-            t5.add_dependency(
-                Dependency(
-                    ["InitializeClient", "ClientValidation"],
-                    ["4", "0"],
-                )
+            dependency = Dependency(
+                ["InitializeClient", "ClientValidation"],
+                ["4", "0"],
             )
         else:
-            t5.add_dependency(
-                Dependency(
-                    ["InitializeClient", "ClientValidation"],
-                    ["4", str(8 + 4 * (curr_round - 2))],
-                )
+            dependency = Dependency(
+                ["InitializeClient", "ClientValidation"],
+                ["4", str(8 + 4 * (curr_round - 2))],
             )
 
-        t5.begin()
-        start = perf_counter()
-        timestamp = datetime.datetime.now()
-        to_dfanalyzer = [
-            self.hash_trial,
-            self.client_id,
-            curr_round,
-            self.n_clusters,
-            self.n_samples,
-            self.max_iter,
-            self.n_init,
-            self.reassignment_ratio,
-            self.random_state,
-            timestamp
-        ]
-
-        t5_input = DataSet("iClientTraining", [Element(to_dfanalyzer)])
-        t5.add_dataset(t5_input)
-
-        # get training data, note that clustering is unsupervised
-        # so only x_train will be used
-        count_local = None
-        (x_train, y_train, train_size) = self.train_data
-
-        center_global = None
-        if curr_round == 0:
-            # first round, compute initial center with kmeans++ method
-            # model will be None for this round
-            self.n_clusters = global_param["n_clusters"]
-            center_local, _ = kmeans_plusplus(
-                x_train, n_clusters=self.n_clusters, random_state=self.random_state
-            )
-            kmeans = None
-            params = {"center": center_local, "count": None}
-        else:
-            center_global = global_param["center"]
-            # following rounds, local training starting from global center
-            kmeans = MiniBatchKMeans(
-                n_clusters=self.n_clusters,
-                batch_size=self.n_samples,
-                max_iter=self.max_iter,
-                init=center_global,
-                n_init=self.n_init,
-                reassignment_ratio=self.reassignment_ratio,
-                random_state=self.random_state,
-            )
-            kmeans.fit(x_train)
-            center_local = kmeans.cluster_centers_
-            count_local = kmeans._counts
-            params = {"center": center_local, "count": count_local}
-
-        duration = perf_counter() - start
-        timestamp = datetime.datetime.now()
-
-        to_dfanalyzer = [
-            self.hash_trial,
-            self.client_id,
-            curr_round,
-            center_local,
-            count_local,
-            center_global,
-            duration,
-            timestamp
-        ]
-
-        t5_output = DataSet("oClientTraining", [Element(to_dfanalyzer)])
-        t5.add_dataset(t5_output)
-        t5.end()
+        get_sampler().set_num_rounds(fl_ctx.get_prop(AppConstants.NUM_ROUNDS))
+        with task_scope(5 + 4 * (curr_round), dataflow_tag, "ClientTraining",
+                        dependency=dependency, eager=True,
+                        level=Verbosity.DETAIL, round=curr_round) as scope:
+            timestamp = datetime.datetime.now()
+            n_clusters = self.n_clusters
+            scope.input("iClientTraining", lambda: [
+                self.hash_trial,
+                self.client_id,
+                curr_round,
+                n_clusters,
+                self.n_samples,
+                self.max_iter,
+                self.n_init,
+                self.reassignment_ratio,
+                self.random_state,
+                self.local_algorithm,
+                self.init_method,
+                timestamp
+            ])
+
+            # get training data, note that clustering is unsupervised
+            # so only x_train will be used
+            count_local = None
+            skipped = None
+            (x_train, y_train, train_size) = self.train_data
+
+            center_global = None
+            if curr_round == 0:
+                # first round, compute initial center with kmeans++ method
+                # model will be None for this round
+                self.n_clusters = global_param["n_clusters"]
+                # the engine validates x_train and computes its squared
+                # norms once; later rounds only swap in the global center
+                self.engine = LOCAL_ALGORITHMS[self.local_algorithm](
+                    x_train,
+                    self.n_clusters,
+                    batch_size=self.n_samples,
+                    max_iter=self.max_iter,
+                    reassignment_ratio=self.reassignment_ratio,
+                    random_state=self.random_state,
+                )
+                if self.init_method == "k-means||":
+                    # oversampled candidates, weighted by the points they
+                    # represent, for the server's weighted k-means++
+                    center_local, count_local = self.engine.init_candidates(self.random_state)
+                    params = {"center": center_local, "count": count_local, "n_clusters": self.n_clusters}
+                else:
+                    center_local = self.engine.init_centers(self.random_state)
+                    params = {"center": center_local, "count": None}
+                kmeans = None
+            else:
+                center_global = global_param["center"]
+                # following rounds, local training starting from global center
+                # (a single init, as MiniBatchKMeans does for an array init)
+                center_local, count_local = self.engine.fit(center_global)
+                # fraction of the distance computations skipped by the bounds
+                skipped = self.engine.skipped_fraction
+                self.log_info(fl_ctx, f"Skipped {skipped:.1%} of the distance computations")
+                kmeans = CenterModel(center_local)
+                params = {"center": center_local, "count": count_local}
+
+            scope.metric(center_local)
+            scope.output("oClientTraining", lambda: [
+                self.hash_trial,
+                self.client_id,
+                curr_round,
+                center_local,
+                count_local,
+                center_global,
+                skipped,
+                scope.elapsed(),
+                datetime.datetime.now()
+            ])
 
         return params, kmeans
 
@@ -232,39 +229,38 @@ class KMeansLearner(Learner):
         self, curr_round: int, global_param: Optional[dict], fl_ctx: FLContext
     ) -> Tuple[dict, dict]:
         # local validation with global center
-        # fit a standalone KMeans with just the given center
+        # assign the validation points to the nearest global center
 
-        t7 = Task(
+        with task_scope(
             8 + 4 * (curr_round-1),
             dataflow_tag,
             "ClientValidation",
             dependency=Task(7 + 4 * (curr_round-1), dataflow_tag, "Assemble"),
-        )
-        t7.begin()
-        start = perf_counter()
-        timestamp = datetime.datetime.now()
-        to_dfanalyzer = [self.hash_trial, self.client_id, curr_round, timestamp]
-        t7_input = DataSet("iClientValidation", [Element(to_dfanalyzer)])
-        t7.add_dataset(t7_input)
-
-        center_global = global_param["center"]
-        kmeans_global = KMeans(n_clusters=self.n_clusters, init=center_global, n_init=1)
-        kmeans_global.fit(center_global)
-        # get validation data, both x and y will be used
-        (x_valid, y_valid, valid_size) = self.valid_data
-        y_pred = kmeans_global.predict(x_valid)
-        silhouette = silhouette_score(x_valid, y_pred)
-        self.log_info(fl_ctx, f"Silhouette Score {silhouette:.4f}")
-        metrics = {"Silhouette Score": silhouette}
+            level=Verbosity.ROUND,
+            round=curr_round - 1,
+        ) as scope:
+            timestamp = datetime.datetime.now()
+            scope.input("iClientValidation", lambda: [self.hash_trial, self.client_id, curr_round, timestamp])
 
-        duration = perf_counter() - start
-        timestamp = datetime.datetime.now()
+            center_global = global_param["center"]
+            kmeans_global = CenterModel(center_global)
+            # get validation data, both x and y will be used
+            (x_valid, y_valid, valid_size) = self.valid_data
+            y_pred = kmeans_global.predict(x_valid)
+            score, score_low, score_high = validation_score(
+                x_valid,
+                y_pred,
+                self.validation_metric,
+                centers=center_global,
+                sample_size=self.validation_sample_size,
+                random_state=self.random_state,
+            )
+            name = METRIC_NAMES[self.validation_metric]
+            self.log_info(fl_ctx, f"{name} {score:.4f} [{score_low:.4f}, {score_high:.4f}]")
+            metrics = {name: score}
 
-        to_dfanalyzer = [self.hash_trial, self.client_id, curr_round, silhouette, duration, timestamp]
-        
-        t7_output = DataSet("oClientValidation", [Element(to_dfanalyzer)])
-        t7.add_dataset(t7_output)
-        t7.end()
+            scope.metric(score)
+            scope.output("oClientValidation", lambda: [self.hash_trial, self.client_id, curr_round, score, self.validation_metric, score_low, score_high, scope.elapsed(), datetime.datetime.now()])
         return metrics, kmeans_global
 
     def finalize(self, fl_ctx: FLContext) -> None:
@@ -273,20 +269,17 @@ class KMeansLearner(Learner):
         curr_round = fl_ctx.get_prop(AppConstants.CURRENT_ROUND)
         timestamp = datetime.datetime.now()
 
-        t9 = Task(
+        with task_scope(
             9 + 4 * (curr_round),
             dataflow_tag,
             "FinalizeClient",
             dependency=Task(8 + 4 * (curr_round-1), dataflow_tag, "ClientValidation"),
-        )
-        t9.begin()
-        start = perf_counter()
-        del self.train_data
-        del self.valid_data
-        self.log_info(fl_ctx, "Freed training resources")
-
-        duration = perf_counter() - start
-        to_dfanalyzer = [self.hash_trial, self.client_id, duration, timestamp]
-        t9_output = DataSet("oFinalizeClient", [Element(to_dfanalyzer)])
-        t9.add_dataset(t9_output)
-        t9.end()
+            level=Verbosity.SETUP,
+            coalesce=True,
+        ) as scope:
+            del self.train_data
+            del self.valid_data
+            self.engine = None
+            self.log_info(fl_ctx, "Freed training resources")
+
+            scope.output("oFinalizeClient", lambda: [self.hash_trial, self.client_id, scope.elapsed(), timestamp])
@@ -0,0 +1,314 @@
+from typing import Optional, Tuple
+
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans, kmeans_plusplus
+from sklearn.utils import check_array, check_random_state
+from sklearn.utils.extmath import row_norms
+
+
+class LocalKMeans:
+    """Mini-batch k-means engine kept by the learner for all rounds.
+
+    ``MiniBatchKMeans(init=center_global).fit(x)`` validates and converts
+    the training data, computes its squared norms and scores the initial
+    centers on a validation subset every round. This engine validates the
+    data and computes its norms once. Each round it draws mini-batches with
+    replacement from the data, into a buffer kept across rounds, and feeds
+    them to ``partial_fit`` of a ``MiniBatchKMeans`` started from the given
+    centers, so the counts start from zero as with a new estimator. The
+    steps are those of ``MiniBatchKMeans``, but the random draws are the
+    engine's own, and every round runs all its
+    ``max_iter * n_samples // batch_size`` steps (``partial_fit`` has no
+    early stopping).
+
+    Args:
+        x: Training data.
+        n_clusters: Number of clusters.
+        batch_size: Mini-batch size, the whole data by default.
+        max_iter: Passes over the data per round.
+        reassignment_ratio: Low count center reassignment, as in MiniBatchKMeans.
+        random_state: Seed of each round, as in MiniBatchKMeans.
+    """
+
+    def __init__(
+        self,
+        x: np.ndarray,
+        n_clusters: int,
+        batch_size: Optional[int] = None,
+        max_iter: int = 1,
+        reassignment_ratio: float = 0.0,
+        random_state: Optional[int] = None,
+    ):
+        self.x = check_array(x, dtype=[np.float64, np.float32], order="C")
+        self.x_squared_norms = row_norms(self.x, squared=True)
+        n_samples = self.x.shape[0]
+        self.n_clusters = n_clusters
+        self.batch_size = min(batch_size or n_samples, n_samples)
+        self.max_iter = max_iter
+        self.reassignment_ratio = reassignment_ratio
+        self.random_state = random_state
+        self._init_buffers()
+
+    def _init_buffers(self):
+        self._batch = np.empty((self.batch_size, self.x.shape[1]), dtype=self.x.dtype)
+        self.counts = np.zeros(self.n_clusters, dtype=self.x.dtype)
+
+    # fraction of the distances of the last round skipped by bounds; the
+    # mini-batch steps compute all of them
+    skipped_fraction = 0.0
+
+    def init_centers(self, random_state: Optional[int] = None) -> np.ndarray:
+        """k-means++ centers of the training data, reusing its squared norms."""
+        centers, _ = kmeans_plusplus(
+            self.x, n_clusters=self.n_clusters, x_squared_norms=self.x_squared_norms, random_state=random_state
+        )
+        return centers
+
+    def init_candidates(
+        self, random_state: Optional[int] = None, oversampling_factor: float = 2.0, n_rounds: int = 5
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """k-means|| candidate centers of the training data, with their weights.
+
+        Starting from a random point, each of the ``n_rounds`` passes draws
+        every point independently with probability
+        ``oversampling_factor * k * d^2 / cost``, where ``d`` is the
+        distance to its nearest candidate and ``cost`` their sum. A pass
+        only computes the distances to the points it drew, and keeps the
+        nearest candidate of every point, so the weights (the number of
+        points nearest to each candidate) come without another pass. More
+        passes are made while there are fewer than k candidates. Data with
+        fewer than k distinct points ends the passes early, and the
+        candidates are then padded to k with copies of weight 0.
+
+        Returns:
+            The (candidates, weights) arrays, about
+            ``oversampling_factor * k * n_rounds`` of them and at least k,
+            to be reduced to k centers with weighted k-means++.
+        """
+        random_state = check_random_state(random_state)
+        n_samples = self.x.shape[0]
+        oversampling = oversampling_factor * self.n_clusters
+        chosen = [random_state.randint(n_samples)]
+        d2 = np.full(n_samples, np.inf)
+        nearest = np.zeros(n_samples, dtype=np.intp)
+        self._update_nearest(np.array(chosen), 0, d2, nearest)
+        d2[chosen] = 0
+        n_round = 0
+        while n_round < n_rounds or len(chosen) < self.n_clusters:
+            cost = d2.sum()
+            if cost == 0:
+                break
+            drawn = np.flatnonzero(random_state.random_sample(n_samples) < oversampling * d2 / cost)
+            self._update_nearest(drawn, len(chosen), d2, nearest)
+            # rounding leaves the drawn points a tiny distance to themselves
+            d2[drawn] = 0
+            nearest[drawn] = np.arange(len(chosen), len(chosen) + len(drawn))
+            chosen.extend(drawn)
+            n_round += 1
+        weights = np.bincount(nearest, minlength=len(chosen)).astype(self.x.dtype)
+        missing = self.n_clusters - len(chosen)
+        if missing > 0:
+            chosen.extend(np.resize(chosen, missing))
+            weights = np.concatenate([weights, np.zeros(missing, dtype=weights.dtype)])
+        return self.x[chosen], weights
+
+    def _update_nearest(self, rows: np.ndarray, offset: int, d2: np.ndarray, nearest: np.ndarray):
+        # lower d2 and nearest with the candidates at the given rows, in
+        # blocks of points whose distances (512 KiB) stay in cache; the
+        # (candidate, point) layout makes the min a contiguous reduction
+        # and argmin is only needed for the points that got closer
+        if len(rows) == 0:
+            return
+        scaled = -2 * self.x[rows]
+        squared_norms = self.x_squared_norms[rows, None]
+        block = max(1, (512 << 10) // (8 * len(rows)))
+        for start in range(0, self.x.shape[0], block):
+            end = start + block
+            # |c|^2 - 2 c.x, the squared distance without the point norm
+            d = scaled @ self.x[start:end].T
+            d += squared_norms
+            closest = d.min(axis=0)
+            closest += self.x_squared_norms[start:end]
+            np.maximum(closest, 0, out=closest)
+            closer = np.flatnonzero(closest < d2[start:end])
+            d2[start + closer] = closest[closer]
+            nearest[start + closer] = d[:, closer].argmin(axis=0) + offset
+
+    def fit(self, init: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Run one round of mini-batch steps from the given centers.
+
+        Returns:
+            Copies of the local (centers, counts).
+        """
+        n_samples = self.x.shape[0]
+        random_state = check_random_state(self.random_state)
+        kmeans = MiniBatchKMeans(
+            n_clusters=self.n_clusters,
+            init=init,
+            n_init=1,
+            batch_size=self.batch_size,
+            reassignment_ratio=self.reassignment_ratio,
+            random_state=random_state,
+            compute_labels=False,
+        )
+        for _ in range((self.max_iter * n_samples) // self.batch_size):
+            indices = random_state.randint(0, n_samples, self.batch_size)
+            np.take(self.x, indices, axis=0, out=self._batch)
+            kmeans.partial_fit(self._batch)
+        # the weight of the points assigned to each center, as the learner
+        # has always read it from MiniBatchKMeans
+        self.counts = kmeans._counts
+        return kmeans.cluster_centers_.copy(), self.counts.copy()
+
+
+class HamerlyKMeans(LocalKMeans):
+    """Lloyd k-means engine keeping Hamerly's distance bounds across rounds.
+
+    Each point keeps an upper bound on the distance to its assigned center
+    and a lower bound on the distance to every other center. When the
+    centers move, by a local step or by the global center swapped in at
+    the next round, the bounds are loosened by the center drift instead
+    of being recomputed. The distances of a point are only computed when
+    its upper bound exceeds both its lower bound and half the distance
+    from its center to the nearest other one. Since the global centers
+    move little between rounds, most points keep their cluster without
+    any distance computed.
+
+    The ``max_iter`` steps of a round are full-batch Lloyd steps
+    (``batch_size`` and ``reassignment_ratio`` are not used): each center
+    becomes the mean of its points, kept up to date from the points that
+    change cluster, and an empty cluster keeps its center. The counts are
+    the cluster sizes. ``skipped_fraction`` is the fraction of the n x k
+    distances of the last round's steps that were skipped.
+    """
+
+    def _init_buffers(self):
+        n_samples, n_features = self.x.shape
+        # no bounds until the first full assignment
+        self.labels = None
+        self.upper = np.empty(n_samples)
+        self.lower = np.empty(n_samples)
+        self._sums = np.zeros((self.n_clusters, n_features))
+        self.counts = np.zeros(self.n_clusters)
+        # centers the bounds refer to
+        self._centers = None
+        # rows assigned at a time, for a 16 MiB distance block
+        self._block = max(1, (16 << 20) // (8 * self.n_clusters))
+
+    def fit(self, init: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Run one round of Lloyd steps from the given centers.
+
+        Returns:
+            Copies of the local (centers, counts).
+        """
+        n_samples = self.x.shape[0]
+        centers = np.array(init, dtype=np.float64)
+        if self.labels is not None:
+            self._loosen(centers)
+        computed = 0
+        n_steps = 0
+        for _ in range(self.max_iter):
+            n_steps += 1
+            if self.labels is None:
+                computed += self._assign_all(centers)
+                moved = n_samples
+            else:
+                n, moved = self._assign_bounded(centers)
+                computed += n
+            self._centers = centers
+            centers = np.divide(
+                self._sums, self.counts[:, None], out=centers.copy(), where=self.counts[:, None] > 0
+            )
+            drifted = self._loosen(centers)
+            if not (moved or drifted):
+                break
+        self._centers = centers
+        self.skipped_fraction = 1.0 - computed / (n_samples * self.n_clusters * n_steps)
+        dtype = self.x.dtype
+        return centers.astype(dtype), self.counts.astype(dtype)
+
+    def _distances(self, rows: np.ndarray, centers: np.ndarray) -> np.ndarray:
+        # squared distances |x|^2 - 2 x.c + |c|^2 of the given rows
+        d = self.x[rows] @ centers.T
+        d *= -2
+        d += self.x_squared_norms[rows, None]
+        d += np.einsum("ij,ij->i", centers, centers)
+        return np.maximum(d, 0, out=d)
+
+    def _nearest(self, rows: np.ndarray, centers: np.ndarray):
+        # labels, upper and lower bounds of the rows from all distances
+        for start in range(0, len(rows), self._block):
+            index = rows[start:start + self._block]
+            d = self._distances(index, centers)
+            labels = d.argmin(axis=1)
+            r = np.arange(len(index))
+            self.upper[index] = np.sqrt(d[r, labels])
+            d[r, labels] = np.inf
+            self.lower[index] = np.sqrt(d.min(axis=1))
+            yield index, labels
+
+    def _assign_all(self, centers: np.ndarray) -> int:
+        n_samples, n_features = self.x.shape
+        self.labels = np.empty(n_samples, dtype=np.intp)
+        for index, labels in self._nearest(np.arange(n_samples), centers):
+            self.labels[index] = labels
+        self.counts[:] = np.bincount(self.labels, minlength=self.n_clusters)
+        for j in range(n_features):
+            self._sums[:, j] = np.bincount(self.labels, weights=self.x[:, j], minlength=self.n_clusters)
+        return n_samples * self.n_clusters
+
+    def _assign_bounded(self, centers: np.ndarray) -> Tuple[int, int]:
+        # half the distance from each center to the nearest other one
+        between = np.sqrt(self._distances_between(centers))
+        np.fill_diagonal(between, np.inf)
+        bound = np.maximum(0.5 * between.min(axis=1)[self.labels], self.lower)
+        rows = np.flatnonzero(self.upper > bound)
+        # tighten the upper bound with the distance to the own center
+        own = centers[self.labels[rows]]
+        d = self.x_squared_norms[rows] - 2 * np.einsum("ij,ij->i", self.x[rows], own)
+        d += np.einsum("ij,ij->i", own, own)
+        self.upper[rows] = np.sqrt(np.maximum(d, 0))
+        computed = len(rows)
+        rows = rows[self.upper[rows] > bound[rows]]
+        computed += len(rows) * self.n_clusters
+        moved = 0
+        for index, labels in self._nearest(rows, centers):
+            old = self.labels[index]
+            change = labels != old
+            if change.any():
+                index, old, labels = index[change], old[change], labels[change]
+                points = self.x[index]
+                np.add.at(self._sums, old, -points)
+                np.add.at(self._sums, labels, points)
+                self.counts -= np.bincount(old, minlength=self.n_clusters)
+                self.counts += np.bincount(labels, minlength=self.n_clusters)
+                self.labels[index] = labels
+                moved += len(index)
+        return computed, moved
+
+    @staticmethod
+    def _distances_between(centers: np.ndarray) -> np.ndarray:
+        diff = centers[:, None, :] - centers[None, :, :]
+        return np.einsum("ijk,ijk->ij", diff, diff)
+
+    def _loosen(self, centers: np.ndarray) -> bool:
+        # widen the bounds by the drift of the centers they refer to
+        drift = np.sqrt(np.einsum("ij,ij->i", centers - self._centers, centers - self._centers))
+        if not drift.any():
+            return False
+        self.upper += drift[self.labels]
+        if self.n_clusters > 1:
+            # every other center moved at most the largest drift, or the
+            # second largest for the points of the largest drift center
+            top = drift.argmax()
+            first = drift[top]
+            second = np.partition(drift, -2)[-2]
+            self.lower -= np.where(self.labels == top, second, first)
+        return True
+
+
+# local_algorithm values of KMeansLearner
+LOCAL_ALGORITHMS = {"minibatch": LocalKMeans, "hamerly": HamerlyKMeans}
+
+# init_method values of KMeansLearner
+INIT_METHODS = ("k-means++", "k-means||")
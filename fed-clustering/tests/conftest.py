@@ -0,0 +1,7 @@
+import os
+import sys
+
+# the job modules import each other by name, as NVFlare puts the app's
+# custom directory on sys.path
+JOBS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "jobs")
+sys.path.insert(0, os.path.join(JOBS, "sklearn_kmeans_base", "app", "custom"))
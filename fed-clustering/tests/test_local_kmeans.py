@@ -0,0 +1,104 @@
+import warnings
+
+import numpy as np
+import pytest
+from sklearn.cluster import KMeans, MiniBatchKMeans, kmeans_plusplus
+from sklearn.datasets import make_blobs
+
+from local_kmeans import HamerlyKMeans, LocalKMeans
+
+
+def lloyd(x, centers, steps):
+    centers = centers.astype(np.float64)
+    for _ in range(steps):
+        d = ((x[:, None, :] - centers[None]) ** 2).sum(-1)
+        labels = d.argmin(axis=1)
+        counts = np.bincount(labels, minlength=len(centers)).astype(float)
+        sums = np.stack([np.bincount(labels, weights=x[:, j], minlength=len(centers)) for j in range(x.shape[1])], 1)
+        new = centers.copy()
+        new[counts > 0] = sums[counts > 0] / counts[counts > 0, None]
+        if (new == centers).all():
+            break
+        centers = new
+    return centers, counts
+
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+@pytest.mark.parametrize("batch_size,max_iter", [(None, 1), (None, 3), (100, 5)])
+def test_local_kmeans_partial_fit_pass(dtype, batch_size, max_iter):
+    x = make_blobs(500, 4, centers=5, random_state=1)[0].astype(dtype)
+    centers = kmeans_plusplus(x, 5, random_state=0)[0]
+    engine = LocalKMeans(x, 5, batch_size=batch_size, max_iter=max_iter, random_state=3)
+    size = batch_size or len(x)
+    for _ in range(3):
+        random_state = np.random.RandomState(3)
+        expected = MiniBatchKMeans(5, init=centers, n_init=1, batch_size=size, reassignment_ratio=0.0)
+        for _ in range(max_iter * len(x) // size):
+            expected.partial_fit(x[random_state.randint(0, len(x), size)])
+        local, counts = engine.fit(centers)
+        assert local.dtype == dtype
+        np.testing.assert_allclose(local, expected.cluster_centers_, rtol=1e-6)
+        assert counts.sum() == max_iter * len(x) // size * size
+        centers = local + 0.1
+
+
+def test_local_kmeans_rounds_pass():
+    x = make_blobs(2000, 4, centers=5, cluster_std=0.5, random_state=2)[0]
+    engine = LocalKMeans(x, 5, batch_size=200, max_iter=2, reassignment_ratio=0.3, random_state=0)
+    centers = engine.init_centers(0)
+    first = engine.fit(centers)
+    # each round starts over from the given centers
+    second = engine.fit(centers)
+    assert all(np.array_equal(a, b) for a, b in zip(first, second))
+    for _ in range(5):
+        centers, _ = engine.fit(centers)
+    inertia = ((x[:, None] - centers[None]) ** 2).sum(-1).min(1).sum()
+    best = KMeans(5, n_init=10, random_state=0).fit(x).inertia_
+    assert inertia < 1.05 * best
+
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+@pytest.mark.parametrize("n_clusters", [1, 2, 5])
+@pytest.mark.parametrize("max_iter", [1, 3])
+def test_hamerly_matches_lloyd_pass(dtype, n_clusters, max_iter):
+    x = make_blobs(2000, 4, centers=6, random_state=n_clusters)[0].astype(dtype)
+    engine = HamerlyKMeans(x, n_clusters, max_iter=max_iter)
+    centers = engine.init_centers(0).astype(np.float64)
+    random_state = np.random.RandomState(1)
+    for _ in range(4):
+        local, counts = engine.fit(centers)
+        expected, expected_counts = lloyd(x.astype(np.float64), centers, max_iter)
+        assert np.array_equal(counts, expected_counts)
+        np.testing.assert_allclose(local, expected, rtol=1e-6 if dtype == np.float32 else 1e-10)
+        # the global centers of the next round move a little
+        centers = expected + random_state.normal(scale=0.01, size=expected.shape)
+    assert engine.skipped_fraction > 0
+
+
+def test_init_candidates_pass():
+    x = make_blobs(3000, 4, centers=5, random_state=0)[0]
+    engine = LocalKMeans(x, 5)
+    candidates, weights = engine.init_candidates(random_state=0)
+    assert 5 <= len(candidates) <= 2 * 2 * 5 * 5
+    # candidates are data points, weighted by their nearest points
+    assert all((x == c).all(axis=1).any() for c in candidates)
+    nearest = ((x[:, None] - candidates[None]) ** 2).sum(-1).argmin(axis=1)
+    assert np.array_equal(weights, np.bincount(nearest, minlength=len(candidates)))
+    centers = KMeans(5, n_init=1, random_state=0).fit(candidates, sample_weight=weights).cluster_centers_
+    inertia = ((x[:, None] - centers[None]) ** 2).sum(-1).min(1).sum()
+    assert inertia < 1.1 * KMeans(5, n_init=10, random_state=0).fit(x).inertia_
+
+
+@pytest.mark.parametrize("distinct", [1, 2])
+def test_init_candidates_pads_to_k_pass(distinct):
+    x = np.repeat(np.arange(distinct, dtype=np.float64)[:, None], 50, axis=0)
+    x = np.hstack([x, x])
+    engine = LocalKMeans(x, 5)
+    candidates, weights = engine.init_candidates(random_state=0)
+    assert len(candidates) >= 5
+    assert weights.sum() == len(x)
+    with warnings.catch_warnings():
+        # fewer distinct points than clusters
+        warnings.simplefilter("ignore")
+        centers = KMeans(5, n_init=1, random_state=0).fit(candidates, sample_weight=weights).cluster_centers_
+    assert len(np.unique(centers.round(6), axis=0)) == distinct
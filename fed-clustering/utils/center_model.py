@@ -0,0 +1,80 @@
+import pickle
+
+import numpy as np
+
+
+class CenterModel:
+    """Nearest-center assignment for a fixed set of k-means centers.
+
+    A stand-in for a ``KMeans`` fitted on the global centers, without the
+    fit: ``predict`` computes ``|c|^2 - 2 x.c`` (the row norm does not
+    change the argmin) for blocks of rows with one matrix product each,
+    with the squared center norms computed once. Blocks are sized to keep
+    the distance matrix within ``working_memory`` MiB.
+
+    Rows and centers are shifted by the mean center before the product, so
+    that data far from the origin does not lose the distance differences
+    to cancellation in float32.
+
+    Args:
+        centers: The (k, n_features) cluster centers.
+        dtype: Precision of the distance computation.
+        working_memory: Memory cap of a block, in MiB.
+    """
+
+    def __init__(self, centers: np.ndarray, dtype=np.float32, working_memory: int = 4):
+        self.dtype = np.dtype(dtype)
+        self.cluster_centers_ = np.array(centers, dtype=np.float64)
+        self.n_clusters = self.cluster_centers_.shape[0]
+        self.working_memory = working_memory
+        offset = self.cluster_centers_.mean(axis=0)
+        shifted = (self.cluster_centers_ - offset).astype(self.dtype)
+        self._offset = offset
+        self._centers_t = np.ascontiguousarray(shifted.T)
+        self._squared_norms = np.einsum("ij,ij->i", shifted, shifted)
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> "CenterModel":
+        """Load the global centers saved by KMeansAssembler (kmeans_model.pkl)."""
+        with open(path, "rb") as f:
+            return cls(pickle.load(f)["center"], **kwargs)
+
+    def _blocks(self, n_samples: int, n_features: int):
+        row_bytes = self.dtype.itemsize * (self.n_clusters + n_features)
+        block = max(1, (self.working_memory << 20) // row_bytes)
+        for start in range(0, n_samples, block):
+            yield start, min(start + block, n_samples)
+
+    def _block(self, x: np.ndarray, start: int, end: int) -> np.ndarray:
+        # shift in float64, before the rows are rounded to dtype
+        return (x[start:end] - self._offset).astype(self.dtype, copy=False)
+
+    def predict(self, x: np.ndarray) -> np.ndarray:
+        """Index of the nearest center of each row."""
+        labels = np.empty(len(x), dtype=np.int32)
+        for start, end in self._blocks(len(x), x.shape[1]):
+            block = self._block(x, start, end)
+            distances = block @ self._centers_t
+            distances *= -2
+            distances += self._squared_norms
+            labels[start:end] = distances.argmin(axis=1)
+        return labels
+
+    def transform(self, x: np.ndarray) -> np.ndarray:
+        """Euclidean distances of each row to every center."""
+        distances = np.empty((len(x), self.n_clusters), dtype=self.dtype)
+        for start, end in self._blocks(len(x), x.shape[1]):
+            block = self._block(x, start, end)
+            d = block @ self._centers_t
+            d *= -2
+            d += self._squared_norms
+            d += np.einsum("ij,ij->i", block, block)[:, None]
+            np.maximum(d, 0, out=d)
+            distances[start:end] = np.sqrt(d)
+        return distances
+
+    def __getstate__(self):
+        return {"centers": self.cluster_centers_, "dtype": self.dtype.str, "working_memory": self.working_memory}
+
+    def __setstate__(self, state):
+        self.__init__(state["centers"], state["dtype"], state["working_memory"])
@@ -0,0 +1,62 @@
+import glob
+import os
+from typing import Tuple
+
+import numpy as np
+
+
+def _cache_paths(data_path: str) -> Tuple[str, str]:
+    # keyed by the size and modification time of the CSV, so an edited
+    # or replaced file never reuses a stale cache
+    stat = os.stat(data_path)
+    prefix = f"{data_path}.{stat.st_size}-{stat.st_mtime_ns}"
+    return prefix + ".x.npy", prefix + ".y.npy"
+
+
+def _read_csv(data_path: str) -> Tuple[np.ndarray, np.ndarray]:
+    import pandas as pd
+
+    # same layout as nvflare.app_opt.sklearn.data_loader: no header, the
+    # label in the first column and the features in the others
+    data = pd.read_csv(data_path, header=None).to_numpy(dtype=np.float64)
+    return np.ascontiguousarray(data[:, 1:]), np.ascontiguousarray(data[:, 0])
+
+
+def _write_cache(data_path: str, x: np.ndarray, y: np.ndarray) -> None:
+    x_path, y_path = _cache_paths(data_path)
+    for path in glob.glob(glob.escape(data_path) + ".*.npy"):
+        if path not in (x_path, y_path):
+            os.remove(path)
+    for path, array in ((y_path, y), (x_path, x)):
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            np.save(f, array)
+        os.replace(temporary, path)
+
+
+def load_csv(data_path: str, cache: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """Load the features and labels of a client CSV in a single pass.
+
+    Both arrays are C-contiguous, so row slices of them (e.g. the
+    validation rows) are zero-copy views that scikit-learn uses as is.
+    With ``cache``, they are also written as ``.npy`` files next to the
+    CSV, and later loads of the unchanged file memory-map them instead of
+    parsing the CSV. A read-only data directory just disables the cache.
+
+    Returns:
+        The (x, y) arrays.
+    """
+    if cache:
+        x_path, y_path = _cache_paths(data_path)
+        if os.path.exists(x_path) and os.path.exists(y_path):
+            try:
+                return np.load(x_path, mmap_mode="r"), np.load(y_path, mmap_mode="r")
+            except (OSError, ValueError):
+                pass
+    x, y = _read_csv(data_path)
+    if cache:
+        try:
+            _write_cache(data_path, x, y)
+        except OSError:
+            pass
+    return x, y
@@ -0,0 +1,43 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from center_model import CenterModel
+
+
+def predict_args_parser():
+    parser = argparse.ArgumentParser(
+        description="Assign the rows of a CSV to the nearest center of a trained federated k-means model"
+    )
+    parser.add_argument("--model", type=str, default="kmeans_model.pkl", help="Model saved by KMeansAssembler")
+    parser.add_argument(
+        "--data_path", type=str, required=True, help="CSV without header, id or label first, as the client data"
+    )
+    parser.add_argument("--output", type=str, default="clusters.csv", help="Output CSV with the id and cluster")
+    parser.add_argument("--chunk_size", type=int, default=100000, help="Rows read and assigned at a time")
+    parser.add_argument("--float64", action="store_true", help="Compute the distances in double precision")
+    return parser
+
+
+def main():
+    args = predict_args_parser().parse_args()
+    model = CenterModel.from_file(args.model, dtype=np.float64 if args.float64 else np.float32)
+
+    n_rows = 0
+    counts = np.zeros(model.n_clusters, dtype=np.int64)
+    with open(args.output, "w") as f:
+        f.write("id,cluster\n")
+        for chunk in pd.read_csv(args.data_path, header=None, chunksize=args.chunk_size):
+            data = chunk.to_numpy()
+            labels = model.predict(data[:, 1:])
+            pd.DataFrame({"id": chunk.iloc[:, 0], "cluster": labels}).to_csv(f, header=False, index=False)
+            counts += np.bincount(labels, minlength=model.n_clusters)
+            n_rows += len(labels)
+
+    print(f"Assigned {n_rows} rows to {model.n_clusters} clusters, written to {args.output}")
+    print("Rows per cluster:", counts.tolist())
+
+
+if __name__ == "__main__":
+    main()
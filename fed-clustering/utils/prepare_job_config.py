@@ -25,6 +25,14 @@ from helpers import get_hash_trial
 HASH_trial = get_hash_trial()
 
 JOBS_ROOT = "jobs"
+UTILS_DIR = pathlib.Path(__file__).resolve().parent
+
+# modules of utils/ shared by the apps of a task, copied into each app's
+# custom directory next to the job's own modules
+SHARED_MODULES = {
+    "sklearn_kmeans": ["center_model.py", "data_cache.py", "validation_metrics.py"],
+    "sklearn_dbscan": ["data_cache.py", "validation_metrics.py"],
+}
 
 
 def job_config_args_parser():
@@ -52,6 +60,12 @@ def job_config_args_parser():
         "special case valid_frac = 1, where all data will be used"
         "in validation, e.g. for evaluating unsupervised clustering with known ground truth label.",
     )
+    parser.add_argument(
+        "--data_cache",
+        action="store_true",
+        help="Keep a binary .npy copy of each client CSV next to it, "
+        "memory-mapped by later jobs instead of parsing the CSV again.",
+    )
 
     return parser
 
@@ -90,6 +104,7 @@ def _update_client_config(config: dict, args, site_name: str):
     # data path and training/validation row indices
     config["components"][0]["args"]["data_path"] = args.data_path
     config["components"][0]["args"]["valid_frac"] = args.valid_frac
+    config["components"][0]["args"]["data_cache"] = args.data_cache
     config["components"][0]["args"]["client_id"] = int(site_name.split("-")[-1])
     config["components"][0]["args"]["hash_trial"] = HASH_trial
 
@@ -100,12 +115,14 @@ def _update_server_config(config: dict, args):
     config["components"][3]["args"]["hash_trial"] = HASH_trial
 
 
-def _copy_custom_files(src_job_path, src_app_name, dst_job_path, dst_app_name):
+def _copy_custom_files(src_job_path, src_app_name, dst_job_path, dst_app_name, task_name):
     dst_path = dst_job_path / dst_app_name / "custom"
     os.makedirs(dst_path, exist_ok=True)
     src_path = src_job_path / src_app_name / "custom"
     if os.path.isdir(src_path):
         shutil.copytree(src_path, dst_path, dirs_exist_ok=True)
+    for name in SHARED_MODULES.get(task_name, []):
+        shutil.copyfile(UTILS_DIR / name, dst_path / name)
 
 
 def create_server_app(src_job_path, src_app_name, dst_job_path, site_name, args):
@@ -124,7 +141,7 @@ def create_server_app(src_job_path, src_app_name, dst_job_path, site_name, args)
     _write_json(server_config, server_config_filename)
 
     # copy custom file
-    _copy_custom_files(src_job_path, src_app_name, dst_job_path, dst_app_name)
+    _copy_custom_files(src_job_path, src_app_name, dst_job_path, dst_app_name, args.task_name)
 
 
 def create_client_app(
@@ -146,7 +163,7 @@ def create_client_app(
     _write_json(client_config, client_config_filename)
 
     # copy custom file
-    _copy_custom_files(src_job_path, src_app_name, dst_job_path, dst_app_name)
+    _copy_custom_files(src_job_path, src_app_name, dst_job_path, dst_app_name, args.task_name)
 
 
 def main():
@@ -169,8 +186,11 @@ def main():
     from dfa_lib_python.task_status import TaskStatus
     from dfa_lib_python.extractor_extension import ExtractorExtension
     from time import perf_counter
+    from prospective_provenance import create_dataflow
 
     dataflow_tag = "nvidiaflare-df"
+    # cheap when the dataflow is already registered
+    create_dataflow(dataflow_tag, "dbscan" if "dbscan" in args.task_name else "kmeans")
 
     t2 = Task(2, dataflow_tag, "JobConfig")
     t2.begin()
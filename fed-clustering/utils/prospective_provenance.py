@@ -14,7 +14,7 @@ from dfa_lib_python.dependency import Dependency
 import argparse
 # DfAnalyzer Instrumentation
 
-def create_dataflow(dataflow_tag: str, algorithm: str = "kmeans"):
+def create_dataflow(dataflow_tag: str, algorithm: str = "kmeans", force: bool = False):
     kmeans = False
     dbscan = False
     if "kmeans" in algorithm:
@@ -136,6 +136,8 @@ def create_dataflow(dataflow_tag: str, algorithm: str = "kmeans"):
                 Attribute("n_init", AttributeType.NUMERIC),
                 Attribute("reassignment_ratio", AttributeType.NUMERIC),
                 Attribute("random_state", AttributeType.TEXT),
+                Attribute("local_algorithm", AttributeType.TEXT),
+                Attribute("init_method", AttributeType.TEXT),
                 Attribute("timestamp", AttributeType.TEXT),
             ],
         )
@@ -164,6 +166,7 @@ def create_dataflow(dataflow_tag: str, algorithm: str = "kmeans"):
                 Attribute("center_local", AttributeType.TEXT),
                 Attribute("count_local", AttributeType.TEXT),
                 Attribute("center_global", AttributeType.TEXT),
+                Attribute("skipped_distances", AttributeType.NUMERIC),
                 Attribute("training_time", AttributeType.NUMERIC),
                 Attribute("timestamp", AttributeType.TEXT),
 
@@ -319,6 +322,9 @@ def create_dataflow(dataflow_tag: str, algorithm: str = "kmeans"):
             Attribute("client_id", AttributeType.TEXT),
             Attribute("current_round", AttributeType.NUMERIC),
             Attribute("silhouette_score", AttributeType.NUMERIC),
+            Attribute("validation_metric", AttributeType.TEXT),
+            Attribute("score_ci_low", AttributeType.NUMERIC),
+            Attribute("score_ci_high", AttributeType.NUMERIC),
             Attribute("validation_time", AttributeType.NUMERIC),
             Attribute("timestamp", AttributeType.TEXT),
 
@@ -359,7 +365,11 @@ def create_dataflow(dataflow_tag: str, algorithm: str = "kmeans"):
     tf9.set_sets([tf8_output, tf9_output])
     df.add_transformation(tf9)
 
-    df.save()
+    # skipped when the same specification is already registered
+    registered = df.register(force=force)
+    print(f"Dataflow {dataflow_tag} ({algorithm}): "
+          f"{'registered' if registered else 'unchanged, skipped'}")
+    return registered
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -369,7 +379,12 @@ if __name__ == "__main__":
         default="kmeans",
         help="Clustering algorithm."
     )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Register the dataflow even when it is unchanged."
+    )
     args = parser.parse_args()
 
     dataflow_tag = f"nvidiaflare-df"
-    create_dataflow(dataflow_tag, args.algorithm)
+    create_dataflow(dataflow_tag, args.algorithm, force=args.force)
@@ -0,0 +1,172 @@
+from statistics import NormalDist
+from typing import Optional, Tuple
+
+import numpy as np
+from sklearn.metrics import davies_bouldin_score
+from sklearn.metrics.pairwise import euclidean_distances
+
+# validation_metric values of the learners, see validation_score
+METRIC_NAMES = {
+    "silhouette": "Silhouette Score",
+    "sampled_silhouette": "Sampled Silhouette Score",
+    "stratified_silhouette": "Stratified Silhouette Score",
+    "simplified_silhouette": "Simplified Silhouette Score",
+    "davies_bouldin": "Davies-Bouldin Index",
+}
+
+
+def _encode(labels: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    _, codes, sizes = np.unique(labels, return_inverse=True, return_counts=True)
+    if not 2 <= len(sizes) <= len(labels) - 1:
+        raise ValueError(
+            f"Number of labels is {len(sizes)}. Valid values are 2 to n_samples - 1 (inclusive)"
+        )
+    return codes.ravel(), sizes
+
+
+def silhouette_values(
+    x: np.ndarray, labels: np.ndarray, rows: Optional[np.ndarray] = None, working_memory: int = 256
+) -> np.ndarray:
+    """Exact silhouette of the given rows (all by default) against all samples.
+
+    Distances are computed for blocks of rows at a time and reduced to
+    per-cluster sums right away, so memory stays within about
+    ``working_memory`` MiB instead of the n x n distance matrix.
+    """
+    codes, sizes = _encode(labels)
+    rows = np.arange(len(x)) if rows is None else np.asarray(rows)
+    onehot = np.zeros((len(x), len(sizes)))
+    onehot[np.arange(len(x)), codes] = 1.0
+    block = max(1, (working_memory << 20) // (8 * (len(x) + len(sizes))))
+    values = np.empty(len(rows))
+    for start in range(0, len(rows), block):
+        index = rows[start:start + block]
+        # sums of the distances from each row to each cluster
+        sums = euclidean_distances(x[index], x) @ onehot
+        own = codes[index]
+        a = sums[np.arange(len(index)), own] / np.maximum(sizes[own] - 1, 1)
+        sums /= sizes
+        sums[np.arange(len(index)), own] = np.inf
+        b = sums.min(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            s = (b - a) / np.maximum(a, b)
+        # a sample alone in its cluster scores 0
+        values[start:start + block] = np.where(sizes[own] > 1, np.nan_to_num(s), 0.0)
+    return values
+
+
+def chunked_silhouette(x: np.ndarray, labels: np.ndarray, working_memory: int = 256) -> float:
+    """Mean silhouette of all samples, as sklearn's silhouette_score."""
+    return float(silhouette_values(x, labels, working_memory=working_memory).mean())
+
+
+def sampled_silhouette(
+    x: np.ndarray,
+    labels: np.ndarray,
+    sample_size: int = 10000,
+    random_state: Optional[int] = None,
+    stratified: bool = False,
+    confidence: float = 0.95,
+    working_memory: int = 256,
+) -> Tuple[float, float, float]:
+    """Estimate the mean silhouette from a sample of the samples.
+
+    The silhouette of each sampled row is exact (against all samples), so
+    the mean of the sample is an unbiased estimate, in O(sample_size x n).
+    With ``stratified``, the sample is allocated to the clusters in
+    proportion to their sizes and the estimate weights each cluster by its
+    size. The normal confidence interval includes the finite population
+    correction, so it shrinks to the exact score as the sample grows.
+
+    Returns:
+        The (estimate, low, high) values.
+    """
+    codes, sizes = _encode(labels)
+    n = len(x)
+    rng = np.random.default_rng(random_state)
+    if sample_size >= n:
+        score = chunked_silhouette(x, labels, working_memory)
+        return score, score, score
+    if stratified:
+        # proportional allocation, at least two rows per cluster
+        quota = np.minimum(sizes, np.maximum(2, np.round(sample_size * sizes / n).astype(int)))
+        strata = [
+            rng.choice(np.flatnonzero(codes == c), quota[c], replace=False) for c in range(len(sizes))
+        ]
+    else:
+        strata = [rng.choice(n, sample_size, replace=False)]
+        sizes = np.array([n])
+    rows = np.concatenate(strata)
+    values = silhouette_values(x, labels, rows, working_memory)
+    estimate, variance, offset = 0.0, 0.0, 0
+    for stratum, size in zip(strata, sizes):
+        part = values[offset:offset + len(stratum)]
+        offset += len(stratum)
+        weight = size / n
+        estimate += weight * part.mean()
+        if 1 < len(part) < size:
+            variance += weight ** 2 * part.var(ddof=1) / len(part) * (1 - len(part) / size)
+    margin = NormalDist().inv_cdf(0.5 + confidence / 2) * np.sqrt(variance)
+    return float(estimate), float(estimate - margin), float(estimate + margin)
+
+
+def simplified_silhouette(x: np.ndarray, labels: np.ndarray, centers: Optional[np.ndarray] = None) -> float:
+    """Silhouette with the distances to the cluster centroids, in O(n x k).
+
+    ``a`` is the distance of a sample to the centroid of its cluster and
+    ``b`` the distance to the nearest other centroid. Without ``centers``
+    the centroids are the means of the labelled samples; with them, labels
+    index their rows, e.g. the predictions of a k-means model.
+    """
+    if centers is None:
+        codes, sizes = _encode(labels)
+        centers = np.zeros((len(sizes), x.shape[1]))
+        np.add.at(centers, codes, x)
+        centers /= sizes[:, None]
+    else:
+        codes = np.asarray(labels)
+        sizes = np.bincount(codes, minlength=len(centers))
+        if len(centers) < 2:
+            raise ValueError("At least two centers are required")
+    distances = euclidean_distances(x, centers)
+    a = distances[np.arange(len(x)), codes]
+    distances[np.arange(len(x)), codes] = np.inf
+    b = distances.min(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        s = np.nan_to_num((b - a) / np.maximum(a, b))
+    return float(np.where(sizes[codes] > 1, s, 0.0).mean())
+
+
+def validation_score(
+    x: np.ndarray,
+    labels: np.ndarray,
+    metric: str = "silhouette",
+    centers: Optional[np.ndarray] = None,
+    sample_size: int = 10000,
+    random_state: Optional[int] = None,
+) -> Tuple[float, float, float]:
+    """Score a clustering of the validation data with the selected metric.
+
+    - ``silhouette``: exact silhouette, computed in bounded memory.
+    - ``sampled_silhouette`` / ``stratified_silhouette``: estimate from
+      ``sample_size`` samples (uniform or per cluster), seeded.
+    - ``simplified_silhouette``: centroid-based silhouette.
+    - ``davies_bouldin``: Davies-Bouldin index (lower is better).
+
+    Returns:
+        The (score, low, high) values; the bounds are the confidence
+        interval of the sampled estimators and equal the score otherwise.
+    """
+    if metric == "silhouette":
+        score = chunked_silhouette(x, labels)
+    elif metric in ("sampled_silhouette", "stratified_silhouette"):
+        return sampled_silhouette(
+            x, labels, sample_size, random_state, stratified=metric == "stratified_silhouette"
+        )
+    elif metric == "simplified_silhouette":
+        score = simplified_silhouette(x, labels, centers)
+    elif metric == "davies_bouldin":
+        score = float(davies_bouldin_score(x, labels))
+    else:
+        raise ValueError(f"Unknown validation metric {metric}, expected one of {list(METRIC_NAMES)}")
+    return score, score, score